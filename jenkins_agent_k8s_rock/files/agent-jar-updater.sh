@@ -0,0 +1,33 @@
+#!/bin/bash
+
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+# Watch the Jenkins server version and notify the charm through a Pebble custom notice when it
+# changes, so that the charm stages the new agent.jar and swaps it in once the agent is idle.
+
+set -u -o pipefail
+
+export LC_ALL=C
+
+typeset JENKINS_URL="${JENKINS_URL:?"URL of a jenkins server must be provided"}"
+# The base interval in seconds between two version checks.
+typeset INTERVAL="${AGENT_JAR_UPDATE_INTERVAL:-300}"
+# The Jenkins server version the installed agent.jar was last checked against by the charm.
+typeset VERSION_FILE="/var/lib/jenkins/agent-jars/.version"
+typeset PEBBLE="/charm/bin/pebble"
+typeset NOTICE_KEY="canonical.com/jenkins-agent-k8s/agent-jar-update"
+
+while true; do
+    # Jitter the checks so that units do not all restart at once after a server upgrade.
+    sleep $((INTERVAL + RANDOM % INTERVAL))
+    # The redirects, e.g. to HTTPS or the context path, are followed, the headers of each response
+    # being printed, the last X-Jenkins header being the one of the Jenkins server.
+    version=$(curl -sfIL --max-time 10 "${JENKINS_URL}/jnlpJars/agent.jar" \
+        | tr -d '\r' | sed -n 's/^x-jenkins: *//Ip' | tail -n 1) || continue
+    if [[ -z "${version}" || "${version}" == "$(cat "${VERSION_FILE}" 2>/dev/null)" ]]; then
+        continue
+    fi
+    echo "Jenkins server version changed to ${version}."
+    "${PEBBLE}" notify "${NOTICE_KEY}" "version=${version}" || true
+done
@@ -0,0 +1,23 @@
+#!/bin/bash
+
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+# Unpack the cache bundle entries changed since the last unpacking, pushed by the charm, into the
+# Jenkins home directory, then record the manifest of the unpacked cache bundle. The manifest is
+# only recorded once the entries are unpacked, so that a failed unpacking is retried.
+
+set -eu -o pipefail
+
+export LC_ALL=C
+
+typeset JENKINS_HOME="/var/lib/jenkins"
+typeset CACHE_BUNDLE_DIR="${JENKINS_HOME}/.cache-bundle"
+typeset DELTA="${CACHE_BUNDLE_DIR}/delta.tar"
+
+[[ -f "${DELTA}" ]] || exit 0
+start=$(date +%s)
+tar -xf "${DELTA}" -C "${JENKINS_HOME}" --no-same-owner
+mv "${CACHE_BUNDLE_DIR}/manifest.json.new" "${CACHE_BUNDLE_DIR}/manifest.json"
+rm -f "${DELTA}"
+echo "Unpacked the cache bundle in $(( $(date +%s) - start )) seconds."
@@ -30,13 +30,34 @@ typeset JENKINS_HOME="/var/lib/jenkins"
 cd $JENKINS_HOME
 # Path of the agent.jar
 typeset AGENT_JAR="${JENKINS_HOME}/agent.jar"
+# Path of the class data sharing archive of the agent.jar, ignored by the JVM if missing
+typeset AGENT_ARCHIVE="${JENKINS_HOME}/agent.jsa"
+
+# Working directory of the agent, set by the charm for the additional agents of the unit
+typeset AGENT_WORKDIR="${JENKINS_AGENT_WORKDIR:-${JENKINS_HOME}}"
+mkdir -p "${AGENT_WORKDIR}/agents"
+
+# The agent connection state read by the charm: connecting, connected, rejected or exited.
+typeset AGENT_STATE="${AGENT_WORKDIR}/agents/.state"
 
 # Specify the pod as ready
-touch "${JENKINS_HOME}/agents/.ready"
+touch "${AGENT_WORKDIR}/agents/.ready"
+echo connecting > "${AGENT_STATE}"
+
+# JVM options computed by the charm from the container limits
+typeset JAVA_OPTS="${JAVA_OPTS:-}"
 
-# Start Jenkins agent
+# Start Jenkins agent, recording its connection state from its logs
 echo "${JENKINS_AGENT}"
-${JAVA} -jar ${AGENT_JAR} -jnlpUrl "${JENKINS_URL}/computer/${JENKINS_AGENT}/jenkins-agent.jnlp" -workDir "${JENKINS_HOME}" -noReconnect -secret "${JENKINS_TOKEN}" || echo "Invalid or already used credentials."
+# shellcheck disable=SC2086 # The JVM options are split on spaces.
+${JAVA} ${JAVA_OPTS} -XX:SharedArchiveFile="${AGENT_ARCHIVE}" -jar ${AGENT_JAR} -jnlpUrl "${JENKINS_URL}/computer/${JENKINS_AGENT}/jenkins-agent.jnlp" -workDir "${AGENT_WORKDIR}" -noReconnect -secret "${JENKINS_TOKEN}" 2>&1 | while IFS= read -r line; do
+    echo "${line}"
+    case "${line}" in
+        "INFO: Connected"*) echo connected > "${AGENT_STATE}" ;;
+        "INFO: Terminated"* | *"The server rejected the connection"*) echo rejected > "${AGENT_STATE}" ;;
+    esac
+done || echo "Invalid or already used credentials."
+echo exited > "${AGENT_STATE}"
 
 # Remove ready mark if unsuccessful
-rm ${JENKINS_HOME}/agents/.ready
+rm "${AGENT_WORKDIR}/agents/.ready"
@@ -0,0 +1,107 @@
+#!/bin/bash
+
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+# Keep the disk usage of the Jenkins home volume between watermarks. Once the usage reaches the
+# high watermark, the workspaces are evicted in least recently built order, skipping those in use
+# by running builds, until the usage is below the low watermark. The old remoting logs are removed.
+
+set -u -o pipefail
+
+export LC_ALL=C
+
+typeset JENKINS_HOME="/var/lib/jenkins"
+# The disk usage percentages starting and stopping the workspace eviction.
+typeset HIGH_WATERMARK="${WORKSPACE_GC_HIGH_WATERMARK:-85}"
+typeset LOW_WATERMARK="${WORKSPACE_GC_LOW_WATERMARK:-70}"
+# The interval in seconds between two disk usage checks.
+typeset INTERVAL="${WORKSPACE_GC_INTERVAL:-300}"
+# The time in seconds since the last build before a workspace can be evicted.
+typeset MIN_IDLE="${WORKSPACE_GC_MIN_IDLE:-3600}"
+# The number of days the rotated remoting logs are kept.
+typeset LOG_RETENTION_DAYS="${WORKSPACE_GC_LOG_RETENTION_DAYS:-7}"
+# The outcome of the last workspace eviction, served by the agent metrics exporter.
+typeset STATS_FILE="${WORKSPACE_GC_STATS_FILE:-${JENKINS_HOME}/.workspace-gc.json}"
+
+# Print the disk usage percentage of the Jenkins home volume.
+disk_usage() {
+    df --output=pcent "${JENKINS_HOME}" | tail -n 1 | tr -dc '0-9'
+}
+
+# Print the work directories of the main agent and of the additional agents.
+workdirs() {
+    echo "${JENKINS_HOME}"
+    for workdir in "${JENKINS_HOME}"/nodes/*; do
+        [[ -d "${workdir}" ]] && echo "${workdir}"
+    done
+}
+
+# Print the workspaces prefixed with their last build time, least recent first. The build
+# temporary directory, <workspace>@tmp, is recreated on each build.
+workspaces() {
+    for workdir in $(workdirs); do
+        for workspace in "${workdir}"/workspace/*; do
+            case "${workspace}" in *@tmp | *@script | *@libs) continue ;; esac
+            [[ -d "${workspace}" ]] || continue
+            echo "$(stat -c %Y "${workspace}" "${workspace}@tmp" 2>/dev/null | sort -n | tail -n 1) ${workspace}"
+        done
+    done | sort -n
+}
+
+# Print the working directories and open files of the running processes.
+paths_in_use() {
+    readlink /proc/[0-9]*/cwd /proc/[0-9]*/fd/* 2>/dev/null
+}
+
+# Succeed if a path in use is within a workspace or its sibling directories.
+is_in_use() {
+    awk -v workspace="$1" '
+        $0 == workspace || index($0, workspace "/") == 1 || index($0, workspace "@") == 1 {
+            found = 1
+            exit
+        }
+        END { exit !found }
+    ' <<< "$2"
+}
+
+rotate_logs() {
+    for workdir in $(workdirs); do
+        # The current remoting log, remoting.log.0, is kept written to by the agent.
+        find "${workdir}/remoting/logs" -type f -name '*.log.*' -mtime +"${LOG_RETENTION_DAYS}" \
+            -delete 2>/dev/null
+    done
+}
+
+collect() {
+    local usage start now in_use size mtime workspace
+    local reclaimed=0 evicted=0
+    usage=$(disk_usage)
+    (( usage >= HIGH_WATERMARK )) || return 0
+    echo "Disk usage ${usage}% reached ${HIGH_WATERMARK}%, evicting workspaces."
+    start=$(date +%s)
+    now=${start}
+    in_use=$(paths_in_use)
+    while read -r mtime workspace; do
+        (( usage > LOW_WATERMARK )) || break
+        (( now - mtime >= MIN_IDLE )) || continue
+        is_in_use "${workspace}" "${in_use}" && continue
+        size=$(du -sbc "${workspace}" "${workspace}"@{tmp,script,libs} 2>/dev/null | tail -n 1 | cut -f 1)
+        rm -rf "${workspace}" "${workspace}"@{tmp,script,libs}
+        echo "Evicted workspace ${workspace}, ${size} bytes."
+        reclaimed=$(( reclaimed + size ))
+        evicted=$(( evicted + 1 ))
+        usage=$(disk_usage)
+    done < <(workspaces)
+    local duration=$(( $(date +%s) - start ))
+    echo "Reclaimed ${reclaimed} bytes from ${evicted} workspaces in ${duration} seconds, disk usage ${usage}%."
+    printf '{"time": %d, "usage_percent": %d, "reclaimed_bytes": %d, "evicted_workspaces": %d, "duration_seconds": %d}\n' \
+        "${start}" "${usage}" "${reclaimed}" "${evicted}" "${duration}" > "${STATS_FILE}.tmp" \
+        && mv "${STATS_FILE}.tmp" "${STATS_FILE}"
+}
+
+while true; do
+    rotate_logs
+    collect
+    sleep "${INTERVAL}"
+done
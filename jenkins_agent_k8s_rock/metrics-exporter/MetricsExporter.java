@@ -0,0 +1,230 @@
+/*
+ * Copyright 2025 Canonical Ltd.
+ * See LICENSE file for licensing details.
+ */
+
+import com.sun.net.httpserver.HttpExchange;
+import com.sun.net.httpserver.HttpServer;
+import java.io.IOException;
+import java.io.OutputStream;
+import java.net.InetSocketAddress;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.DirectoryStream;
+import java.nio.file.Files;
+import java.nio.file.Path;
+import java.util.Map;
+import java.util.Optional;
+import java.util.TreeMap;
+import java.util.concurrent.Executors;
+import java.util.concurrent.TimeUnit;
+import java.util.regex.Matcher;
+import java.util.regex.Pattern;
+
+/**
+ * Serves the metrics of the agents of the unit in the Prometheus text format.
+ *
+ * <p>The connection states written by the entrypoint script are polled every second to count the
+ * connection attempts and connections of each agent and to observe the time each agent took to
+ * connect. The builds running on an agent are the child processes of its JVM. The outcome of the
+ * last workspace eviction and the metrics recorded by the charm are served as they are.
+ */
+public final class MetricsExporter {
+    private static final Path JENKINS_HOME = Path.of("/var/lib/jenkins");
+    private static final Path WORKSPACE_GC_STATS = Path.of(System.getenv().getOrDefault(
+            "WORKSPACE_GC_STATS_FILE", JENKINS_HOME.resolve(".workspace-gc.json").toString()));
+    private static final Path CHARM_METRICS = Path.of(System.getenv().getOrDefault(
+            "CHARM_METRICS_FILE", JENKINS_HOME.resolve(".metrics/charm.prom").toString()));
+    private static final double[] CONNECT_BUCKETS = {1, 2, 5, 10, 20, 30, 60, 120};
+    private static final Pattern JSON_NUMBER = Pattern.compile("\"(\\w+)\":\\s*(\\d+)");
+
+    /** The connection history of an agent, by agent index. */
+    private static final Map<String, Agent> AGENTS = new TreeMap<>();
+
+    private static final class Agent {
+        private final Path workdir;
+        private String state = "";
+        private long modified;
+        private long connectingSince;
+        private long attempts;
+        private long connections;
+        private final long[] connectBuckets = new long[CONNECT_BUCKETS.length];
+        private double connectSum;
+        private long connectCount;
+
+        private Agent(Path workdir) {
+            this.workdir = workdir;
+        }
+
+        /** Record a change of the connection state file. */
+        private void update() {
+            Path stateFile = workdir.resolve("agents/.state");
+            try {
+                long lastModified = Files.getLastModifiedTime(stateFile).toMillis();
+                String current = Files.readString(stateFile).strip();
+                if (lastModified == modified && current.equals(state)) {
+                    return;
+                }
+                if (current.equals("connecting")) {
+                    attempts++;
+                    connectingSince = lastModified;
+                } else if (current.equals("connected") && !state.equals("connected")) {
+                    connections++;
+                    if (connectingSince > 0) {
+                        observeConnect((lastModified - connectingSince) / 1000.0);
+                    }
+                    connectingSince = 0;
+                }
+                state = current;
+                modified = lastModified;
+            } catch (IOException exc) {
+                state = "";
+            }
+        }
+
+        private void observeConnect(double seconds) {
+            for (int i = 0; i < CONNECT_BUCKETS.length; i++) {
+                if (seconds <= CONNECT_BUCKETS[i]) {
+                    connectBuckets[i]++;
+                }
+            }
+            connectSum += seconds;
+            connectCount++;
+        }
+    }
+
+    private MetricsExporter() {}
+
+    /** Get the work directories of the agents of the unit, by agent index. */
+    private static Map<String, Path> getWorkdirs() {
+        Map<String, Path> workdirs = new TreeMap<>();
+        workdirs.put("0", JENKINS_HOME);
+        try (DirectoryStream<Path> nodes = Files.newDirectoryStream(JENKINS_HOME.resolve("nodes"))) {
+            for (Path node : nodes) {
+                if (Files.isDirectory(node)) {
+                    workdirs.put(node.getFileName().toString(), node);
+                }
+            }
+        } catch (IOException exc) {
+            // No additional agent.
+        }
+        return workdirs;
+    }
+
+    private static synchronized void poll() {
+        for (Map.Entry<String, Path> workdir : getWorkdirs().entrySet()) {
+            AGENTS.computeIfAbsent(workdir.getKey(), key -> new Agent(workdir.getValue())).update();
+        }
+    }
+
+    /** Count the running builds of an agent, the child processes of its JVM. */
+    private static long countRunningBuilds(Path workdir) {
+        String workdirArgument = workdir.toString();
+        return ProcessHandle.allProcesses()
+                .filter(process -> {
+                    String[] arguments = process.info().arguments().orElse(new String[0]);
+                    for (int i = 0; i + 1 < arguments.length; i++) {
+                        if (arguments[i].equals("-workDir")
+                                && arguments[i + 1].equals(workdirArgument)) {
+                            return true;
+                        }
+                    }
+                    return false;
+                })
+                .mapToLong(process -> process.children().count())
+                .sum();
+    }
+
+    private static Optional<String> readFile(Path path) {
+        try {
+            return Optional.of(Files.readString(path));
+        } catch (IOException exc) {
+            return Optional.empty();
+        }
+    }
+
+    private static void header(StringBuilder out, String name, String type, String help) {
+        out.append("# HELP ").append(name).append(' ').append(help).append('\n');
+        out.append("# TYPE ").append(name).append(' ').append(type).append('\n');
+    }
+
+    private static synchronized String render() {
+        StringBuilder out = new StringBuilder();
+        header(out, "jenkins_agent_up", "gauge", "Whether the agent is connected.");
+        for (Map.Entry<String, Agent> agent : AGENTS.entrySet()) {
+            out.append(String.format(
+                    "jenkins_agent_up{agent=\"%s\"} %d%n",
+                    agent.getKey(), agent.getValue().state.equals("connected") ? 1 : 0));
+        }
+        header(out, "jenkins_agent_connection_attempts_total", "counter",
+                "The connection attempts of the agent.");
+        for (Map.Entry<String, Agent> agent : AGENTS.entrySet()) {
+            out.append(String.format("jenkins_agent_connection_attempts_total{agent=\"%s\"} %d%n",
+                    agent.getKey(), agent.getValue().attempts));
+        }
+        header(out, "jenkins_agent_connections_total", "counter",
+                "The connections of the agent to the Jenkins server.");
+        for (Map.Entry<String, Agent> agent : AGENTS.entrySet()) {
+            out.append(String.format("jenkins_agent_connections_total{agent=\"%s\"} %d%n",
+                    agent.getKey(), agent.getValue().connections));
+        }
+        header(out, "jenkins_agent_connect_duration_seconds", "histogram",
+                "The time the agent took to connect to the Jenkins server.");
+        for (Map.Entry<String, Agent> agent : AGENTS.entrySet()) {
+            Agent history = agent.getValue();
+            for (int i = 0; i < CONNECT_BUCKETS.length; i++) {
+                out.append(String.format(
+                        "jenkins_agent_connect_duration_seconds_bucket{agent=\"%s\",le=\"%s\"} %d%n",
+                        agent.getKey(), CONNECT_BUCKETS[i], history.connectBuckets[i]));
+            }
+            out.append(String.format(
+                    "jenkins_agent_connect_duration_seconds_bucket{agent=\"%s\",le=\"+Inf\"} %d%n",
+                    agent.getKey(), history.connectCount));
+            out.append(String.format("jenkins_agent_connect_duration_seconds_sum{agent=\"%s\"} %s%n",
+                    agent.getKey(), history.connectSum));
+            out.append(String.format(
+                    "jenkins_agent_connect_duration_seconds_count{agent=\"%s\"} %d%n",
+                    agent.getKey(), history.connectCount));
+        }
+        header(out, "jenkins_agent_running_builds", "gauge",
+                "The builds running on the agent, the child processes of its JVM.");
+        for (Map.Entry<String, Agent> agent : AGENTS.entrySet()) {
+            out.append(String.format("jenkins_agent_running_builds{agent=\"%s\"} %d%n",
+                    agent.getKey(), countRunningBuilds(agent.getValue().workdir)));
+        }
+        readFile(WORKSPACE_GC_STATS).ifPresent(stats -> {
+            Matcher matcher = JSON_NUMBER.matcher(stats);
+            while (matcher.find()) {
+                String name = "jenkins_agent_workspace_gc_" + matcher.group(1);
+                header(out, name, "gauge", "The last workspace eviction " + matcher.group(1) + ".");
+                out.append(name).append(' ').append(matcher.group(2)).append('\n');
+            }
+        });
+        readFile(CHARM_METRICS).ifPresent(out::append);
+        return out.toString();
+    }
+
+    private static void handle(HttpExchange exchange) throws IOException {
+        byte[] body = render().getBytes(StandardCharsets.UTF_8);
+        exchange.getResponseHeaders().set("Content-Type", "text/plain; version=0.0.4");
+        exchange.sendResponseHeaders(200, body.length);
+        try (OutputStream response = exchange.getResponseBody()) {
+            response.write(body);
+        }
+    }
+
+    /**
+     * Start polling the agents and serving the metrics.
+     *
+     * @param args unused, the port is read from the METRICS_PORT environment variable and the
+     *     served files from the WORKSPACE_GC_STATS_FILE and CHARM_METRICS_FILE ones.
+     * @throws IOException if the port cannot be bound.
+     */
+    public static void main(String[] args) throws IOException {
+        int port = Integer.parseInt(System.getenv().getOrDefault("METRICS_PORT", "8082"));
+        Executors.newSingleThreadScheduledExecutor()
+                .scheduleWithFixedDelay(MetricsExporter::poll, 0, 1, TimeUnit.SECONDS);
+        HttpServer server = HttpServer.create(new InetSocketAddress(port), 0);
+        server.createContext("/metrics", MetricsExporter::handle);
+        server.start();
+    }
+}
@@ -7,6 +7,7 @@ import logging
 
 import ops
 
+import agent_jar
 import pebble
 import server
 from state import AGENT_RELATION, State
@@ -17,18 +18,26 @@ logger = logging.getLogger()
 class Observer(ops.Object):
     """The Jenkins agent relation observer."""
 
-    def __init__(self, charm: ops.CharmBase, state: State, pebble_service: pebble.PebbleService):
+    def __init__(
+        self,
+        charm: ops.CharmBase,
+        state: State,
+        pebble_service: pebble.PebbleService,
+        agent_jar_manager: agent_jar.AgentJarManager,
+    ):
         """Initialize the observer and register event handlers.
 
         Args:
             charm: The parent charm to attach the observer to.
             state: The charm state.
             pebble_service: Service manager that controls Jenkins agent service through pebble.
+            agent_jar_manager: Manager that installs the Jenkins agent JAR executable.
         """
         super().__init__(charm, "agent-observer")
         self.charm = charm
         self.state = state
         self.pebble_service = pebble_service
+        self.agent_jar_manager = agent_jar_manager
 
         charm.framework.observe(
             charm.on[AGENT_RELATION].relation_joined, self._on_agent_relation_joined
@@ -114,7 +123,7 @@ class Observer(ops.Object):
         """
         self.charm.unit.status = ops.MaintenanceStatus("Downloading Jenkins agent executable.")
         try:
-            server.download_jenkins_agent(server_url=credentials.address, container=container)
+            self.agent_jar_manager.install(server_url=credentials.address, container=container)
         except server.AgentJarDownloadError as exc:
             logger.error("Failed to download Jenkins agent executable, %s", exc)
             raise server.AgentJarDownloadError("Failed to download Jenkins agent.") from exc
@@ -128,6 +137,8 @@ class Observer(ops.Object):
             ),
             container=container,
         )
+        # The relation registers a single agent, stop the agents started from the configuration.
+        self.pebble_service.stop_extra_agents(container=container, agent_count=1)
         self.charm.unit.status = ops.ActiveStatus()
 
     def _on_agent_relation_departed(self, _: ops.RelationDepartedEvent) -> None:
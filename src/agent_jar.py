@@ -0,0 +1,301 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""The agent JAR executable management module."""
+
+import logging
+import typing
+
+import ops
+import requests
+from pydantic import BaseModel, ValidationError
+
+import pebble
+import server
+
+logger = logging.getLogger(__name__)
+
+AGENT_JAR_RESOURCE_NAME = "agent-jar"
+PEER_RELATION = "jenkins-agent-peers"
+PEER_AGENT_JAR_KEY = "agent-jar"
+# The Pebble service serving the agent JAR executable store to the peer units.
+AGENT_JAR_SERVER_SERVICE = "agent-jar-server"
+AGENT_JAR_SERVER_PORT = 8081
+
+
+class PeerAgentJar(BaseModel):
+    """The agent JAR executable published by the leader unit to the peer units.
+
+    Attrs:
+        server_url: The Jenkins server URL address the agent JAR executable was installed for.
+        url: The agent JAR executable URL served by the leader unit.
+        metadata: The metadata of the agent JAR executable.
+    """
+
+    server_url: str
+    url: str
+    metadata: server.AgentJarMetadata
+
+
+class AgentJarManager(ops.Object):
+    """The Jenkins agent JAR executable manager."""
+
+    _stored = ops.StoredState()
+
+    def __init__(self, charm: ops.CharmBase, http_session: requests.Session):
+        """Initialize the agent JAR executable manager.
+
+        Args:
+            charm: The parent charm to attach the manager to.
+            http_session: The HTTP session to the Jenkins server.
+        """
+        super().__init__(charm, "agent-jar")
+        self.http_session = http_session
+        self._stored.set_default(agent_jar_metadata={})
+
+    @property
+    def metadata(self) -> typing.Optional[server.AgentJarMetadata]:
+        """The metadata of the last installed agent JAR executable."""
+        stored_metadata = typing.cast(
+            typing.Dict[str, typing.Optional[str]], self._stored.agent_jar_metadata
+        )
+        if not stored_metadata:
+            return None
+        return server.AgentJarMetadata(**stored_metadata)
+
+    def _get_resource_agent_jar(self) -> typing.Optional[server.BundledAgentJar]:
+        """Get the agent JAR executable attached as the charm resource.
+
+        Returns:
+            The agent JAR executable of the charm resource. None if no valid JAR executable is
+            attached.
+        """
+        try:
+            path = self.model.resources.fetch(AGENT_JAR_RESOURCE_NAME)
+        except ops.ModelError:
+            return None
+        # An empty file is attached by default when no agent JAR executable is provided.
+        if not path.stat().st_size:
+            return None
+        try:
+            return server.read_agent_jar(path)
+        except server.AgentJarDownloadError as exc:
+            logger.warning("Invalid agent JAR resource, ignoring, %s", exc)
+            return None
+
+    def _get_compatible_bundled(
+        self, server_url: str, container: ops.Container
+    ) -> typing.Optional[server.BundledAgentJar]:
+        """Get the bundled agent JAR executable if supported by the Jenkins server.
+
+        Args:
+            server_url: The Jenkins server URL address.
+            container: The agent workload container.
+
+        Returns:
+            The agent JAR executable of the charm resource, or else of the rock. None if no
+            compatible agent JAR executable is bundled.
+        """
+        bundled = self._get_resource_agent_jar() or server.get_rock_agent_jar(container)
+        if not bundled:
+            return None
+        minimum_version = server.get_remoting_minimum_version(
+            server_url=server_url, session=self.http_session
+        )
+        if not server.is_remoting_version_compatible(bundled.version, minimum_version):
+            logger.info(
+                "Bundled agent JAR version %s is below the server minimum version %s.",
+                bundled.version,
+                minimum_version,
+            )
+            return None
+        return bundled
+
+    def _install_bundled(
+        self, server_url: str, container: ops.Container
+    ) -> typing.Optional[server.AgentJarMetadata]:
+        """Install the bundled agent JAR executable if supported by the Jenkins server.
+
+        Args:
+            server_url: The Jenkins server URL address.
+            container: The agent workload container.
+
+        Returns:
+            The metadata of the installed agent JAR executable. None if no compatible agent JAR
+            executable is bundled.
+        """
+        bundled = self._get_compatible_bundled(server_url=server_url, container=container)
+        if not bundled:
+            return None
+        return server.install_bundled_agent_jar(container=container, bundled=bundled)
+
+    def _get_peer_agent_jar(self) -> typing.Optional[PeerAgentJar]:
+        """Get the agent JAR executable published by the leader unit.
+
+        Returns:
+            The published agent JAR executable. None if nothing is published.
+        """
+        relation = self.model.get_relation(PEER_RELATION)
+        if not relation or PEER_AGENT_JAR_KEY not in relation.data[self.model.app]:
+            return None
+        try:
+            return PeerAgentJar.model_validate_json(
+                relation.data[self.model.app][PEER_AGENT_JAR_KEY]
+            )
+        except ValidationError as exc:
+            logger.warning("Invalid peer agent JAR data, ignoring, %s", exc)
+            return None
+
+    def _install_from_peer(
+        self, server_url: str, container: ops.Container
+    ) -> typing.Optional[server.AgentJarMetadata]:
+        """Install the agent JAR executable published by the leader unit.
+
+        Args:
+            server_url: The Jenkins server URL address.
+            container: The agent workload container.
+
+        Returns:
+            The metadata of the installed agent JAR executable. None if no agent JAR executable
+            for the Jenkins server could be installed from the leader unit.
+        """
+        if self.model.unit.is_leader():
+            return None
+        peer_agent_jar = self._get_peer_agent_jar()
+        if not peer_agent_jar or peer_agent_jar.server_url != server_url:
+            return None
+        try:
+            return server.download_peer_agent_jar(
+                url=peer_agent_jar.url,
+                metadata=peer_agent_jar.metadata,
+                container=container,
+                session=self.http_session,
+            )
+        except server.AgentJarDownloadError as exc:
+            logger.warning("Failed to install peer agent JAR, falling back to server, %s", exc)
+            return None
+
+    def _publish(
+        self, server_url: str, container: ops.Container, metadata: server.AgentJarMetadata
+    ) -> None:
+        """Serve the agent JAR executable store and publish the installed JAR to the peer units.
+
+        Args:
+            server_url: The Jenkins server URL address.
+            container: The agent workload container.
+            metadata: The metadata of the installed agent JAR executable.
+        """
+        relation = self.model.get_relation(PEER_RELATION)
+        if not self.model.unit.is_leader() or not relation:
+            return
+        binding = self.model.get_binding(relation)
+        address = binding.network.ingress_address if binding else None
+        if not address:
+            logger.warning("No peer address to publish the agent JAR executable.")
+            return
+        layer: ops.pebble.LayerDict = {
+            "summary": "Agent JAR server layer",
+            "description": "pebble config layer for the agent JAR server.",
+            "services": {
+                AGENT_JAR_SERVER_SERVICE: {
+                    "override": "replace",
+                    "summary": "Agent JAR server",
+                    "command": (
+                        "java -Xmx32m -m jdk.httpserver -b 0.0.0.0 "
+                        f"-p {AGENT_JAR_SERVER_PORT} -d {server.AGENT_JAR_STORE_PATH} -o none"
+                    ),
+                    "startup": "enabled",
+                    "user": server.USER,
+                },
+            },
+        }
+        # Only the agent JAR server is planned, a full replan would start the stopped agents.
+        pebble.reconcile_standalone_service(
+            container, AGENT_JAR_SERVER_SERVICE, ops.pebble.Layer(layer)
+        )
+        peer_agent_jar = PeerAgentJar(
+            server_url=server_url,
+            url=f"http://{address}:{AGENT_JAR_SERVER_PORT}/{metadata.sha256}.jar",
+            metadata=metadata,
+        )
+        relation.data[self.model.app][PEER_AGENT_JAR_KEY] = peer_agent_jar.model_dump_json()
+
+    def _record_version(self, container: ops.Container, version: str) -> None:
+        """Record the Jenkins server version the agent JAR executable was checked against.
+
+        The background updater notifies the charm when the server version differs.
+
+        Args:
+            container: The agent workload container.
+            version: The Jenkins server version.
+        """
+        container.push(server.AGENT_JAR_VERSION_PATH, version, make_dirs=True, user=server.USER)
+
+    def update(self, server_url: str, container: ops.Container, version: str) -> bool:
+        """Update the Jenkins agent JAR executable after a Jenkins server version change.
+
+        While the agent runs builds, the agent JAR executable of the new Jenkins server version
+        is staged in the store, unless the bundled agent JAR executable supports that version.
+        Once the agent is idle, on a later notification of the updater, the bundled agent JAR
+        executable is installed if supported, otherwise the staged one is activated.
+
+        Args:
+            server_url: The Jenkins server URL address.
+            container: The agent workload container.
+            version: The new Jenkins server version.
+
+        Returns:
+            True if a different agent JAR executable was activated, False otherwise.
+        """
+        if server.is_agent_busy(container):
+            if self._get_compatible_bundled(server_url=server_url, container=container):
+                logger.info(
+                    "Agent is running builds, bundled agent JAR supports Jenkins %s.", version
+                )
+                return False
+            logger.info("Agent is running builds, staging agent JAR for Jenkins %s.", version)
+            server.download_jenkins_agent(
+                server_url=server_url,
+                container=container,
+                session=self.http_session,
+                activate=False,
+            )
+            return False
+        previous = self.metadata
+        metadata = self.install(server_url=server_url, container=container)
+        # The version is already recorded by the install unless the agent JAR is not from the
+        # Jenkins server, e.g. bundled.
+        if version and version != metadata.version:
+            self._record_version(container=container, version=version)
+        return previous is None or previous.sha256 != metadata.sha256
+
+    def install(self, server_url: str, container: ops.Container) -> server.AgentJarMetadata:
+        """Install the Jenkins agent JAR executable into the workload container.
+
+        The agent JAR executable attached as the charm resource, or else the one baked into the
+        rock, is installed if its remoting version is supported by the Jenkins server. Otherwise,
+        the non-leader units install the agent JAR executable published by the leader unit, and
+        the agent JAR executable is downloaded from the server as a last resort. The leader unit
+        serves and publishes its installed agent JAR executable to the peer units.
+
+        Args:
+            server_url: The Jenkins server URL address.
+            container: The agent workload container.
+
+        Returns:
+            The metadata of the installed agent JAR executable.
+        """
+        metadata = (
+            self._install_bundled(server_url=server_url, container=container)
+            or self._install_from_peer(server_url=server_url, container=container)
+            or server.download_jenkins_agent(
+                server_url=server_url, container=container, session=self.http_session
+            )
+        )
+        self._publish(server_url=server_url, container=container, metadata=metadata)
+        if metadata.version:
+            self._record_version(container=container, version=metadata.version)
+        if metadata != self.metadata:
+            logger.info("Agent JAR executable updated, sha256: %s", metadata.sha256)
+        self._stored.agent_jar_metadata = metadata.model_dump()
+        return metadata
@@ -0,0 +1,227 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""The module seeding the Jenkins home directory with the caches of the cache bundle resource."""
+
+import copy
+import hashlib
+import logging
+import os
+import tarfile
+import tempfile
+import typing
+from pathlib import Path
+
+import ops
+from pydantic import BaseModel, ValidationError
+
+import server
+
+logger = logging.getLogger(__name__)
+
+CACHE_BUNDLE_RESOURCE_NAME = "cache-bundle"
+# The entries of the cache bundle changed since the last unpacking, pending the unpacking, and the
+# manifest of the last unpacked cache bundle, replaced by the pending manifest once unpacked.
+CACHE_BUNDLE_PATH = Path(server.JENKINS_WORKDIR / ".cache-bundle")
+DELTA_PATH = Path(CACHE_BUNDLE_PATH / "delta.tar")
+MANIFEST_PATH = Path(CACHE_BUNDLE_PATH / "manifest.json")
+PENDING_MANIFEST_PATH = Path(CACHE_BUNDLE_PATH / "manifest.json.new")
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+class CacheBundleManifest(BaseModel):
+    """The manifest of a cache bundle unpacked in the Jenkins home directory.
+
+    Attrs:
+        sha256: The SHA-256 hex digest of the cache bundle.
+        entries: The SHA-256 hex digests of the cache bundle entries, by entry name.
+    """
+
+    sha256: str
+    entries: typing.Dict[str, str]
+
+
+def fetch_resource(model: ops.Model) -> typing.Optional[Path]:
+    """Fetch the cache bundle attached as the charm resource.
+
+    Args:
+        model: The charm model.
+
+    Returns:
+        The cache bundle path. None if no cache bundle is attached.
+    """
+    try:
+        path = model.resources.fetch(CACHE_BUNDLE_RESOURCE_NAME)
+    except ops.ModelError:
+        return None
+    # An empty file is attached by default when no cache bundle is provided.
+    if not path.stat().st_size:
+        return None
+    return path
+
+
+def _get_sha256(file: typing.IO[bytes]) -> str:
+    """Get the SHA-256 hex digest of a file, read in chunks.
+
+    Args:
+        file: The file to digest.
+
+    Returns:
+        The SHA-256 hex digest.
+    """
+    digest = hashlib.sha256()
+    while chunk := file.read(READ_CHUNK_SIZE):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _is_safe(member: tarfile.TarInfo) -> bool:
+    """Check whether a cache bundle entry stays within the Jenkins home directory.
+
+    Args:
+        member: The cache bundle entry.
+
+    Returns:
+        True if the entry and its symbolic link target are relative paths within the Jenkins
+        home directory.
+    """
+    if not (member.isfile() or member.isdir() or member.issym() or member.islnk()):
+        return False
+    paths = [member.name]
+    if member.issym():
+        paths.append(os.path.join(os.path.dirname(member.name), member.linkname))
+    return all(
+        not os.path.isabs(path) and not os.path.normpath(path).startswith("..") for path in paths
+    )
+
+
+def _get_entry_sha256(bundle: tarfile.TarFile, member: tarfile.TarInfo) -> str:
+    """Get the SHA-256 hex digest of a cache bundle entry, from its type, mode and content.
+
+    Hard links are digested as the regular files they link to.
+
+    Args:
+        bundle: The cache bundle.
+        member: The cache bundle entry.
+
+    Returns:
+        The SHA-256 hex digest.
+    """
+    digest = hashlib.sha256(f"{member.mode:o}".encode())
+    if member.isdir():
+        digest.update(b"dir")
+    elif member.issym():
+        digest.update(b"symlink:" + member.linkname.encode("utf-8"))
+    else:
+        with typing.cast(typing.IO[bytes], bundle.extractfile(member)) as content:
+            digest.update(_get_sha256(content).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _add_entry(delta: tarfile.TarFile, bundle: tarfile.TarFile, member: tarfile.TarInfo) -> None:
+    """Add a cache bundle entry to the delta archive.
+
+    Hard links are added as the regular files they link to, which may be unchanged, i.e. missing
+    from the delta archive.
+
+    Args:
+        delta: The delta archive.
+        bundle: The cache bundle.
+        member: The cache bundle entry.
+    """
+    if not (member.isfile() or member.islnk()):
+        delta.addfile(member)
+        return
+    content_member = member
+    if member.islnk():
+        content_member = bundle.getmember(member.linkname)
+        member = copy.copy(member)
+        member.type, member.linkname, member.size = tarfile.REGTYPE, "", content_member.size
+    with typing.cast(typing.IO[bytes], bundle.extractfile(content_member)) as content:
+        delta.addfile(member, content)
+
+
+def _get_manifest(container: ops.Container) -> typing.Optional[CacheBundleManifest]:
+    """Get the manifest of the last unpacked cache bundle.
+
+    Args:
+        container: The agent workload container.
+
+    Returns:
+        The manifest of the last unpacked cache bundle. None if no valid manifest is found.
+    """
+    try:
+        return CacheBundleManifest.model_validate_json(
+            container.pull(MANIFEST_PATH, encoding="utf-8").read()
+        )
+    except (ops.pebble.PathError, ops.pebble.APIError):
+        return None
+    except ValidationError as exc:
+        logger.warning("Invalid cache bundle manifest, ignoring, %s", exc)
+        return None
+
+
+def push_delta(container: ops.Container, path: Path) -> bool:
+    """Push the cache bundle entries changed since the last unpacking to the workload container.
+
+    The changed entries are streamed as a tar archive to DELTA_PATH, with the manifest of the
+    cache bundle to PENDING_MANIFEST_PATH, for the unpacking service to unpack them in the
+    background. The entries removed from the cache bundle are kept in the Jenkins home directory.
+    The unsafe entries and the hard links to missing entries are ignored.
+
+    Args:
+        container: The agent workload container.
+        path: The cache bundle path, a tar archive, optionally compressed.
+
+    Returns:
+        Whether changed entries were pushed and are pending the unpacking.
+    """
+    with open(path, "rb") as bundle_file:
+        sha256 = _get_sha256(bundle_file)
+    manifest = _get_manifest(container)
+    if manifest and manifest.sha256 == sha256:
+        return False
+    unpacked = manifest.entries if manifest else {}
+    entries: typing.Dict[str, str] = {}
+    with tarfile.open(path, "r:*") as bundle, tempfile.TemporaryFile() as delta_file:
+        with tarfile.open(fileobj=delta_file, mode="w") as delta:
+            changed = 0
+            for member in bundle:
+                if not _is_safe(member):
+                    logger.warning("Unsafe cache bundle entry %s, ignoring.", member.name)
+                    continue
+                try:
+                    entries[member.name] = _get_entry_sha256(bundle, member)
+                except KeyError:
+                    # The hard link target is missing, failing the digest and the delta entry.
+                    logger.warning(
+                        "Dangling hard link cache bundle entry %s, ignoring.", member.name
+                    )
+                    continue
+                if unpacked.get(member.name) == entries[member.name]:
+                    continue
+                changed += 1
+                _add_entry(delta, bundle, member)
+        pending_manifest = CacheBundleManifest(sha256=sha256, entries=entries).model_dump_json()
+        if not changed:
+            container.push(
+                MANIFEST_PATH,
+                pending_manifest,
+                encoding="utf-8",
+                make_dirs=True,
+                user=server.USER,
+                group=server.USER,
+            )
+            return False
+        logger.info("Pushing %d changed cache bundle entries of %d.", changed, len(entries))
+        delta_file.seek(0)
+        container.push(DELTA_PATH, delta_file, make_dirs=True, user=server.USER, group=server.USER)
+    container.push(
+        PENDING_MANIFEST_PATH,
+        pending_manifest,
+        encoding="utf-8",
+        make_dirs=True,
+        user=server.USER,
+        group=server.USER,
+    )
+    return True
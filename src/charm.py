@@ -9,12 +9,18 @@ import logging
 import typing
 
 import ops
+from charms.prometheus_k8s.v0.prometheus_scrape import MetricsEndpointProvider
 from ops.main import main
 
 import agent
+import agent_jar
+import cache_bundle
+import credentials
+import metrics
 import pebble
 import server
-from state import AGENT_RELATION, InvalidStateError, State
+import workdir
+from state import AGENT_RELATION, InvalidStateError, JenkinsConfig, State
 
 logger = logging.getLogger()
 
@@ -35,15 +41,33 @@ class JenkinsAgentCharm(ops.CharmBase):
             self.unit.status = ops.BlockedStatus(exc.msg)
             return
 
+        # The pooled HTTP session to the Jenkins server, reused for the whole charm dispatch.
+        self.http_session = server.create_http_session()
         self.pebble_service = pebble.PebbleService(self.state)
-        self.agent_observer = agent.Observer(self, self.state, self.pebble_service)
+        self.agent_jar_manager = agent_jar.AgentJarManager(self, self.http_session)
+        self.credentials_validator = credentials.CredentialsValidator(self)
+        self.agent_observer = agent.Observer(
+            self, self.state, self.pebble_service, self.agent_jar_manager
+        )
+        self.metrics_recorder = metrics.MetricsRecorder(
+            self, self.state.jenkins_agent_service_name, server.CHARM_METRICS_PATH
+        )
+        self.metrics_endpoint = MetricsEndpointProvider(
+            self, relation_name=metrics.METRICS_RELATION, jobs=metrics.SCRAPE_JOBS
+        )
 
         self.framework.observe(self.on.config_changed, self._on_config_changed)
         self.framework.observe(self.on.upgrade_charm, self._on_upgrade_charm)
+        self.framework.observe(self.on.update_status, self._on_update_status)
+        self.framework.observe(self.on.drain_action, self._on_drain_action)
 
         self.framework.observe(
             self.on.jenkins_agent_k8s_pebble_ready, self._on_jenkins_agent_k8s_pebble_ready
         )
+        self.framework.observe(
+            self.on.jenkins_agent_k8s_pebble_custom_notice,
+            self._on_jenkins_agent_k8s_pebble_custom_notice,
+        )
 
     def _register_via_config(
         self, event: typing.Union[ops.ConfigChangedEvent, ops.UpgradeCharmEvent]
@@ -61,6 +85,9 @@ class JenkinsAgentCharm(ops.CharmBase):
             logger.warning("Jenkins agent container not yet ready. Deferring.")
             event.defer()
             return
+        workdir.prepare(container, self.state.cache_directories)
+        self.pebble_service.reconcile_workspace_gc(container)
+        self.pebble_service.reconcile_metrics_exporter(container)
 
         if not self.state.jenkins_config and not self.model.get_relation(AGENT_RELATION):
             self.model.unit.status = ops.BlockedStatus("Waiting for config/relation.")
@@ -73,7 +100,7 @@ class JenkinsAgentCharm(ops.CharmBase):
             return
 
         try:
-            server.download_jenkins_agent(
+            self.agent_jar_manager.install(
                 server_url=self.state.jenkins_config.server_url,
                 container=container,
             )
@@ -81,10 +108,22 @@ class JenkinsAgentCharm(ops.CharmBase):
             logger.error("Failed to download agent JAR executable, %s", exc)
             raise
 
-        valid_agent_token = server.find_valid_credentials(
+        if self.state.jenkins_config.registration == "start":
+            agent_token_pair = self._register_by_starting(container, self.state.jenkins_config)
+            if agent_token_pair:
+                self._start_extra_agents(container, self.state.jenkins_config, agent_token_pair)
+            return
+
+        valid_agent_token = self.credentials_validator.find_valid_credentials(
             agent_name_token_pairs=self.state.jenkins_config.agent_name_token_pairs,
             server_url=self.state.jenkins_config.server_url,
             container=container,
+            connected=self.pebble_service.is_agent_connected(container),
+            running_pair=self.pebble_service.get_running_pair(container),
+            max_workers=self.state.jenkins_config.validation_workers,
+            session=self.http_session,
+            # The pair at the unit ordinal is assigned to the unit, the others to other units.
+            first_alone=self.state.jenkins_config.assignment == "ordinal",
         )
         if not valid_agent_token:
             logger.error("No valid agent-token pair found.")
@@ -100,6 +139,85 @@ class JenkinsAgentCharm(ops.CharmBase):
             container=container,
         )
         self.model.unit.status = ops.ActiveStatus()
+        self._start_extra_agents(container, self.state.jenkins_config, valid_agent_token)
+
+    def _register_by_starting(
+        self, container: ops.Container, jenkins_config: JenkinsConfig
+    ) -> typing.Optional[typing.Tuple[str, str]]:
+        """Register the agent to server by starting it with each configured pair until connected.
+
+        Args:
+            container: The agent workload container.
+            jenkins_config: The Jenkins configuration from the charm configuration.
+
+        Returns:
+            The agent-token pair the agent connected with, None if no pair is valid.
+        """
+        self.model.unit.status = ops.MaintenanceStatus("Starting agent pebble service.")
+        agent_token_pair = self.pebble_service.start_agent(
+            server_url=jenkins_config.server_url,
+            agent_token_pairs=jenkins_config.agent_name_token_pairs,
+            container=container,
+            timeout=server.get_credentials_validation_timeout(
+                server_url=jenkins_config.server_url, session=self.http_session
+            ),
+        )
+        if not agent_token_pair:
+            logger.error("No valid agent-token pair found.")
+            self.model.unit.status = ops.BlockedStatus(
+                "Additional valid agent-token pairs required."
+            )
+            return None
+        self.pebble_service.update_checks(container)
+        self.model.unit.status = ops.ActiveStatus()
+        return agent_token_pair
+
+    def _start_extra_agents(
+        self,
+        container: ops.Container,
+        jenkins_config: JenkinsConfig,
+        agent_token_pair: typing.Tuple[str, str],
+    ) -> None:
+        """Start the additional agent services with the pairs not used by the other agents.
+
+        Each additional agent is started with the remaining pairs until it connects, as with the
+        "start" registration, and the agents beyond the configured number are stopped.
+
+        Args:
+            container: The agent workload container.
+            jenkins_config: The Jenkins configuration from the charm configuration.
+            agent_token_pair: The agent-token pair of the main agent.
+        """
+        agent_count = 1
+        if jenkins_config.agent_services > 1:
+            timeout = server.get_credentials_validation_timeout(
+                server_url=jenkins_config.server_url, session=self.http_session
+            )
+            pairs = [
+                pair for pair in jenkins_config.agent_name_token_pairs if pair != agent_token_pair
+            ]
+            while agent_count < jenkins_config.agent_services and pairs:
+                extra_pair = self.pebble_service.start_agent(
+                    server_url=jenkins_config.server_url,
+                    agent_token_pairs=pairs,
+                    container=container,
+                    timeout=timeout,
+                    index=agent_count,
+                )
+                if not extra_pair:
+                    break
+                pairs.remove(extra_pair)
+                agent_count += 1
+        self.pebble_service.stop_extra_agents(container=container, agent_count=agent_count)
+        if agent_count < jenkins_config.agent_services:
+            logger.warning(
+                "Only %d of %d agents connected.", agent_count, jenkins_config.agent_services
+            )
+            self.model.unit.status = ops.ActiveStatus(
+                f"{agent_count} of {jenkins_config.agent_services} agents connected."
+            )
+            return
+        self.pebble_service.update_checks(container)
 
     def _on_config_changed(self, event: ops.ConfigChangedEvent) -> None:
         """Handle config changed event.
@@ -116,6 +234,47 @@ class JenkinsAgentCharm(ops.CharmBase):
             event: The event fired on upgrade charm.
         """
         self._register_via_config(event)
+        container = self.unit.get_container(self.state.jenkins_agent_service_name)
+        if container.can_connect():
+            self._install_cache_bundle(container)
+
+    def _install_cache_bundle(self, container: ops.Container) -> None:
+        """Push the changed entries of the cache bundle resource and unpack them.
+
+        Args:
+            container: The agent workload container.
+        """
+        path = cache_bundle.fetch_resource(self.model)
+        if not path or self.pebble_service.is_cache_bundle_unpacking(container):
+            return
+        if cache_bundle.push_delta(container, path):
+            self.pebble_service.start_cache_bundle_unpack(container)
+
+    def _on_update_status(self, _: ops.UpdateStatusEvent) -> None:
+        """Handle update status event.
+
+        The agent checks are probed less often once the agent is connected.
+        """
+        container = self.unit.get_container(self.state.jenkins_agent_service_name)
+        if not container.can_connect():
+            return
+        self.pebble_service.update_checks(container)
+
+    def _on_drain_action(self, event: ops.ActionEvent) -> None:
+        """Handle drain action.
+
+        Args:
+            event: The event fired by the drain action.
+        """
+        container = self.unit.get_container(self.state.jenkins_agent_service_name)
+        if not container.can_connect():
+            event.fail("Jenkins agent container not yet ready.")
+            return
+        timeout = event.params.get("timeout")
+        idle = self.pebble_service.drain_agent(container, timeout=timeout)
+        self.pebble_service.stop_agent(container, drain=False)
+        self.unit.status = ops.MaintenanceStatus("Jenkins agent drained.")
+        event.set_results({"idle": idle})
 
     def _on_jenkins_agent_k8s_pebble_ready(self, _: ops.PebbleReadyEvent) -> None:
         """Handle pebble ready event.
@@ -126,15 +285,61 @@ class JenkinsAgentCharm(ops.CharmBase):
         It is necessary to handle case 2 for recovery cases.
         """
         container = self.unit.get_container(self.state.jenkins_agent_service_name)
-        if not container.can_connect() or not self.state.agent_relation_credentials:
+        if not container.can_connect():
             logger.warning("Preconditions not ready.")
             return
+        # The Jenkins home directory may be a volume kept from a previous pod.
+        workdir.reset_agent_markers(container)
+        workdir.prepare(container, self.state.cache_directories)
+        self.pebble_service.reconcile_workspace_gc(container)
+        self.pebble_service.reconcile_metrics_exporter(container)
+        if self.state.agent_relation_credentials:
+            self.agent_observer.start_agent_from_relation(
+                container=container,
+                credentials=self.state.agent_relation_credentials,
+                agent_name=self.state.agent_meta.name,
+            )
+        else:
+            logger.warning("Preconditions not ready.")
+        # Unpacked once the agent is started, the caches are filled while the first builds run.
+        self._install_cache_bundle(container)
 
-        self.agent_observer.start_agent_from_relation(
-            container=container,
-            credentials=self.state.agent_relation_credentials,
-            agent_name=self.state.agent_meta.name,
-        )
+    def _on_jenkins_agent_k8s_pebble_custom_notice(
+        self, event: ops.PebbleCustomNoticeEvent
+    ) -> None:
+        """Handle pebble custom notice event.
+
+        The agent JAR updater notifies the charm when the Jenkins server version changed.
+
+        Args:
+            event: The event fired on a custom notice of the workload container.
+        """
+        if event.notice.key != server.AGENT_JAR_UPDATE_NOTICE:
+            return
+        container = event.workload
+        if self.state.jenkins_config:
+            server_url = self.state.jenkins_config.server_url
+        elif self.state.agent_relation_credentials:
+            server_url = self.state.agent_relation_credentials.address
+        else:
+            logger.warning("No Jenkins server to update the agent JAR from.")
+            return
+        if not container.can_connect():
+            logger.warning("Jenkins agent container not yet ready.")
+            return
+
+        try:
+            updated = self.agent_jar_manager.update(
+                server_url=server_url,
+                container=container,
+                version=event.notice.last_data.get("version", ""),
+            )
+        except server.AgentJarDownloadError as exc:
+            logger.error("Failed to update agent JAR executable, %s", exc)
+            return
+        if updated:
+            logger.info("Agent JAR executable updated, restarting agent.")
+            self.pebble_service.restart_agent(container)
 
 
 if __name__ == "__main__":  # pragma: no cover
@@ -0,0 +1,179 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""The agent credentials validation module."""
+
+import hashlib
+import logging
+import time
+import typing
+
+import ops
+import requests
+from pydantic import BaseModel
+
+import metrics
+import server
+
+logger = logging.getLogger(__name__)
+
+# The time in seconds a credentials validation outcome is kept.
+VALIDATION_CACHE_TTL = 60 * 60
+
+
+class ValidationResult(BaseModel):
+    """The outcome of an agent credentials validation.
+
+    Attrs:
+        valid: Whether the agent connected with the credentials.
+        timestamp: The UNIX timestamp of the validation.
+        latency: The duration of the validation in seconds.
+    """
+
+    valid: bool
+    timestamp: float
+    latency: float
+
+
+def _get_cache_key(server_url: str, agent_name: str, agent_token: str) -> str:
+    """Get the validation cache key of an agent-token pair, not exposing the token.
+
+    Args:
+        server_url: The Jenkins server URL address.
+        agent_name: The Jenkins agent name.
+        agent_token: The Jenkins agent token.
+
+    Returns:
+        The validation cache key.
+    """
+    token_hash = hashlib.sha256(agent_token.encode("utf-8")).hexdigest()
+    return f"{server_url} {agent_name} {token_hash}"
+
+
+class CredentialsValidator(ops.Object):
+    """The Jenkins agent credentials validator, caching the validation outcomes."""
+
+    _stored = ops.StoredState()
+
+    def __init__(self, charm: ops.CharmBase):
+        """Initialize the credentials validator.
+
+        Args:
+            charm: The parent charm to attach the validator to.
+        """
+        super().__init__(charm, "credentials-validator")
+        self._stored.set_default(validation_results={}, last_known_good="")
+
+    def _get_results(self) -> typing.Dict[str, ValidationResult]:
+        """Get the validation outcomes that have not expired.
+
+        Returns:
+            The validation outcomes by cache key.
+        """
+        stored_results = typing.cast(
+            typing.Dict[str, typing.Dict[str, typing.Any]], self._stored.validation_results
+        )
+        expiry = time.time() - VALIDATION_CACHE_TTL
+        results = {key: ValidationResult(**result) for key, result in stored_results.items()}
+        return {key: result for key, result in results.items() if result.timestamp > expiry}
+
+    def find_valid_credentials(
+        self,
+        agent_name_token_pairs: typing.Iterable[typing.Tuple[str, str]],
+        server_url: str,
+        container: ops.Container,
+        connected: bool,
+        running_pair: typing.Optional[typing.Tuple[str, str]] = None,
+        max_workers: int = 1,
+        session: typing.Optional[requests.Session] = None,
+        first_alone: bool = False,
+    ) -> typing.Optional[typing.Tuple[str, str]]:
+        """Find credentials that can be applied, using the cached validation outcomes.
+
+        The pair of the running agent service is returned without validation while the agent is
+        connected with it and it is one of the given pairs, becoming the last known good pair and
+        refreshing its validation outcome so that it does not expire. Otherwise, the last known
+        good pair is validated first, followed by the pairs not known to be invalid and the pairs
+        known to be invalid, in the given order.
+
+        Args:
+            agent_name_token_pairs: Matching agent name and token pair to check, by priority.
+            server_url: The jenkins server url address.
+            container: The Jenkins agent workload container.
+            connected: Whether the agent is connected.
+            running_pair: The agent-token pair of the running agent service.
+            max_workers: The maximum number of credentials validated at once.
+            session: The HTTP session to the Jenkins server to pre-check the pairs with and to
+                adapt the validation timeout to the server round trip time.
+            first_alone: Whether the first pair is validated alone before the other pairs.
+
+        Returns:
+            Agent name and token pair that can be used. None if no pair is available.
+        """
+        keys = {pair: _get_cache_key(server_url, *pair) for pair in agent_name_token_pairs}
+        results = self._get_results()
+        last_known_good = typing.cast(str, self._stored.last_known_good)
+        if last_known_good in results and not connected:
+            logger.info("Agent disconnected, invalidating last known good credentials.")
+            del results[last_known_good]
+        elif connected and running_pair and running_pair in keys:
+            logger.info("Agent connected with %s, skipping validation.", running_pair[0])
+            cached = results.get(keys[running_pair])
+            results[keys[running_pair]] = ValidationResult(
+                valid=True, timestamp=time.time(), latency=cached.latency if cached else 0.0
+            )
+            self._stored.validation_results = {
+                key: result.model_dump() for key, result in results.items()
+            }
+            self._stored.last_known_good = keys[running_pair]
+            return running_pair
+
+        def priority(pair: typing.Tuple[str, str]) -> int:
+            """Get the validation priority of a pair, lowest first.
+
+            Args:
+                pair: The agent-token pair.
+
+            Returns:
+                The validation priority.
+            """
+            if keys[pair] == last_known_good:
+                return 0
+            result = results.get(keys[pair])
+            return 2 if result and not result.valid else 1
+
+        validated: typing.List[typing.Tuple[str, ValidationResult]] = []
+
+        def record(agent_name: str, agent_token: str, valid: bool, latency: float) -> None:
+            """Record a validation outcome.
+
+            Args:
+                agent_name: The Jenkins agent name.
+                agent_token: The Jenkins agent token.
+                valid: Whether the agent connected with the credentials.
+                latency: The duration of the validation in seconds.
+            """
+            result = ValidationResult(valid=valid, timestamp=time.time(), latency=latency)
+            metrics.observe("credentials_validation_seconds", latency)
+            validated.append((keys[(agent_name, agent_token)], result))
+
+        found = server.find_valid_credentials(
+            agent_name_token_pairs=sorted(keys, key=priority),
+            server_url=server_url,
+            container=container,
+            max_workers=max_workers,
+            timeout=(
+                server.get_credentials_validation_timeout(server_url=server_url, session=session)
+                if session
+                else server.CREDENTIALS_VALIDATION_TIMEOUT
+            ),
+            session=session,
+            on_validated=record,
+            first_alone=first_alone,
+        )
+        results.update(validated)
+        self._stored.validation_results = {
+            key: result.model_dump() for key, result in results.items()
+        }
+        self._stored.last_known_good = keys[found] if found else ""
+        return found
@@ -0,0 +1,331 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""The content-addressed store of agent JAR executables in the workload container."""
+
+import logging
+import time
+import typing
+from pathlib import Path
+
+import ops
+from pydantic import BaseModel, Field, ValidationError
+
+logger = logging.getLogger(__name__)
+
+# The maximum total size in bytes of the agent JAR executables kept in the store.
+STORE_MAX_SIZE = 64 * 1024 * 1024
+INDEX_FILENAME = "index.json"
+# The agent arguments of the run recording the class data sharing archive. The agent fails to
+# connect to the unreachable discard port, having loaded the classes of its startup.
+ARCHIVE_TRAINING_ARGS = [
+    "-jnlpUrl",
+    "http://127.0.0.1:9/computer/archive/slave-agent.jnlp",
+    "-noReconnect",
+    "-secret",
+    "archive",
+]
+# The time in seconds allowed for the run recording the class data sharing archive.
+ARCHIVE_TRAINING_TIMEOUT = 120
+
+
+class StoreEntry(BaseModel):
+    """An agent JAR executable kept in the store.
+
+    Attrs:
+        sha256: The SHA-256 hex digest of the agent JAR executable.
+        size: The size in bytes of the agent JAR executable.
+        etag: The ETag header value returned by the server with the agent JAR executable.
+        last_modified: The Last-Modified header value returned by the server with the agent JAR
+            executable.
+        versions: The Jenkins server versions (X-Jenkins header) serving the agent JAR executable.
+        last_used: The UNIX timestamp the agent JAR executable was last activated.
+        archive_size: The size in bytes of the class data sharing archive of the agent JAR
+            executable.
+        archive_failed: Whether the creation of the class data sharing archive failed, not to
+            be retried.
+    """
+
+    sha256: str
+    size: int = 0
+    etag: typing.Optional[str] = None
+    last_modified: typing.Optional[str] = None
+    versions: typing.List[str] = Field(default_factory=list)
+    last_used: float = 0
+    archive_size: int = 0
+    archive_failed: bool = False
+
+
+class StoreIndex(BaseModel):
+    """The index of the agent JAR executables kept in the store.
+
+    Attrs:
+        active: The SHA-256 hex digest of the active agent JAR executable.
+        entries: The stored agent JAR executables by SHA-256 hex digest.
+    """
+
+    active: typing.Optional[str] = None
+    entries: typing.Dict[str, StoreEntry] = Field(default_factory=dict)
+
+
+class AgentJarStore:
+    """The content-addressed store of agent JAR executables.
+
+    Each agent JAR executable is stored as <sha256>.jar under the store directory and the
+    active one is linked from the agent JAR executable path. The AppCDS (class data sharing)
+    archive of each agent JAR executable is stored as <sha256>.jsa and the active one is linked
+    from the agent JAR executable path with the .jsa suffix, so that the JVM maps the agent
+    classes from the archive instead of loading them from the JAR executable.
+
+    Attrs:
+        index: The index of the stored agent JAR executables.
+        active: The active agent JAR executable entry, if any.
+    """
+
+    def __init__(
+        self, container: ops.Container, store_path: Path, link_path: Path, user: str
+    ) -> None:
+        """Load the store from the workload container.
+
+        Args:
+            container: The agent workload container.
+            store_path: The directory of the store.
+            link_path: The path linking to the active agent JAR executable.
+            user: The user owning the store files.
+        """
+        self._container = container
+        self._store_path = store_path
+        self._link_path = link_path
+        self._user = user
+        self.index = self._load_index()
+
+    @property
+    def active(self) -> typing.Optional[StoreEntry]:
+        """The active agent JAR executable entry, if any."""
+        if not self.index.active:
+            return None
+        return self.index.entries.get(self.index.active)
+
+    def _load_index(self) -> StoreIndex:
+        """Load the store index from the workload container.
+
+        Returns:
+            The store index. An empty index if the store is missing or its index is invalid.
+        """
+        index_path = self._store_path / INDEX_FILENAME
+        if not self._container.exists(str(index_path)):
+            return StoreIndex()
+        try:
+            index = StoreIndex.model_validate_json(
+                self._container.pull(index_path, encoding="utf-8").read()
+            )
+        except (ops.pebble.PathError, ValidationError) as exc:
+            logger.warning("Invalid agent JAR store index, resetting store, %s", exc)
+            return StoreIndex()
+        # The active link may have been replaced outside of the store, e.g. by an older charm.
+        if not self._container.exists(str(self._link_path)):
+            index.active = None
+        return index
+
+    def _save_index(self) -> None:
+        """Save the store index to the workload container."""
+        self._container.push(
+            self._store_path / INDEX_FILENAME,
+            self.index.model_dump_json(),
+            make_dirs=True,
+            user=self._user,
+        )
+
+    def get_entry_path(self, sha256: str) -> Path:
+        """Get the path of a stored agent JAR executable.
+
+        Args:
+            sha256: The SHA-256 hex digest of the agent JAR executable.
+
+        Returns:
+            The agent JAR executable path in the store.
+        """
+        return self._store_path / f"{sha256}.jar"
+
+    def get_archive_path(self, sha256: str) -> Path:
+        """Get the path of the class data sharing archive of a stored agent JAR executable.
+
+        Args:
+            sha256: The SHA-256 hex digest of the agent JAR executable.
+
+        Returns:
+            The class data sharing archive path in the store.
+        """
+        return self._store_path / f"{sha256}.jsa"
+
+    def find_by_version(self, version: str) -> typing.Optional[StoreEntry]:
+        """Find the agent JAR executable served by a Jenkins server version.
+
+        Args:
+            version: The Jenkins server version.
+
+        Returns:
+            The stored agent JAR executable entry if found.
+        """
+        return next(
+            (entry for entry in self.index.entries.values() if version in entry.versions), None
+        )
+
+    def add(self, entry: StoreEntry, source: typing.BinaryIO) -> None:
+        """Add an agent JAR executable to the store if it is not stored yet.
+
+        Args:
+            entry: The agent JAR executable entry.
+            source: The agent JAR executable content.
+        """
+        if entry.sha256 in self.index.entries:
+            self.update(entry)
+            return
+        self._container.push(
+            self.get_entry_path(entry.sha256), source, make_dirs=True, user=self._user
+        )
+        self.index.entries[entry.sha256] = entry
+        self._save_index()
+
+    def copy(self, entry: StoreEntry, path: Path) -> None:
+        """Copy an agent JAR executable from the workload container to the store if not stored yet.
+
+        Args:
+            entry: The agent JAR executable entry.
+            path: The agent JAR executable path in the workload container.
+        """
+        if entry.sha256 in self.index.entries:
+            self.update(entry)
+            return
+        self._container.make_dir(self._store_path, make_parents=True, user=self._user)
+        self._container.exec(
+            ["cp", str(path), str(self.get_entry_path(entry.sha256))], user=self._user
+        ).wait()
+        entry.size = self._container.list_files(self.get_entry_path(entry.sha256))[0].size or 0
+        self.index.entries[entry.sha256] = entry
+        self._save_index()
+
+    def update(self, entry: StoreEntry) -> None:
+        """Update the server metadata of a stored agent JAR executable.
+
+        Args:
+            entry: The agent JAR executable entry with the latest server metadata.
+        """
+        stored = self.index.entries[entry.sha256]
+        updated = stored.model_copy(
+            update={
+                "etag": entry.etag or stored.etag,
+                "last_modified": entry.last_modified or stored.last_modified,
+                "versions": stored.versions
+                + [version for version in entry.versions if version not in stored.versions],
+            }
+        )
+        if updated != stored:
+            self.index.entries[entry.sha256] = updated
+            self._save_index()
+
+    def activate(self, sha256: str) -> None:
+        """Link a stored agent JAR executable as the active one and evict unused entries.
+
+        The link is replaced atomically so that a running agent keeps its open JAR executable.
+        The class data sharing archive of the agent JAR executable is created if missing, unless
+        its creation failed before.
+
+        Args:
+            sha256: The SHA-256 hex digest of the stored agent JAR executable.
+        """
+        activated = self.index.active != sha256
+        if activated:
+            now = time.time()
+            # The active entry is never evicted, its use ends when another entry is activated.
+            if previous := self.active:
+                previous.last_used = now
+            self.index.entries[sha256].last_used = now
+            self._link(self.get_entry_path(sha256), self._link_path)
+            logger.info("Activated agent JAR executable %s.", sha256)
+            self.index.active = sha256
+            self._evict()
+            self._save_index()
+        archive_path = self.get_archive_path(sha256)
+        archive_link_path = self._link_path.with_suffix(".jsa")
+        if self._container.exists(str(archive_path)):
+            if activated:
+                self._link(archive_path, archive_link_path)
+        elif not self.index.entries[sha256].archive_failed and self._create_archive(sha256):
+            self._link(archive_path, archive_link_path)
+        else:
+            # The JVM ignores a missing archive, unlike the archive of another JAR executable.
+            self._container.remove_path(str(archive_link_path), recursive=True)
+
+    def _link(self, path: Path, link_path: Path) -> None:
+        """Link a stored file, replacing the link atomically.
+
+        Args:
+            path: The stored file path.
+            link_path: The link path.
+        """
+        target = path.relative_to(link_path.parent)
+        temporary_link = link_path.with_name(f".{link_path.name}.tmp")
+        self._container.exec(
+            ["ln", "-sfn", str(target), str(temporary_link)], user=self._user
+        ).wait()
+        self._container.exec(
+            ["mv", "-Tf", str(temporary_link), str(link_path)], user=self._user
+        ).wait()
+
+    def _create_archive(self, sha256: str) -> bool:
+        """Create the class data sharing archive of the active agent JAR executable.
+
+        The archive records the classes loaded by a run of the agent through the active link,
+        the JVM only using an archive created with the same class path. The archive size, or the
+        failure, is recorded in the store index.
+
+        Args:
+            sha256: The SHA-256 hex digest of the active agent JAR executable.
+
+        Returns:
+            Whether the archive was created.
+        """
+        archive_path = self.get_archive_path(sha256)
+        process = self._container.exec(
+            [
+                "java",
+                f"-XX:ArchiveClassesAtExit={archive_path}",
+                "-jar",
+                str(self._link_path),
+                *ARCHIVE_TRAINING_ARGS,
+            ],
+            timeout=ARCHIVE_TRAINING_TIMEOUT,
+            user=self._user,
+        )
+        try:
+            process.wait_output()
+        except ops.pebble.ExecError:
+            # The agent is expected to fail to connect, the archive being written at exit.
+            pass
+        except ops.pebble.ChangeError as exc:
+            logger.warning("Failed to run agent JAR executable %s, %s", sha256, exc)
+        entry = self.index.entries[sha256]
+        if not self._container.exists(str(archive_path)):
+            logger.warning("Failed to create class data sharing archive of %s.", sha256)
+            entry.archive_failed = True
+            self._save_index()
+            return False
+        logger.info("Created class data sharing archive of agent JAR executable %s.", sha256)
+        entry.archive_size = self._container.list_files(archive_path)[0].size or 0
+        self._save_index()
+        return True
+
+    def _evict(self) -> None:
+        """Evict the least recently used entries and archives exceeding the store size limit."""
+        total_size = sum(entry.size + entry.archive_size for entry in self.index.entries.values())
+        for entry in sorted(self.index.entries.values(), key=lambda entry: entry.last_used):
+            if total_size <= STORE_MAX_SIZE:
+                return
+            if entry.sha256 == self.index.active:
+                continue
+            logger.info("Evicting agent JAR executable %s from store.", entry.sha256)
+            self._container.remove_path(str(self.get_entry_path(entry.sha256)), recursive=True)
+            self._container.remove_path(str(self.get_archive_path(entry.sha256)), recursive=True)
+            del self.index.entries[entry.sha256]
+            total_size -= entry.size + entry.archive_size
@@ -0,0 +1,138 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""The module computing the JVM options of the agent from the workload container limits."""
+
+import logging
+import math
+import typing
+from dataclasses import dataclass
+from pathlib import Path
+
+import ops
+
+logger = logging.getLogger(__name__)
+
+CGROUP_PATH = Path("/sys/fs/cgroup")
+# The cgroup v1 memory limit values above this are unlimited, e.g. 9223372036854771712.
+CGROUP_V1_UNLIMITED_MEMORY = 2**60
+# The percentage of the container memory used by the agent heap, the builds running in the same
+# container. Raised in small containers for the heap to reach MIN_HEAP_SIZE.
+HEAP_PERCENTAGE = 25
+MAX_HEAP_PERCENTAGE = 75
+MIN_HEAP_SIZE = 256 * 1024 * 1024
+# The interval in milliseconds of the G1 periodic collections returning the idle heap.
+PERIODIC_GC_INTERVAL = 60000
+
+
+@dataclass(frozen=True)
+class ResourceLimits:
+    """The resource limits of the workload container.
+
+    Attrs:
+        memory: The memory limit in bytes, None if unlimited.
+        cpus: The number of CPUs allowed by the CPU quota, None if unlimited.
+    """
+
+    memory: typing.Optional[int] = None
+    cpus: typing.Optional[int] = None
+
+
+def _read_cgroup_file(container: ops.Container, path: Path) -> typing.Optional[str]:
+    """Read a cgroup file of the workload container.
+
+    Args:
+        container: The agent workload container.
+        path: The cgroup file path.
+
+    Returns:
+        The stripped file content, None if the file could not be read.
+    """
+    try:
+        return container.pull(path, encoding="utf-8").read().strip()
+    except (ops.pebble.PathError, ops.pebble.APIError):
+        return None
+
+
+def _get_cpus(quota: int, period: int) -> typing.Optional[int]:
+    """Get the number of CPUs allowed by a CPU quota.
+
+    Args:
+        quota: The CPU time in microseconds allowed per period, negative if unlimited.
+        period: The CPU quota period in microseconds.
+
+    Returns:
+        The number of CPUs, rounded up, None if unlimited.
+    """
+    if quota <= 0 or period <= 0:
+        return None
+    return max(1, math.ceil(quota / period))
+
+
+def get_resource_limits(container: ops.Container) -> ResourceLimits:
+    """Get the resource limits of the workload container from its cgroup, v2 or v1.
+
+    Args:
+        container: The agent workload container.
+
+    Returns:
+        The workload container resource limits.
+    """
+    memory_max = _read_cgroup_file(container, CGROUP_PATH / "memory.max")
+    cpu_max = _read_cgroup_file(container, CGROUP_PATH / "cpu.max")
+    try:
+        if memory_max is not None or cpu_max is not None:
+            quota, _, period = (cpu_max or "max").partition(" ")
+            return ResourceLimits(
+                memory=int(memory_max) if memory_max and memory_max != "max" else None,
+                cpus=_get_cpus(int(quota), int(period)) if quota != "max" else None,
+            )
+        memory_limit = _read_cgroup_file(container, CGROUP_PATH / "memory/memory.limit_in_bytes")
+        cpu_quota = _read_cgroup_file(container, CGROUP_PATH / "cpu/cpu.cfs_quota_us")
+        cpu_period = _read_cgroup_file(container, CGROUP_PATH / "cpu/cpu.cfs_period_us")
+        memory = int(memory_limit) if memory_limit else None
+        return ResourceLimits(
+            memory=memory if memory and memory < CGROUP_V1_UNLIMITED_MEMORY else None,
+            cpus=_get_cpus(int(cpu_quota), int(cpu_period)) if cpu_quota and cpu_period else None,
+        )
+    except ValueError as exc:
+        logger.warning("Invalid workload container cgroup limits, %s", exc)
+        return ResourceLimits()
+
+
+def get_java_options(limits: ResourceLimits, jvm_options: str = "", agent_count: int = 1) -> str:
+    """Get the JVM options of the agent sized for the workload container.
+
+    The heap is a percentage of the container memory, shared by the agents running in the
+    container, the processor count follows the CPU quota and the G1 collector periodically returns
+    the idle heap to the system. The configured JVM options come last to override the computed
+    ones.
+
+    Args:
+        limits: The workload container resource limits.
+        jvm_options: The JVM options from the charm configuration.
+        agent_count: The number of agents running in the workload container.
+
+    Returns:
+        The JVM options, separated by spaces.
+    """
+    heap_percentage = HEAP_PERCENTAGE
+    if limits.memory:
+        heap_percentage = min(
+            MAX_HEAP_PERCENTAGE,
+            max(HEAP_PERCENTAGE, math.ceil(MIN_HEAP_SIZE * 100 * agent_count / limits.memory)),
+        )
+    options = [f"-XX:MaxRAMPercentage={heap_percentage / agent_count:.1f}"]
+    if limits.cpus:
+        options.append(f"-XX:ActiveProcessorCount={limits.cpus}")
+    options.extend(
+        [
+            "-XX:+UseG1GC",
+            f"-XX:G1PeriodicGCInterval={PERIODIC_GC_INTERVAL}",
+            "-XX:MinHeapFreeRatio=10",
+            "-XX:MaxHeapFreeRatio=30",
+        ]
+    )
+    if jvm_options.strip():
+        options.append(jvm_options.strip())
+    return " ".join(options)
@@ -0,0 +1,181 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""The charm timings and the scrape job of the agent metrics exporter."""
+
+import functools
+import logging
+import threading
+import time
+import typing
+from pathlib import Path
+
+import ops
+
+logger = logging.getLogger(__name__)
+
+METRICS_RELATION = "metrics-endpoint"
+# The port of the metrics exporter service of the workload container.
+METRICS_PORT = 8082
+# The scrape job of the metrics exporter of each unit, published over the metrics endpoint.
+SCRAPE_JOBS = [{"static_configs": [{"targets": [f"*:{METRICS_PORT}"]}]}]
+METRIC_PREFIX = "jenkins_agent_charm_"
+# The charm timing histograms and their description, by name.
+HISTOGRAMS = {
+    "agent_jar_download_seconds": "The time taken to download or activate the agent JAR.",
+    "credentials_search_seconds": "The time taken to find a valid agent-token pair.",
+    "credentials_validation_seconds": "The time taken by an agent-token pair validation probe.",
+    "agent_reconcile_seconds": "The time taken to reconcile an agent service.",
+}
+# The upper bounds in seconds of the histogram buckets.
+HISTOGRAM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+_lock = threading.Lock()
+# The durations observed during the charm dispatch and not yet recorded, by histogram name.
+_observations: typing.Dict[str, typing.List[float]] = {}
+
+CallableT = typing.TypeVar("CallableT", bound=typing.Callable[..., typing.Any])
+
+
+def observe(name: str, value: float) -> None:
+    """Observe a duration of a charm timing histogram, from any thread.
+
+    Args:
+        name: The histogram name, a key of HISTOGRAMS.
+        value: The duration in seconds.
+    """
+    with _lock:
+        _observations.setdefault(name, []).append(value)
+
+
+def timed(name: str) -> typing.Callable[[CallableT], CallableT]:
+    """Observe the duration of the calls of a function.
+
+    Args:
+        name: The histogram name, a key of HISTOGRAMS.
+
+    Returns:
+        The decorator of the timed function.
+    """
+
+    def decorator(func: CallableT) -> CallableT:
+        """Wrap a function with a timer.
+
+        Args:
+            func: The timed function.
+
+        Returns:
+            The timed function.
+        """
+
+        @functools.wraps(func)
+        def wrapper(*args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+            """Call the timed function, observing its duration even if it raises.
+
+            Args:
+                args: The positional arguments of the timed function.
+                kwargs: The keyword arguments of the timed function.
+
+            Returns:
+                The return value of the timed function.
+            """
+            start = time.monotonic()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(name, time.monotonic() - start)
+
+        return typing.cast(CallableT, wrapper)
+
+    return decorator
+
+
+def pop_observations() -> typing.Dict[str, typing.List[float]]:
+    """Get and clear the durations observed since the last call.
+
+    Returns:
+        The observed durations, by histogram name.
+    """
+    with _lock:
+        observations = dict(_observations)
+        _observations.clear()
+    return observations
+
+
+def render(histograms: typing.Mapping[str, typing.Mapping[str, typing.Any]]) -> str:
+    """Render the charm timing histograms in the Prometheus text format.
+
+    Args:
+        histograms: The cumulative bucket counts, sum and count of the histograms, by name.
+
+    Returns:
+        The histograms in the Prometheus text format.
+    """
+    lines = []
+    for name, histogram in sorted(histograms.items()):
+        metric = f"{METRIC_PREFIX}{name}"
+        lines.append(f"# HELP {metric} {HISTOGRAMS.get(name, name)}")
+        lines.append(f"# TYPE {metric} histogram")
+        for bound, count in zip(HISTOGRAM_BUCKETS, histogram["buckets"], strict=True):
+            lines.append(f'{metric}_bucket{{le="{bound}"}} {count}')
+        lines.append(f'{metric}_bucket{{le="+Inf"}} {histogram["count"]}')
+        lines.append(f"{metric}_sum {histogram['sum']}")
+        lines.append(f"{metric}_count {histogram['count']}")
+    return "".join(f"{line}\n" for line in lines)
+
+
+class MetricsRecorder(ops.Object):
+    """The recorder of the charm timings, served by the metrics exporter of the workload container.
+
+    The durations observed during a charm dispatch are added to the histograms kept in the charm
+    state before it is committed, and written in the Prometheus text format to the workload
+    container.
+    """
+
+    _stored = ops.StoredState()
+
+    def __init__(self, charm: ops.CharmBase, container_name: str, path: Path):
+        """Initialize the charm timings recorder.
+
+        Args:
+            charm: The parent charm to attach the recorder to.
+            container_name: The name of the agent workload container.
+            path: The path of the charm timings in the workload container.
+        """
+        super().__init__(charm, "metrics")
+        self.container_name = container_name
+        self.path = path
+        self._stored.set_default(histograms={}, pushed=True)
+        self.framework.observe(self.framework.on.pre_commit, self._on_pre_commit)
+
+    def _on_pre_commit(self, _: ops.PreCommitEvent) -> None:
+        """Record the durations observed during the charm dispatch."""
+        observations = pop_observations()
+        histograms = {
+            name: dict(histogram)
+            for name, histogram in typing.cast(
+                typing.Dict[str, typing.Dict[str, typing.Any]], self._stored.histograms
+            ).items()
+        }
+        for name, values in observations.items():
+            histogram = histograms.setdefault(
+                name, {"buckets": [0] * len(HISTOGRAM_BUCKETS), "sum": 0.0, "count": 0}
+            )
+            histogram["buckets"] = [
+                count + sum(1 for value in values if value <= bound)
+                for bound, count in zip(HISTOGRAM_BUCKETS, histogram["buckets"], strict=True)
+            ]
+            histogram["sum"] = histogram["sum"] + sum(values)
+            histogram["count"] = histogram["count"] + len(values)
+        if observations:
+            self._stored.histograms = histograms
+            self._stored.pushed = False
+        container = self.model.unit.get_container(self.container_name)
+        if typing.cast(bool, self._stored.pushed) or not container.can_connect():
+            return
+        try:
+            container.push(self.path, render(histograms), encoding="utf-8", make_dirs=True)
+        except (ops.pebble.PathError, ops.pebble.APIError) as exc:
+            logger.warning("Failed to write the charm metrics, %s", exc)
+            return
+        self._stored.pushed = True
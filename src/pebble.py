@@ -3,19 +3,50 @@
 
 """The agent pebble service module."""
 
+import hashlib
+import json
 import logging
+import shlex
+import time
 import typing
 
 import ops
 
+import jvm
+import metrics
 import server
 from state import State
 
 logger = logging.getLogger(__name__)
 
+AGENT_JAR_UPDATER_SERVICE = "agent-jar-updater"
+WORKSPACE_GC_SERVICE = "workspace-gc"
+CACHE_BUNDLE_SERVICE = "cache-bundle"
+METRICS_EXPORTER_SERVICE = "metrics-exporter"
+# The agent checks period until the agent is connected, to detect its connection quickly, and
+# once connected, the ready check failing as soon as the agent disconnects.
+STARTUP_CHECK_PERIOD = "2s"
+STEADY_CHECK_PERIOD = "10s"
+# The number of connection check failures restarting the agent service.
+CONNECTION_CHECK_THRESHOLD = 3
+# The environment variable of the agent service holding the fingerprint of its layer.
+AGENT_FINGERPRINT_ENV = "JENKINS_AGENT_FINGERPRINT"
+# The interval in seconds between reads of the agent connection state.
+AGENT_STATE_POLL_INTERVAL = 0.5
+# The agent connection states written by the entrypoint script ending the connection attempt.
+AGENT_STATE_CONNECTED = "connected"
+AGENT_STATE_FAILED = ("rejected", "exited")
+# The interval in seconds between checks of the agent running builds while draining it.
+DRAIN_POLL_INTERVAL = 10
+
 
 class PebbleService:
-    """The charm pebble service manager."""
+    """The charm pebble service manager.
+
+    The unit runs a main agent service and, with several agent services configured, additional
+    agent services suffixed with their index, each with its own work directory and checks.
+    The running agents stopped or restarted within a hook share a single drain grace period.
+    """
 
     def __init__(self, state: State):
         """Initialize the pebble service.
@@ -24,77 +55,713 @@ class PebbleService:
             state: The Jenkins agent k8s state.
         """
         self.state = state
+        self._drain_deadline: typing.Optional[float] = None
+
+    def get_service_name(self, index: int = 0) -> str:
+        """Get the name of an agent service.
+
+        Args:
+            index: The index of the agent, 0 for the main agent.
+
+        Returns:
+            The agent service name.
+        """
+        name = self.state.jenkins_agent_service_name
+        return f"{name}-{index}" if index else name
+
+    def _get_planned_indexes(self, container: ops.Container) -> typing.List[int]:
+        """Get the indexes of the planned agent services.
+
+        Args:
+            container: The agent workload container.
+
+        Returns:
+            The agent indexes, in order.
+        """
+        prefix = f"{self.state.jenkins_agent_service_name}-"
+        return sorted(
+            0 if name == self.state.jenkins_agent_service_name else int(name[len(prefix) :])
+            for name in container.get_plan().services
+            if name == self.state.jenkins_agent_service_name
+            or (name.startswith(prefix) and name[len(prefix) :].isdigit())
+        )
+
+    def _get_agent_count(self) -> int:
+        """Get the number of agent services sharing the workload container.
+
+        Returns:
+            The configured number of agent services, 1 without Jenkins configuration.
+        """
+        return self.state.jenkins_config.agent_services if self.state.jenkins_config else 1
 
     def _get_pebble_layer(
-        self, server_url: str, agent_token_pair: typing.Tuple[str, str]
+        self,
+        server_url: str,
+        agent_token_pair: typing.Tuple[str, str],
+        java_options: str = "",
+        check_period: str = STARTUP_CHECK_PERIOD,
+        index: int = 0,
     ) -> ops.pebble.Layer:
         """Return a dictionary representing a Pebble layer.
 
         Args:
             server_url: The Jenkins server address.
             agent_token_pair: Matching pair of agent name to agent token.
+            java_options: The JVM options of the agent.
+            check_period: The period of the agent checks.
+            index: The index of the agent, 0 for the main agent.
 
         Returns:
             The pebble layer defining Jenkins service layer.
         """
+        environment = {
+            "JENKINS_URL": server_url,
+            "JENKINS_AGENT": agent_token_pair[0],
+            "JENKINS_TOKEN": agent_token_pair[1],
+            "JAVA_OPTS": java_options,
+            # The build tool caches, e.g. ~/.m2, are kept in the Jenkins home directory.
+            "HOME": str(server.JENKINS_WORKDIR),
+        }
+        if index:
+            environment["JENKINS_AGENT_WORKDIR"] = str(server.get_agent_workdir(index))
         layer: ops.pebble.LayerDict = {
             "summary": "Jenkins agent k8s layer",
             "description": "pebble config layer for Jenkins agent k8s.",
             "services": {
-                self.state.jenkins_agent_service_name: {
+                self.get_service_name(index): {
                     "override": "replace",
                     "summary": "Jenkins agent k8s",
                     "command": str(server.ENTRYSCRIPT_PATH),
-                    "environment": {
-                        "JENKINS_URL": server_url,
-                        "JENKINS_AGENT": agent_token_pair[0],
-                        "JENKINS_TOKEN": agent_token_pair[1],
-                    },
+                    "environment": environment,
                     "startup": "enabled",
                     "user": server.USER,
+                    "on-check-failure": {_get_check_name("connection", index): "restart"},
                 },
-            },
-            "checks": {
-                "ready": {
+                AGENT_JAR_UPDATER_SERVICE: {
                     "override": "replace",
-                    "level": "ready",
-                    "exec": {"command": "/bin/cat /var/lib/jenkins/agents/.ready"},
-                    "period": "30s",
-                    "threshold": 5,
-                }
+                    "summary": "Jenkins agent JAR updater",
+                    "command": str(server.AGENT_JAR_UPDATER_PATH),
+                    "environment": {"JENKINS_URL": server_url},
+                    "startup": "enabled",
+                    # Runs as the Pebble user for its custom notices to be visible to the charm.
+                },
             },
+            "checks": _get_checks(check_period, index),
         }
         return ops.pebble.Layer(layer)
 
+    def reconcile_workspace_gc(self, container: ops.Container) -> bool:
+        """Reconcile the workspace garbage collector service.
+
+        The service is planned in its own layer, so that its configuration changes only restart
+        the garbage collector.
+
+        Args:
+            container: The agent workload container.
+
+        Returns:
+            Whether the service was restarted.
+        """
+        gc_config = self.state.workspace_gc_config
+        layer = ops.pebble.Layer(
+            {
+                "summary": "Jenkins agent workspace GC layer",
+                "description": "pebble config layer for the Jenkins agent workspace GC.",
+                "services": {
+                    WORKSPACE_GC_SERVICE: {
+                        "override": "replace",
+                        "summary": "Jenkins agent workspace and remoting log GC",
+                        "command": str(server.WORKSPACE_GC_PATH),
+                        "environment": {
+                            "WORKSPACE_GC_HIGH_WATERMARK": str(gc_config.high_watermark),
+                            "WORKSPACE_GC_LOW_WATERMARK": str(gc_config.low_watermark),
+                            "WORKSPACE_GC_STATS_FILE": str(server.WORKSPACE_GC_STATS_PATH),
+                        },
+                        "startup": "enabled",
+                        "user": server.USER,
+                    }
+                },
+            }
+        )
+        return reconcile_standalone_service(container, WORKSPACE_GC_SERVICE, layer)
+
+    def reconcile_metrics_exporter(self, container: ops.Container) -> bool:
+        """Reconcile the agent metrics exporter service.
+
+        The service is planned in its own layer, so that it is not restarted with the agent.
+
+        Args:
+            container: The agent workload container.
+
+        Returns:
+            Whether the service was restarted.
+        """
+        layer = ops.pebble.Layer(
+            {
+                "summary": "Jenkins agent metrics exporter layer",
+                "description": "pebble config layer for the Jenkins agent metrics exporter.",
+                "services": {
+                    METRICS_EXPORTER_SERVICE: {
+                        "override": "replace",
+                        "summary": "Jenkins agent metrics exporter",
+                        "command": (
+                            "/usr/bin/java -Xmx32m -XX:+UseSerialGC -XX:TieredStopAtLevel=1 "
+                            f"-jar {server.METRICS_EXPORTER_PATH}"
+                        ),
+                        "environment": {
+                            "METRICS_PORT": str(metrics.METRICS_PORT),
+                            "WORKSPACE_GC_STATS_FILE": str(server.WORKSPACE_GC_STATS_PATH),
+                            "CHARM_METRICS_FILE": str(server.CHARM_METRICS_PATH),
+                        },
+                        "startup": "enabled",
+                        "user": server.USER,
+                    }
+                },
+            }
+        )
+        return reconcile_standalone_service(container, METRICS_EXPORTER_SERVICE, layer)
+
+    def is_cache_bundle_unpacking(self, container: ops.Container) -> bool:
+        """Check whether the cache bundle is being unpacked.
+
+        Args:
+            container: The agent workload container.
+
+        Returns:
+            True if the cache bundle unpacking service is running.
+        """
+        return _is_running(container, CACHE_BUNDLE_SERVICE)
+
+    def start_cache_bundle_unpack(self, container: ops.Container) -> None:
+        """Start unpacking the pushed cache bundle entries in the background.
+
+        The unpacking service runs once, without delaying the agent services.
+
+        Args:
+            container: The agent workload container.
+        """
+        layer = ops.pebble.Layer(
+            {
+                "summary": "Jenkins agent cache bundle layer",
+                "description": "pebble config layer for the Jenkins agent cache bundle.",
+                "services": {
+                    CACHE_BUNDLE_SERVICE: {
+                        "override": "replace",
+                        "summary": "Jenkins agent cache bundle unpacking",
+                        "command": str(server.CACHE_BUNDLE_UNPACK_PATH),
+                        "startup": "disabled",
+                        "on-success": "ignore",
+                        "on-failure": "ignore",
+                        "user": server.USER,
+                    }
+                },
+            }
+        )
+        container.add_layer(label=CACHE_BUNDLE_SERVICE, layer=layer, combine=True)
+        try:
+            container.start(CACHE_BUNDLE_SERVICE)
+        except ops.pebble.ChangeError as exc:
+            # Pebble fails the start of a service exiting within a second, e.g. once a small
+            # delta is unpacked. A failed unpacking keeps the pending manifest and is retried.
+            logger.info("Cache bundle unpacking exited quickly, %s", exc)
+
+    @metrics.timed("agent_reconcile_seconds")
     def reconcile(
-        self, server_url: str, agent_token_pair: typing.Tuple[str, str], container: ops.Container
-    ) -> None:
+        self,
+        server_url: str,
+        agent_token_pair: typing.Tuple[str, str],
+        container: ops.Container,
+        index: int = 0,
+    ) -> bool:
         """Reconcile the Jenkins agent service.
 
+        The services and the active agent JAR executable are folded into a fingerprint kept in
+        the agent service environment. The layer is only replanned, restarting the agent, if the
+        fingerprint changed or a service is not running. Otherwise, only the checks are updated.
+        A running agent is drained before being restarted.
+
         Args:
             server_url: The Jenkins server address.
             agent_token_pair: Matching pair of agent name to agent token.
             container: The agent workload container.
+            index: The index of the agent, 0 for the main agent.
+
+        Returns:
+            Whether the layer was replanned.
         """
         agent_layer = self._get_pebble_layer(
-            server_url=server_url, agent_token_pair=agent_token_pair
+            server_url=server_url,
+            agent_token_pair=agent_token_pair,
+            java_options=jvm.get_java_options(
+                jvm.get_resource_limits(container),
+                self.state.jvm_options,
+                agent_count=self._get_agent_count(),
+            ),
+            check_period=self._get_check_period(container, index),
+            index=index,
         )
-        container.add_layer(
-            label=self.state.jenkins_agent_service_name, layer=agent_layer, combine=True
+        fingerprint = _get_fingerprint(
+            agent_layer, server.get_active_agent_jar_sha256(container) or ""
         )
+        if self._is_up_to_date(container, fingerprint, index):
+            logger.debug("Jenkins agent service up to date, skipping replan.")
+            self._update_checks(container, agent_layer, index)
+            return False
+        service_name = self.get_service_name(index)
+        if _is_running(container, service_name):
+            self._drain(container, index=index)
+        agent_layer.services[service_name].environment[AGENT_FINGERPRINT_ENV] = fingerprint
+        container.add_layer(label=service_name, layer=agent_layer, combine=True)
         container.replan()
+        return True
+
+    def _is_up_to_date(self, container: ops.Container, fingerprint: str, index: int) -> bool:
+        """Check whether the planned services match a fingerprint and are running.
+
+        Args:
+            container: The agent workload container.
+            fingerprint: The fingerprint of the desired layer.
+            index: The index of the agent, 0 for the main agent.
 
-    def stop_agent(self, container: ops.Container) -> None:
-        """Stop Jenkins agent.
+        Returns:
+            True if the agent service has the fingerprint and all the services are running.
+        """
+        service_names = (self.get_service_name(index), AGENT_JAR_UPDATER_SERVICE)
+        service = container.get_plan().services.get(self.get_service_name(index))
+        if not service or service.environment.get(AGENT_FINGERPRINT_ENV) != fingerprint:
+            return False
+        services = container.get_services(*service_names)
+        return len(services) == len(service_names) and all(
+            info.is_running() for info in services.values()
+        )
+
+    def _get_check_period(self, container: ops.Container, index: int = 0) -> str:
+        """Get the period of the agent checks, shorter until the agent is connected.
 
         Args:
             container: The agent workload container.
+            index: The index of the agent, 0 for the main agent.
+
+        Returns:
+            The agent checks period.
+        """
+        if _get_agent_state(container, index) == AGENT_STATE_CONNECTED:
+            return STEADY_CHECK_PERIOD
+        return STARTUP_CHECK_PERIOD
+
+    def _update_checks(
+        self, container: ops.Container, layer: ops.pebble.Layer, index: int = 0
+    ) -> None:
+        """Update the planned checks if they differ from the checks of a layer.
+
+        The checks are applied on the plan change, without restarting the services.
+
+        Args:
+            container: The agent workload container.
+            layer: The pebble layer with the desired checks.
+            index: The index of the agent, 0 for the main agent.
+        """
+        planned_checks = container.get_plan().checks
+        if all(
+            name in planned_checks and planned_checks[name].to_dict() == check.to_dict()
+            for name, check in layer.checks.items()
+        ):
+            return
+        logger.info("Updating Jenkins agent checks.")
+        container.add_layer(
+            label=self.get_service_name(index),
+            layer=ops.pebble.Layer({"checks": {n: c.to_dict() for n, c in layer.checks.items()}}),
+            combine=True,
+        )
+
+    def update_checks(self, container: ops.Container) -> None:
+        """Adapt the checks period of the planned agents to their connection state.
+
+        The checks of the agents disabled by stop_extra_agents are left disabled.
+
+        Args:
+            container: The agent workload container.
+        """
+        services = container.get_plan().services
+        for index in self._get_planned_indexes(container):
+            if services[self.get_service_name(index)].startup == "disabled":
+                continue
+            check_period = self._get_check_period(container, index)
+            self._update_checks(
+                container, ops.pebble.Layer({"checks": _get_checks(check_period, index)}), index
+            )
+
+    def start_agent(
+        self,
+        server_url: str,
+        agent_token_pairs: typing.Iterable[typing.Tuple[str, str]],
+        container: ops.Container,
+        timeout: float,
+        index: int = 0,
+    ) -> typing.Optional[typing.Tuple[str, str]]:
+        """Start the Jenkins agent service with the first agent-token pair it connects with.
+
+        The agent service itself validates the pairs, which are tried in order, starting with the
+        pair the service is already running with, if any.
+
+        Args:
+            server_url: The Jenkins server address.
+            agent_token_pairs: Matching pairs of agent name to agent token, by priority.
+            container: The agent workload container.
+            timeout: The time in seconds to wait for the agent to connect with each pair.
+            index: The index of the agent, 0 for the main agent.
+
+        Returns:
+            The agent-token pair the agent connected with. None if no pair is valid, in which case
+            the agent is stopped.
+        """
+        pairs = list(agent_token_pairs)
+        running_pair = self.get_running_pair(container, index)
+        if running_pair in pairs:
+            pairs.remove(running_pair)
+            pairs.insert(0, running_pair)
+        for pair in pairs:
+            if pair != running_pair:
+                # The state left by the agent started with the previous pair.
+                container.remove_path(str(server.get_agent_state_path(index)), recursive=True)
+            self.reconcile(
+                server_url=server_url, agent_token_pair=pair, container=container, index=index
+            )
+            if self._wait_for_connection(container=container, timeout=timeout, index=index):
+                return pair
+            logger.warning("Jenkins agent failed to connect as %s.", pair[0])
+            running_pair = None
+        # The agent is not connected, hence not running builds.
+        if index:
+            self.stop_extra_agents(container=container, agent_count=index, drain=False)
+        else:
+            self.stop_agent(container=container, drain=False)
+        return None
+
+    def get_running_pair(
+        self, container: ops.Container, index: int = 0
+    ) -> typing.Optional[typing.Tuple[str, str]]:
+        """Get the agent-token pair of a planned Jenkins agent service.
+
+        Args:
+            container: The agent workload container.
+            index: The index of the agent, 0 for the main agent.
+
+        Returns:
+            The agent-token pair of the service. None if the service is not planned.
+        """
+        service = container.get_plan().services.get(self.get_service_name(index))
+        if not service:
+            return None
+        agent_name = service.environment.get("JENKINS_AGENT")
+        agent_token = service.environment.get("JENKINS_TOKEN")
+        return (agent_name, agent_token) if agent_name and agent_token else None
+
+    def _wait_for_connection(
+        self, container: ops.Container, timeout: float, index: int = 0
+    ) -> bool:
+        """Wait for the Jenkins agent to connect or fail to.
+
+        Args:
+            container: The agent workload container.
+            timeout: The time in seconds to wait for the agent connection.
+            index: The index of the agent, 0 for the main agent.
+
+        Returns:
+            True if the agent connected before the timeout.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            agent_state = _get_agent_state(container, index)
+            if agent_state == AGENT_STATE_CONNECTED:
+                return True
+            if agent_state in AGENT_STATE_FAILED or time.monotonic() >= deadline:
+                return False
+            time.sleep(AGENT_STATE_POLL_INTERVAL)
+
+    def drain_agent(
+        self, container: ops.Container, timeout: typing.Optional[float] = None
+    ) -> bool:
+        """Wait for the Jenkins agents to finish their running builds.
+
+        Draining only waits, the agent-token pairs do not allow taking the agent node offline on
+        the Jenkins server, the builds scheduled while waiting are waited for as well.
+
+        Args:
+            container: The agent workload container.
+            timeout: The time in seconds to wait for the builds, the rest of the grace period of
+                the hook if None.
+
+        Returns:
+            True if the agents are idle, False if still running builds after the timeout.
+        """
+        return self._drain(container, timeout=timeout)
+
+    def _drain(
+        self,
+        container: ops.Container,
+        timeout: typing.Optional[float] = None,
+        index: typing.Optional[int] = None,
+    ) -> bool:
+        """Wait for a Jenkins agent, or all the agents, to finish their running builds.
+
+        Without timeout, the drains of the hook share the configured grace period, started by the
+        first drain, so that draining several agents does not exceed it.
+
+        Args:
+            container: The agent workload container.
+            timeout: The time in seconds to wait for the builds, the rest of the grace period of
+                the hook if None.
+            index: The index of the agent, all the agents if None.
+
+        Returns:
+            True if the agent is idle, False if still running builds after the timeout.
+        """
+        workdir = server.get_agent_workdir(index) if index is not None else None
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+        else:
+            if self._drain_deadline is None:
+                self._drain_deadline = time.monotonic() + self.state.drain_timeout
+            deadline = self._drain_deadline
+        while server.is_agent_busy(container, workdir):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.warning("Jenkins agent still running builds after the drain timeout.")
+                return False
+            logger.info("Waiting for the Jenkins agent builds to finish.")
+            time.sleep(min(DRAIN_POLL_INTERVAL, remaining))
+        return True
+
+    def stop_agent(self, container: ops.Container, drain: bool = True) -> None:
+        """Stop Jenkins agent, and the additional agents if any.
+
+        Args:
+            container: The agent workload container.
+            drain: Whether to wait for the running builds to finish, up to the grace period.
         """
         try:
             # use get_service to check if service should be stopped rather than stopping and
             # catching ops.pebble.APIError and parsing error message to determine type of error.
-            container.get_service(self.state.jenkins_agent_service_name)
+            service = container.get_service(self.state.jenkins_agent_service_name)
         except ops.ModelError:
             return
+        if drain and service.is_running():
+            self.drain_agent(container)
+        self.stop_extra_agents(container=container, agent_count=1, drain=False)
         container.stop(self.state.jenkins_agent_service_name)
+        if container.get_services(AGENT_JAR_UPDATER_SERVICE):
+            container.stop(AGENT_JAR_UPDATER_SERVICE)
         container.remove_path(str(server.AGENT_READY_PATH), recursive=True)
+        # The entrypoint script, killed with the agent, leaves the agent connected state.
+        container.remove_path(str(server.get_agent_state_path()), recursive=True)
+
+    def stop_extra_agents(
+        self, container: ops.Container, agent_count: int, drain: bool = True
+    ) -> None:
+        """Stop and disable the planned agent services beyond a number of agents.
+
+        Pebble keeps the services in the plan, they are disabled for replans not to start them.
+        The connection state left by the stopped agents is removed.
+
+        Args:
+            container: The agent workload container.
+            agent_count: The number of agent services to keep.
+            drain: Whether to wait for the running builds to finish, up to the grace period.
+        """
+        for index in self._get_planned_indexes(container):
+            if index < agent_count:
+                continue
+            service_name = self.get_service_name(index)
+            check_names = [_get_check_name(check, index) for check in ("ready", "connection")]
+            logger.info("Stopping Jenkins agent service %s.", service_name)
+            container.add_layer(
+                label=service_name,
+                layer=ops.pebble.Layer(
+                    {
+                        "services": {service_name: {"override": "merge", "startup": "disabled"}},
+                        "checks": {
+                            name: {"override": "merge", "startup": "disabled"}
+                            for name in check_names
+                        },
+                    }
+                ),
+                combine=True,
+            )
+            container.stop_checks(*check_names)
+            if container.get_service(service_name).is_running():
+                if drain:
+                    self._drain(container, index=index)
+                container.stop(service_name)
+            container.remove_path(str(server.get_agent_state_path(index)), recursive=True)
+
+    def restart_agent(self, container: ops.Container) -> None:
+        """Restart the running Jenkins agents once drained.
+
+        The agent services are reconciled with their planned configuration, for their fingerprint
+        to reflect the active agent JAR executable, and only restarted if unchanged.
+
+        Args:
+            container: The agent workload container.
+        """
+        for index in self._get_planned_indexes(container) or [0]:
+            service_name = self.get_service_name(index)
+            try:
+                service = container.get_service(service_name)
+            except ops.ModelError:
+                continue
+            if not service.is_running():
+                continue
+            planned = container.get_plan().services.get(service_name)
+            server_url = planned.environment.get("JENKINS_URL") if planned else None
+            agent_token_pair = self.get_running_pair(container, index)
+            if (
+                server_url
+                and agent_token_pair
+                and self.reconcile(
+                    server_url=server_url,
+                    agent_token_pair=agent_token_pair,
+                    container=container,
+                    index=index,
+                )
+            ):
+                continue
+            self._drain(container, index=index)
+            container.restart(service_name)
+
+    def is_agent_connected(self, container: ops.Container) -> bool:
+        """Check whether the Jenkins agent is running and connected to the server.
+
+        Args:
+            container: The agent workload container.
+
+        Returns:
+            True if the agent service is running and the agent state is connected.
+        """
+        try:
+            service = container.get_service(self.state.jenkins_agent_service_name)
+        except ops.ModelError:
+            return False
+        return service.is_running() and _get_agent_state(container) == AGENT_STATE_CONNECTED
+
+
+def reconcile_standalone_service(
+    container: ops.Container, service_name: str, layer: ops.pebble.Layer
+) -> bool:
+    """Plan and restart a service of its own layer if it changed or is not running.
+
+    Args:
+        container: The agent workload container.
+        service_name: The service name.
+        layer: The layer of the service.
+
+    Returns:
+        Whether the service was restarted.
+    """
+    planned = container.get_plan().services.get(service_name)
+    if (
+        planned
+        and planned.to_dict() == layer.services[service_name].to_dict()
+        and _is_running(container, service_name)
+    ):
+        return False
+    container.add_layer(label=service_name, layer=layer, combine=True)
+    container.restart(service_name)
+    return True
+
+
+def _is_running(container: ops.Container, service_name: str) -> bool:
+    """Check whether a service is running.
+
+    Args:
+        container: The agent workload container.
+        service_name: The service name.
+
+    Returns:
+        True if the service exists and is running.
+    """
+    service = container.get_services(service_name).get(service_name)
+    return bool(service and service.is_running())
+
+
+def _get_agent_state(container: ops.Container, index: int = 0) -> str:
+    """Get the agent connection state written by the entrypoint script.
+
+    Args:
+        container: The agent workload container.
+        index: The index of the agent, 0 for the main agent.
+
+    Returns:
+        The agent connection state, empty if unknown.
+    """
+    try:
+        return (
+            container.pull(str(server.get_agent_state_path(index)), encoding="utf-8")
+            .read()
+            .strip()
+        )
+    except ops.pebble.PathError:
+        return ""
+
+
+def _get_check_name(check: str, index: int) -> str:
+    """Get the name of a check of an agent.
+
+    Args:
+        check: The check name for the main agent.
+        index: The index of the agent, 0 for the main agent.
+
+    Returns:
+        The check name suffixed with the agent index, if not the main agent.
+    """
+    return f"{check}-{index}" if index else check
+
+
+def _get_checks(period: str, index: int = 0) -> typing.Dict[str, ops.pebble.CheckDict]:
+    """Get the checks of an agent.
+
+    The ready check fails as soon as the agent is not connected. The connection check restarts
+    the agent service once the agent is neither connected nor connecting in time.
+
+    Args:
+        period: The period of the checks.
+        index: The index of the agent, 0 for the main agent.
+
+    Returns:
+        The agent checks by name.
+    """
+    state_path = server.get_agent_state_path(index)
+    connection_script = server.AGENT_CONNECTION_CHECK_SCRIPT.format(
+        state_path=state_path, timeout=server.AGENT_CONNECT_TIMEOUT
+    )
+    return {
+        _get_check_name("ready", index): {
+            "override": "replace",
+            "level": "ready",
+            "exec": {"command": f"/bin/grep -qx {AGENT_STATE_CONNECTED} {state_path}"},
+            "period": period,
+            "threshold": 1,
+        },
+        _get_check_name("connection", index): {
+            "override": "replace",
+            "exec": {"command": f"/bin/sh -c {shlex.quote(connection_script)}"},
+            "period": period,
+            "threshold": CONNECTION_CHECK_THRESHOLD,
+        },
+    }
+
+
+def _get_fingerprint(layer: ops.pebble.Layer, agent_jar_sha256: str) -> str:
+    """Get the fingerprint of the services of a layer and of the agent JAR executable they run.
+
+    Args:
+        layer: The pebble layer, without fingerprint.
+        agent_jar_sha256: The SHA-256 hex digest of the active agent JAR executable.
+
+    Returns:
+        The SHA-256 hex digest of the services and the agent JAR executable digest.
+    """
+    services = {name: service.to_dict() for name, service in layer.services.items()}
+    digest = hashlib.sha256(json.dumps(services, sort_keys=True).encode("utf-8"))
+    digest.update(agent_jar_sha256.encode("utf-8"))
+    return digest.hexdigest()
@@ -0,0 +1,146 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""The streaming parser of the Jenkins agent remoting logs."""
+
+import collections
+import enum
+import time
+import typing
+from dataclasses import dataclass
+
+# The number of last log lines kept for diagnostics.
+REMOTING_LOG_TAIL_SIZE = 50
+
+
+class RemotingEventType(str, enum.Enum):
+    """The type of a remoting log event.
+
+    Attrs:
+        CONNECTING: The agent is locating or connecting to the server.
+        PROTOCOL: The agent is trying a remoting protocol, e.g. JNLP4-connect.
+        CONNECTED: The agent is connected to the server.
+        REJECTED: The server rejected the agent connection.
+        TERMINATED: The agent connection was terminated.
+    """
+
+    CONNECTING = "connecting"
+    PROTOCOL = "protocol"
+    CONNECTED = "connected"
+    REJECTED = "rejected"
+    TERMINATED = "terminated"
+
+
+@dataclass(frozen=True)
+class RemotingEvent:
+    """A remoting log event.
+
+    Attrs:
+        type: The event type.
+        detail: The event detail, e.g. the server address or the protocol name.
+        elapsed: The time in seconds since the parser was created, i.e. the agent was started.
+    """
+
+    type: RemotingEventType
+    detail: str
+    elapsed: float
+
+
+# The java.util.logging level prefix of the informational remoting messages.
+_INFO_PREFIX = "INFO: "
+# The informational remoting message prefixes by event type, followed by the event detail.
+_INFO_EVENTS = (
+    ("Connected", RemotingEventType.CONNECTED),
+    ("Terminated", RemotingEventType.TERMINATED),
+    ("Trying protocol: ", RemotingEventType.PROTOCOL),
+    ("Locating server among ", RemotingEventType.CONNECTING),
+    ("Connecting to ", RemotingEventType.CONNECTING),
+)
+# The remoting message of a rejected connection, logged as a severe message and an exception.
+_REJECTED_MESSAGE = "The server rejected the connection"
+
+
+class RemotingLogParser:
+    """Turn the remoting log lines of an agent into events, keeping only the last lines.
+
+    Attrs:
+        tail: The last log lines, without line endings.
+        connected: Whether the agent has connected.
+        rejected: Whether the agent connection was rejected or terminated.
+        protocol: The last remoting protocol tried by the agent.
+        connect_latency: The time in seconds the agent took to connect.
+    """
+
+    def __init__(
+        self,
+        tail_size: int = REMOTING_LOG_TAIL_SIZE,
+        clock: typing.Callable[[], float] = time.monotonic,
+    ):
+        """Initialize the parser.
+
+        Args:
+            tail_size: The number of last log lines kept.
+            clock: The monotonic clock measuring the event times.
+        """
+        self.tail: typing.Deque[str] = collections.deque(maxlen=tail_size)
+        self.connected = False
+        self.rejected = False
+        self.protocol: typing.Optional[str] = None
+        self.connect_latency: typing.Optional[float] = None
+        self._clock = clock
+        self._start = clock()
+
+    def feed(self, line: str) -> typing.Optional[RemotingEvent]:
+        """Parse a remoting log line.
+
+        Args:
+            line: The remoting log line.
+
+        Returns:
+            The event of the log line, if any.
+        """
+        line = line.rstrip("\r\n")
+        self.tail.append(line)
+        # Plain string prefix matching keeps the parsing cost low on chatty agents.
+        if line.startswith(_INFO_PREFIX):
+            message = line[len(_INFO_PREFIX) :]
+            event_type, detail = next(
+                (
+                    (event_type, message[len(prefix) :].strip())
+                    for prefix, event_type in _INFO_EVENTS
+                    if message.startswith(prefix)
+                ),
+                (None, ""),
+            )
+        elif (index := line.find(_REJECTED_MESSAGE)) >= 0:
+            event_type = RemotingEventType.REJECTED
+            detail = line[index + len(_REJECTED_MESSAGE) :].lstrip(":").strip()
+        else:
+            return None
+        if not event_type:
+            return None
+        event = RemotingEvent(type=event_type, detail=detail, elapsed=self._clock() - self._start)
+        self._update(event)
+        return event
+
+    def _update(self, event: RemotingEvent) -> None:
+        """Update the agent connection status with an event.
+
+        Args:
+            event: The remoting log event.
+        """
+        if event.type == RemotingEventType.CONNECTED and not self.connected:
+            self.connected = True
+            self.connect_latency = event.elapsed
+        elif event.type in (RemotingEventType.REJECTED, RemotingEventType.TERMINATED):
+            self.rejected = True
+        elif event.type == RemotingEventType.PROTOCOL:
+            self.protocol = event.detail
+
+    def get_tail(self) -> str:
+        """Get the last log lines.
+
+        Returns:
+            The last log lines joined with line endings.
+        """
+        return "\n".join(self.tail)
@@ -3,22 +3,120 @@
 
 """Functions to interact with jenkins server."""
 
+import concurrent.futures
+import functools
+import hashlib
+import json
 import logging
 import random
+import re
+import tempfile
+import threading
 import time
 import typing
+import zipfile
 from pathlib import Path
 
 import ops
 import requests
-from pydantic import BaseModel
+import requests.adapters
+from pydantic import BaseModel, ValidationError
+
+import jar_store
+import metrics
+import remoting_log
 
 logger = logging.getLogger(__name__)
 
 JENKINS_WORKDIR = Path("/var/lib/jenkins")
 AGENT_JAR_PATH = Path(JENKINS_WORKDIR / "agent.jar")
+# The content-addressed store of agent JAR executables, AGENT_JAR_PATH links to the active one.
+AGENT_JAR_STORE_PATH = Path(JENKINS_WORKDIR / "agent-jars")
+# The class data sharing archive of the active agent JAR executable, ignored by the JVM if missing.
+AGENT_JAR_ARCHIVE_PATH = AGENT_JAR_PATH.with_suffix(".jsa")
+# The agent JAR executable baked into the rock and its metadata.
+ROCK_AGENT_JAR_PATH = Path("/usr/share/jenkins/agent.jar")
+ROCK_AGENT_JAR_METADATA_PATH = Path("/usr/share/jenkins/agent.jar.json")
 AGENT_READY_PATH = Path(JENKINS_WORKDIR / "agents/.ready")
-ENTRYSCRIPT_PATH = Path(JENKINS_WORKDIR / "entrypoint.sh")
+AGENT_STATE_PATH = Path(JENKINS_WORKDIR / "agents/.state")
+# The rock scripts, outside of the Jenkins home directory which may be a mounted volume.
+ROCK_BIN_PATH = Path("/usr/local/bin")
+ENTRYSCRIPT_PATH = Path(ROCK_BIN_PATH / "entrypoint.sh")
+# The time in seconds the agent is allowed to connect before its service is restarted.
+AGENT_CONNECT_TIMEOUT = 120
+# Fails unless the agent is connected, or connecting for less than AGENT_CONNECT_TIMEOUT, given
+# the state file of the agent.
+AGENT_CONNECTION_CHECK_SCRIPT = """
+state="$(cat {state_path})" || exit 1
+[ "$state" = connected ] && exit 0
+[ "$state" = connecting ] && \\
+    [ $(( $(date +%s) - $(stat -c %Y {state_path}) )) -lt {timeout} ]
+"""
+# The work directories of the additional agents run by a unit, by agent index.
+AGENT_NODES_PATH = Path(JENKINS_WORKDIR / "nodes")
+# The background updater notifying the charm of Jenkins server version changes.
+AGENT_JAR_UPDATER_PATH = Path(ROCK_BIN_PATH / "agent-jar-updater.sh")
+# The Jenkins server version the installed agent JAR executable was last checked against.
+AGENT_JAR_VERSION_PATH = Path(AGENT_JAR_STORE_PATH / ".version")
+AGENT_JAR_UPDATE_NOTICE = "canonical.com/jenkins-agent-k8s/agent-jar-update"
+# The garbage collector of the workspaces and remoting logs, and the outcome of its last run,
+# served by the agent metrics exporter.
+WORKSPACE_GC_PATH = Path(ROCK_BIN_PATH / "workspace-gc.sh")
+WORKSPACE_GC_STATS_PATH = Path(JENKINS_WORKDIR / ".workspace-gc.json")
+# Unpacks the cache bundle entries pushed by the charm in the background.
+CACHE_BUNDLE_UNPACK_PATH = Path(ROCK_BIN_PATH / "cache-bundle-unpack.sh")
+# The agent metrics exporter baked into the rock, serving the charm timings written by the charm.
+METRICS_EXPORTER_PATH = Path("/usr/share/jenkins/metrics-exporter.jar")
+CHARM_METRICS_PATH = Path(JENKINS_WORKDIR / ".metrics/charm.prom")
+# Prints "busy" if a Java process, i.e. the agent, has child processes, i.e. running builds. The
+# first argument, if not empty, restricts the check to the agent run in that work directory.
+AGENT_BUSY_SCRIPT = """
+for comm in /proc/[0-9]*/comm; do
+    [ "$(cat "$comm" 2>/dev/null)" = java ] || continue
+    if [ -n "${1:-}" ]; then
+        tr '\\0' ' ' < "${comm%/comm}/cmdline" 2>/dev/null | grep -qF -- "-workDir $1 " || continue
+    fi
+    task="${comm%/comm}/task"
+    if cat "$task"/*/children 2>/dev/null | grep -q .; then
+        echo busy
+        exit 0
+    fi
+done
+"""
+# The charm container directory keeping partially downloaded agent JAR executables to resume.
+AGENT_JAR_DOWNLOAD_DIR = Path(tempfile.gettempdir()) / "jenkins-agent-k8s"
+# The size of the chunks used to stream the agent JAR executable from the server.
+AGENT_JAR_CHUNK_SIZE = 64 * 1024
+# The total time in seconds allowed to download the agent JAR executable, including retries.
+AGENT_JAR_DOWNLOAD_BUDGET = 300
+# The total time in seconds allowed to download the agent JAR executable from a peer unit before
+# falling back to the Jenkins server.
+AGENT_JAR_PEER_DOWNLOAD_BUDGET = 30
+# The connect and read timeouts in seconds of a single agent JAR executable request.
+AGENT_JAR_DOWNLOAD_TIMEOUT = (10, 60)
+# The base and maximum delays in seconds of the exponential backoff between download attempts.
+AGENT_JAR_DOWNLOAD_BACKOFF_BASE = 1.0
+AGENT_JAR_DOWNLOAD_BACKOFF_MAX = 30.0
+
+# The number of hosts and the number of connections per host kept in the HTTP connection pool.
+HTTP_POOL_CONNECTIONS = 4
+HTTP_POOL_MAXSIZE = 10
+# The number of retries of failed connections and transient server errors per request.
+HTTP_RETRIES = 3
+
+# The time in seconds allowed for the agent to start and connect with the credentials being
+# validated, extended by a number of measured server round trips, up to a maximum.
+CREDENTIALS_VALIDATION_TIMEOUT = 5
+CREDENTIALS_VALIDATION_ROUND_TRIPS = 20
+CREDENTIALS_VALIDATION_MAX_TIMEOUT = 60
+# The number of requests sent to measure the server round trip time.
+ROUND_TRIP_TIME_SAMPLES = 3
+# The remoting log events confirming or rejecting the agent connection to the server.
+AGENT_OUTCOME_EVENTS = (
+    remoting_log.RemotingEventType.CONNECTED,
+    remoting_log.RemotingEventType.REJECTED,
+    remoting_log.RemotingEventType.TERMINATED,
+)
 
 USER = "_daemon_"
 
@@ -35,6 +133,55 @@ class Credentials(BaseModel):
     secret: str
 
 
+class AgentJarMetadata(BaseModel):
+    """The metadata of the agent JAR executable installed in the workload container.
+
+    Attrs:
+        sha256: The SHA-256 hex digest of the agent JAR executable.
+        etag: The ETag header value returned by the server with the agent JAR executable.
+        last_modified: The Last-Modified header value returned by the server with the agent JAR
+            executable.
+        version: The Jenkins server version serving the agent JAR executable, if known.
+    """
+
+    sha256: str
+    etag: typing.Optional[str] = None
+    last_modified: typing.Optional[str] = None
+    version: typing.Optional[str] = None
+
+
+class BundledAgentJar(BaseModel):
+    """An agent JAR executable bundled with the charm resource or the rock.
+
+    Attrs:
+        sha256: The SHA-256 hex digest of the agent JAR executable.
+        version: The remoting version of the agent JAR executable.
+        path: The path of the agent JAR executable.
+        in_container: Whether the path is in the workload container or in the charm container.
+    """
+
+    sha256: str
+    version: str
+    path: Path
+    in_container: bool = False
+
+
+class _PartialDownload(BaseModel):
+    """The state of a partially downloaded agent JAR executable.
+
+    Attrs:
+        etag: The ETag header value of the downloaded representation.
+        last_modified: The Last-Modified header value of the downloaded representation.
+        total_size: The total size in bytes of the agent JAR executable, if known.
+        version: The Jenkins server version (X-Jenkins header) of the downloaded representation.
+    """
+
+    etag: typing.Optional[str] = None
+    last_modified: typing.Optional[str] = None
+    total_size: typing.Optional[int] = None
+    version: typing.Optional[str] = None
+
+
 class ServerBaseError(Exception):
     """Represents errors with interacting with Jenkins server."""
 
@@ -43,26 +190,694 @@ class AgentJarDownloadError(ServerBaseError):
     """Represents an error downloading agent JAR executable."""
 
 
-def download_jenkins_agent(server_url: str, container: ops.Container) -> None:
+def create_http_session() -> requests.Session:
+    """Create the pooled HTTP session used for all requests to the Jenkins server.
+
+    The session keeps the connections alive to be reused across requests and retries failed
+    connections and transient server errors with backoff. Read errors are not retried since the
+    agent JAR executable download resumes them with range requests.
+
+    Returns:
+        The HTTP session.
+    """
+    retry = requests.adapters.Retry(
+        total=HTTP_RETRIES,
+        connect=HTTP_RETRIES,
+        read=0,
+        status=HTTP_RETRIES,
+        backoff_factor=0.5,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(("GET", "HEAD")),
+        raise_on_status=False,
+    )
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _get_server_version(session: requests.Session, url: str) -> typing.Optional[str]:
+    """Get the Jenkins server version advertised with the agent JAR executable.
+
+    Args:
+        session: The HTTP session to the Jenkins server.
+        url: The agent JAR executable URL.
+
+    Returns:
+        The X-Jenkins header value. None if the server could not be reached or did not advertise it.
+    """
+    try:
+        # Unlike the other methods, HEAD requests do not follow redirects by default.
+        res = session.head(url, timeout=AGENT_JAR_DOWNLOAD_TIMEOUT, allow_redirects=True)
+        res.raise_for_status()
+    except requests.RequestException as exc:
+        logger.warning("Failed to get Jenkins server version, %s", exc)
+        return None
+    return res.headers.get("X-Jenkins")
+
+
+def _get_partial_download_paths(server_url: str) -> typing.Tuple[Path, Path]:
+    """Get the paths of the partial download file and its state for the given server.
+
+    Args:
+        server_url: The Jenkins server URL address.
+
+    Returns:
+        The partial agent JAR executable file path and its download state file path.
+    """
+    key = hashlib.sha256(server_url.encode("utf-8")).hexdigest()[:16]
+    return (AGENT_JAR_DOWNLOAD_DIR / f"{key}.jar.part", AGENT_JAR_DOWNLOAD_DIR / f"{key}.json")
+
+
+def _load_partial_download(part_path: Path, state_path: Path) -> _PartialDownload:
+    """Load the state of a partial download to resume from.
+
+    Args:
+        part_path: The partial agent JAR executable file path.
+        state_path: The partial download state file path.
+
+    Returns:
+        The partial download state. An empty state if there is nothing to resume from.
+    """
+    if not part_path.exists() or not state_path.exists():
+        return _PartialDownload()
+    try:
+        return _PartialDownload.model_validate_json(state_path.read_text(encoding="utf-8"))
+    except ValidationError as exc:
+        logger.warning("Invalid partial download state, restarting download, %s", exc)
+        return _PartialDownload()
+
+
+def _parse_total_size(response: requests.Response) -> typing.Optional[int]:
+    """Parse the total size of the requested representation from the response headers.
+
+    Args:
+        response: The agent JAR executable response.
+
+    Returns:
+        The total size in bytes if advertised by the server, None otherwise.
+    """
+    if response.status_code == requests.codes.partial_content:
+        # Content-Range: bytes <first>-<last>/<total>
+        total = response.headers.get("Content-Range", "").rpartition("/")[2]
+    else:
+        total = response.headers.get("Content-Length", "")
+    return int(total) if total.isdigit() else None
+
+
+def _resume_download(
+    session: requests.Session,
+    url: str,
+    headers: typing.Dict[str, str],
+    part_path: Path,
+    state_path: Path,
+) -> typing.Optional[_PartialDownload]:
+    """Download the remainder of the agent JAR executable into the partial download file.
+
+    Args:
+        session: The HTTP session to the Jenkins server.
+        url: The agent JAR executable URL.
+        headers: The conditional request headers for the installed agent JAR executable.
+        part_path: The partial agent JAR executable file path.
+        state_path: The partial download state file path.
+
+    Returns:
+        The partial download state. None if the server responded with 304 Not Modified.
+    """
+    partial = _load_partial_download(part_path=part_path, state_path=state_path)
+    offset = part_path.stat().st_size if part_path.exists() else 0
+    request_headers = dict(headers)
+    if offset and (validator := partial.etag or partial.last_modified):
+        # If-Range makes the server send the full representation if it changed since.
+        request_headers["Range"] = f"bytes={offset}-"
+        request_headers["If-Range"] = validator
+    res = session.get(
+        url, headers=request_headers, stream=True, timeout=AGENT_JAR_DOWNLOAD_TIMEOUT
+    )
+    with res:
+        if headers and res.status_code == requests.codes.not_modified:
+            return None
+        if res.status_code == requests.codes.requested_range_not_satisfiable:
+            logger.warning("Partial agent JAR download cannot be resumed, restarting download.")
+            part_path.unlink()
+            state_path.unlink(missing_ok=True)
+        res.raise_for_status()
+        mode = "ab"
+        if res.status_code != requests.codes.partial_content:
+            mode = "wb"
+            partial = _PartialDownload(
+                etag=res.headers.get("ETag"),
+                last_modified=res.headers.get("Last-Modified"),
+                total_size=_parse_total_size(res),
+                version=res.headers.get("X-Jenkins"),
+            )
+            state_path.write_text(partial.model_dump_json(), encoding="utf-8")
+        elif partial.total_size is None:
+            partial.total_size = _parse_total_size(res)
+        with part_path.open(mode) as part_file:
+            for chunk in res.iter_content(chunk_size=AGENT_JAR_CHUNK_SIZE):
+                part_file.write(chunk)
+    return partial
+
+
+def _is_retryable(exc: requests.RequestException) -> bool:
+    """Check whether a failed agent JAR executable request should be retried.
+
+    Args:
+        exc: The request exception.
+
+    Returns:
+        True if the error is transient, False otherwise.
+    """
+    if isinstance(exc, requests.HTTPError):
+        return exc.response is not None and (
+            exc.response.status_code >= 500
+            or exc.response.status_code == requests.codes.requested_range_not_satisfiable
+        )
+    return isinstance(
+        exc,
+        (requests.exceptions.ChunkedEncodingError, requests.Timeout, requests.ConnectionError),
+    )
+
+
+def _download_with_retries(
+    session: requests.Session,
+    url: str,
+    headers: typing.Dict[str, str],
+    part_path: Path,
+    state_path: Path,
+    budget: typing.Optional[float] = None,
+) -> typing.Optional[_PartialDownload]:
+    """Download the agent JAR executable, resuming with jittered exponential backoff on errors.
+
+    Args:
+        session: The HTTP session to the Jenkins server.
+        url: The agent JAR executable URL.
+        headers: The conditional request headers for the installed agent JAR executable.
+        part_path: The partial agent JAR executable file path.
+        state_path: The partial download state file path.
+        budget: The total time in seconds allowed, AGENT_JAR_DOWNLOAD_BUDGET by default.
+
+    Raises:
+        AgentJarDownloadError: If the download did not complete within the time budget.
+
+    Returns:
+        The completed download state. None if the server responded with 304 Not Modified.
+    """
+    deadline = time.monotonic() + (AGENT_JAR_DOWNLOAD_BUDGET if budget is None else budget)
+    attempt = 0
+    while True:
+        try:
+            partial = _resume_download(
+                session=session,
+                url=url,
+                headers=headers,
+                part_path=part_path,
+                state_path=state_path,
+            )
+        except requests.RequestException as exc:
+            if not _is_retryable(exc):
+                logger.error("Failed to download agent JAR executable from server, %s", exc)
+                raise AgentJarDownloadError(
+                    "Failed to download agent JAR executable from server."
+                ) from exc
+            error: typing.Union[requests.RequestException, str] = exc
+        else:
+            size = part_path.stat().st_size if part_path.exists() else 0
+            if partial is None or partial.total_size in (None, size):
+                return partial
+            error = "incomplete download"
+        attempt += 1
+        # Full jitter spreads the retries of the units downloading from the same server.
+        delay = random.uniform(  # nosec  # noqa: S311
+            0, min(AGENT_JAR_DOWNLOAD_BACKOFF_MAX, AGENT_JAR_DOWNLOAD_BACKOFF_BASE * 2**attempt)
+        )
+        if time.monotonic() + delay >= deadline:
+            logger.error("Failed to download agent JAR executable within budget, %s", error)
+            raise AgentJarDownloadError("Failed to download agent JAR executable from server.")
+        logger.warning("Agent JAR download attempt %d failed, %s. Resuming.", attempt, error)
+        time.sleep(delay)
+
+
+def _validate_agent_jar(path: Path) -> str:
+    """Validate the downloaded agent JAR executable archive.
+
+    Args:
+        path: The downloaded agent JAR executable path.
+
+    Raises:
+        AgentJarDownloadError: If the file is not a valid JAR archive.
+
+    Returns:
+        The SHA-256 hex digest of the agent JAR executable.
+    """
+    try:
+        with zipfile.ZipFile(path) as jar:
+            corrupted = jar.testzip()
+    except zipfile.BadZipFile as exc:
+        raise AgentJarDownloadError("Downloaded agent JAR executable is invalid.") from exc
+    if corrupted:
+        raise AgentJarDownloadError(f"Downloaded agent JAR executable is corrupted: {corrupted}")
+    digest = hashlib.sha256()
+    with path.open("rb") as jar_file:
+        while chunk := jar_file.read(AGENT_JAR_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _get_agent_jar_store(container: ops.Container) -> jar_store.AgentJarStore:
+    """Get the agent JAR executable store of the workload container.
+
+    Args:
+        container: The agent workload container.
+
+    Returns:
+        The agent JAR executable store.
+    """
+    return jar_store.AgentJarStore(
+        container=container, store_path=AGENT_JAR_STORE_PATH, link_path=AGENT_JAR_PATH, user=USER
+    )
+
+
+def get_agent_workdir(index: int = 0) -> Path:
+    """Get the work directory of an agent run by the unit.
+
+    Args:
+        index: The index of the agent, 0 for the main agent.
+
+    Returns:
+        The Jenkins home directory for the main agent, a directory per index otherwise.
+    """
+    return AGENT_NODES_PATH / str(index) if index else JENKINS_WORKDIR
+
+
+def get_agent_state_path(index: int = 0) -> Path:
+    """Get the connection state file of an agent run by the unit.
+
+    Args:
+        index: The index of the agent, 0 for the main agent.
+
+    Returns:
+        The agent connection state file path, AGENT_STATE_PATH for the main agent.
+    """
+    return get_agent_workdir(index) / AGENT_STATE_PATH.relative_to(JENKINS_WORKDIR)
+
+
+def get_active_agent_jar_sha256(container: ops.Container) -> typing.Optional[str]:
+    """Get the SHA-256 digest of the active agent JAR executable of the workload container.
+
+    Args:
+        container: The agent workload container.
+
+    Returns:
+        The SHA-256 hex digest of the active agent JAR executable, None if not installed.
+    """
+    return _get_agent_jar_store(container).index.active
+
+
+def _to_agent_jar_metadata(
+    entry: jar_store.StoreEntry, version: typing.Optional[str]
+) -> AgentJarMetadata:
+    """Convert a stored agent JAR executable entry to its metadata.
+
+    Args:
+        entry: The stored agent JAR executable entry.
+        version: The Jenkins server version serving the agent JAR executable.
+
+    Returns:
+        The agent JAR executable metadata.
+    """
+    return AgentJarMetadata(
+        sha256=entry.sha256, etag=entry.etag, last_modified=entry.last_modified, version=version
+    )
+
+
+@metrics.timed("agent_jar_download_seconds")
+def download_jenkins_agent(
+    server_url: str, container: ops.Container, session: requests.Session, activate: bool = True
+) -> AgentJarMetadata:
     """Download Jenkins agent JAR executable from server.
 
+    The agent JAR executables are kept in a content-addressed store in the container, keyed by
+    their SHA-256 digest and by the Jenkins server versions serving them. If the server version
+    matches a stored JAR executable, it is activated without downloading. Otherwise, a
+    conditional request is made using the metadata of the active JAR executable. The content is
+    streamed in chunks to a partial download file in the charm container, which is resumed with
+    range requests if the connection drops, and validated before being pushed to the store.
+
     Args:
         server_url: The Jenkins server URL address.
         container: The agent workload container.
+        session: The HTTP session to the Jenkins server.
+        activate: Whether to activate the JAR executable or only stage it in the store.
 
     Raises:
         AgentJarDownloadError: If an error occurred downloading the JAR executable.
+
+    Returns:
+        The metadata of the agent JAR executable installed in the container.
     """
+    store = _get_agent_jar_store(container=container)
+    url = f"{server_url}/jnlpJars/agent.jar"
+    version = _get_server_version(session=session, url=url) if store.index.entries else None
+    if version and (entry := store.find_by_version(version)):
+        logger.info("Agent JAR executable for Jenkins %s found in store.", version)
+        if activate:
+            store.activate(entry.sha256)
+        return _to_agent_jar_metadata(entry, version)
+    active = store.active
+    headers = {}
+    if active and active.etag:
+        headers["If-None-Match"] = active.etag
+    if active and active.last_modified:
+        headers["If-Modified-Since"] = active.last_modified
+    part_path, state_path = _get_partial_download_paths(server_url=server_url)
+    AGENT_JAR_DOWNLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    # The partial download is kept to be resumed on the next attempt if the download fails.
+    partial = _download_with_retries(
+        session=session, url=url, headers=headers, part_path=part_path, state_path=state_path
+    )
     try:
-        res = requests.get(f"{server_url}/jnlpJars/agent.jar", timeout=300)
+        if active and partial is None:
+            logger.info("Agent JAR executable not modified, skipping download.")
+            entry = active.model_copy(update={"versions": [version] if version else []})
+            store.update(entry)
+        else:
+            # A 304 Not Modified response to an unconditional request fails the validation.
+            partial = partial or _PartialDownload()
+            version = partial.version or version
+            entry = jar_store.StoreEntry(
+                sha256=_validate_agent_jar(part_path),
+                size=part_path.stat().st_size,
+                etag=partial.etag,
+                last_modified=partial.last_modified,
+                versions=[version] if version else [],
+            )
+            # Pebble writes the pushed file to a temporary file and renames it into place.
+            with part_path.open("rb") as jar_file:
+                store.add(entry, jar_file)
+    finally:
+        part_path.unlink(missing_ok=True)
+        state_path.unlink(missing_ok=True)
+    if activate:
+        store.activate(entry.sha256)
+    return _to_agent_jar_metadata(store.index.entries[entry.sha256], version)
+
+
+def download_peer_agent_jar(
+    url: str, metadata: AgentJarMetadata, container: ops.Container, session: requests.Session
+) -> AgentJarMetadata:
+    """Download the agent JAR executable published by a peer unit.
+
+    The agent JAR executable is activated from the store without downloading it if it is
+    already stored.
+
+    Args:
+        url: The agent JAR executable URL served by the peer unit.
+        metadata: The metadata of the agent JAR executable published by the peer unit.
+        container: The agent workload container.
+        session: The HTTP session to the peer unit.
+
+    Raises:
+        AgentJarDownloadError: If an error occurred downloading the JAR executable or if its
+            digest does not match the published one.
+
+    Returns:
+        The metadata of the agent JAR executable installed in the container.
+    """
+    store = _get_agent_jar_store(container=container)
+    entry = jar_store.StoreEntry(
+        sha256=metadata.sha256,
+        etag=metadata.etag,
+        last_modified=metadata.last_modified,
+        versions=[metadata.version] if metadata.version else [],
+    )
+    if entry.sha256 in store.index.entries:
+        store.update(entry)
+    else:
+        part_path, state_path = _get_partial_download_paths(server_url=url)
+        AGENT_JAR_DOWNLOAD_DIR.mkdir(parents=True, exist_ok=True)
+        try:
+            _download_with_retries(
+                session=session,
+                url=url,
+                headers={},
+                part_path=part_path,
+                state_path=state_path,
+                budget=AGENT_JAR_PEER_DOWNLOAD_BUDGET,
+            )
+            if _validate_agent_jar(part_path) != entry.sha256:
+                raise AgentJarDownloadError("Peer agent JAR executable digest mismatch.")
+            entry.size = part_path.stat().st_size
+            with part_path.open("rb") as jar_file:
+                store.add(entry, jar_file)
+        finally:
+            part_path.unlink(missing_ok=True)
+            state_path.unlink(missing_ok=True)
+    store.activate(entry.sha256)
+    return _to_agent_jar_metadata(store.index.entries[entry.sha256], metadata.version)
+
+
+def is_agent_busy(container: ops.Container, workdir: typing.Optional[Path] = None) -> bool:
+    """Check whether the agent is running builds.
+
+    Builds run as child processes of the agent Java process.
+
+    Args:
+        container: The agent workload container.
+        workdir: The work directory of the agent to check, any agent if None.
+
+    Returns:
+        True if the agent has running child processes, False otherwise.
+    """
+    stdout, _ = container.exec(
+        ["bash", "-c", AGENT_BUSY_SCRIPT, "bash", str(workdir or "")], user=USER
+    ).wait_output()
+    return stdout.strip() == "busy"
+
+
+def get_remoting_minimum_version(
+    server_url: str, session: requests.Session
+) -> typing.Optional[str]:
+    """Get the minimum agent remoting version supported by the Jenkins server.
+
+    Args:
+        server_url: The Jenkins server URL address.
+        session: The HTTP session to the Jenkins server.
+
+    Returns:
+        The X-Remoting-Minimum-Version header value. None if the server could not be reached or
+        did not advertise it.
+    """
+    try:
+        res = session.head(
+            f"{server_url}/tcpSlaveAgentListener/",
+            timeout=AGENT_JAR_DOWNLOAD_TIMEOUT,
+            allow_redirects=True,
+        )
         res.raise_for_status()
-    except (requests.HTTPError, requests.Timeout, requests.ConnectionError) as exc:
-        logger.error("Failed to download agent JAR executable from server, %s", exc)
-        raise AgentJarDownloadError(
-            "Failed to download agent JAR executable from server."
-        ) from exc
+    except requests.RequestException as exc:
+        logger.warning("Failed to get Jenkins server remoting minimum version, %s", exc)
+        return None
+    return res.headers.get("X-Remoting-Minimum-Version")
+
+
+def _parse_remoting_version(version: str) -> typing.Tuple[int, ...]:
+    """Parse the leading numeric components of a remoting version.
+
+    Remoting versions are either dotted numbers, e.g. 4.13, or incrementals, e.g.
+    3107.v665000b_51092, where only the leading number is ordered.
+
+    Args:
+        version: The remoting version.
+
+    Returns:
+        The leading numeric components of the version.
+    """
+    match = re.match(r"\d+(\.\d+)*", version)
+    if not match:
+        return ()
+    return tuple(int(component) for component in match.group(0).split("."))
+
+
+def is_remoting_version_compatible(version: str, minimum_version: typing.Optional[str]) -> bool:
+    """Check whether an agent remoting version is supported by the Jenkins server.
+
+    Args:
+        version: The agent remoting version.
+        minimum_version: The minimum remoting version supported by the Jenkins server, if known.
+
+    Returns:
+        True if the agent remoting version is not below the minimum version, or if the minimum
+        version is unknown.
+    """
+    if not minimum_version:
+        return True
+    return _parse_remoting_version(version) >= _parse_remoting_version(minimum_version)
+
+
+def get_rock_agent_jar(container: ops.Container) -> typing.Optional[BundledAgentJar]:
+    """Get the agent JAR executable baked into the rock.
+
+    Args:
+        container: The agent workload container.
+
+    Returns:
+        The agent JAR executable baked into the rock. None if the rock does not provide one.
+    """
+    if not container.exists(str(ROCK_AGENT_JAR_METADATA_PATH)):
+        return None
+    try:
+        metadata = json.loads(
+            container.pull(ROCK_AGENT_JAR_METADATA_PATH, encoding="utf-8").read()
+        )
+        return BundledAgentJar(**metadata, path=ROCK_AGENT_JAR_PATH, in_container=True)
+    except (ops.pebble.PathError, ValueError, TypeError) as exc:
+        logger.warning("Invalid rock agent JAR metadata, ignoring, %s", exc)
+        return None
+
 
-    container.push(path=AGENT_JAR_PATH, make_dirs=True, source=res.content, user=USER)
+def read_agent_jar(path: Path) -> BundledAgentJar:
+    """Read an agent JAR executable from the charm container.
+
+    Args:
+        path: The agent JAR executable path.
+
+    Raises:
+        AgentJarDownloadError: If the file is not a valid agent JAR executable.
+
+    Returns:
+        The agent JAR executable with its remoting version read from the manifest.
+    """
+    sha256 = _validate_agent_jar(path)
+    with zipfile.ZipFile(path) as jar:
+        try:
+            manifest = jar.read("META-INF/MANIFEST.MF").decode("utf-8")
+        except KeyError as exc:
+            raise AgentJarDownloadError("Agent JAR executable has no manifest.") from exc
+    version = next(
+        (
+            value.strip()
+            for key, _, value in (line.partition(":") for line in manifest.splitlines())
+            if key == "Version"
+        ),
+        None,
+    )
+    if not version:
+        raise AgentJarDownloadError("Agent JAR executable manifest has no version.")
+    return BundledAgentJar(sha256=sha256, version=version, path=path)
+
+
+def install_bundled_agent_jar(
+    container: ops.Container, bundled: BundledAgentJar
+) -> AgentJarMetadata:
+    """Install a bundled agent JAR executable from the charm resource or the rock.
+
+    Args:
+        container: The agent workload container.
+        bundled: The bundled agent JAR executable.
+
+    Returns:
+        The metadata of the agent JAR executable installed in the container.
+    """
+    store = _get_agent_jar_store(container=container)
+    entry = jar_store.StoreEntry(sha256=bundled.sha256)
+    if bundled.in_container:
+        store.copy(entry, bundled.path)
+    else:
+        entry.size = bundled.path.stat().st_size
+        with bundled.path.open("rb") as jar_file:
+            store.add(entry, jar_file)
+    store.activate(entry.sha256)
+    return _to_agent_jar_metadata(store.index.entries[entry.sha256], None)
+
+
+def get_credentials_validation_timeout(server_url: str, session: requests.Session) -> float:
+    """Get the credentials validation timeout adapted to the server round trip time.
+
+    The round trip time is the fastest of a few requests to the agent listener endpoint, the
+    first request including the connection setup.
+
+    Args:
+        server_url: The Jenkins server URL address.
+        session: The HTTP session to the Jenkins server.
+
+    Returns:
+        The credentials validation timeout in seconds. The maximum timeout if the server could not
+        be reached.
+    """
+    round_trip_times = []
+    for _ in range(ROUND_TRIP_TIME_SAMPLES):
+        start = time.monotonic()
+        try:
+            session.head(
+                f"{server_url}/tcpSlaveAgentListener/", timeout=AGENT_JAR_DOWNLOAD_TIMEOUT
+            )
+        except requests.RequestException as exc:
+            logger.warning("Failed to measure Jenkins server round trip time, %s", exc)
+            return CREDENTIALS_VALIDATION_MAX_TIMEOUT
+        round_trip_times.append(time.monotonic() - start)
+    round_trip_time = min(round_trip_times)
+    timeout = min(
+        CREDENTIALS_VALIDATION_TIMEOUT + CREDENTIALS_VALIDATION_ROUND_TRIPS * round_trip_time,
+        CREDENTIALS_VALIDATION_MAX_TIMEOUT,
+    )
+    logger.debug(
+        "Server round trip time %.3f s, validation timeout %.1f s", round_trip_time, timeout
+    )
+    return timeout
+
+
+def precheck_credentials(
+    agent_name: str, credentials: Credentials, session: requests.Session
+) -> bool:
+    """Rule out credentials that cannot be used without starting the agent.
+
+    The agent JNLP file is requested encrypted, as the agent does, to check that the agent node
+    exists, and the computer API is requested to check that the node is not already online.
+    Whether the secret is accepted is left to the agent, the JNLP file being encrypted with it.
+
+    Args:
+        agent_name: The Jenkins agent name.
+        credentials: Server credentials required to register to Jenkins server.
+        session: The HTTP session to the Jenkins server.
+
+    Returns:
+        False if the agent node does not exist or is already online, True otherwise.
+    """
+    computer_url = f"{credentials.address}/computer/{agent_name}"
+    try:
+        res = session.get(
+            f"{computer_url}/slave-agent.jnlp",
+            params={"encrypt": "true"},
+            timeout=AGENT_JAR_DOWNLOAD_TIMEOUT,
+        )
+    except requests.RequestException as exc:
+        logger.warning("Failed to pre-check agent %s, %s", agent_name, exc)
+        return True
+    if res.status_code == requests.codes.not_found:
+        logger.info("Agent %s does not exist on the server.", agent_name)
+        return False
+    # The computer API is only available to users with read permissions, e.g. when anonymous
+    # read access is granted.
+    try:
+        res = session.get(
+            f"{computer_url}/api/json",
+            params={"tree": "offline"},
+            timeout=AGENT_JAR_DOWNLOAD_TIMEOUT,
+        )
+        res.raise_for_status()
+        offline = res.json().get("offline", True)
+    except (requests.RequestException, ValueError, AttributeError) as exc:
+        logger.debug("Agent %s status unavailable, %s", agent_name, exc)
+        return True
+    if offline is False:
+        logger.info("Agent %s is already online.", agent_name)
+        return False
+    return True
 
 
 def validate_credentials(
@@ -70,15 +885,22 @@ def validate_credentials(
     credentials: Credentials,
     container: ops.Container,
     add_random_delay: bool = False,
+    on_exec: typing.Optional[typing.Callable[[ops.pebble.ExecProcess], None]] = None,
+    timeout: float = CREDENTIALS_VALIDATION_TIMEOUT,
 ) -> bool:
     """Check if the credentials can be used to register to the server.
 
+    The agent is stopped as soon as its connection is confirmed or rejected, so that the
+    validated credentials are free to be used by the agent service.
+
     Args:
         agent_name: The Jenkins agent name.
         credentials: Server credentials required to register to Jenkins server.
         container: The Jenkins agent workload container.
         add_random_delay: Whether random delay should be added to prevent parallel registration on
             server.
+        on_exec: Called with the agent process once started, e.g. to kill it.
+        timeout: The time in seconds allowed for the agent to connect.
 
     Returns:
         True if credentials and agent_name pairs are valid, False otherwise.
@@ -90,6 +912,7 @@ def validate_credentials(
     proc: ops.pebble.ExecProcess = container.exec(
         [
             "java",
+            f"-XX:SharedArchiveFile={AGENT_JAR_ARCHIVE_PATH}",
             "-jar",
             str(AGENT_JAR_PATH),
             "-jnlpUrl",
@@ -100,50 +923,209 @@ def validate_credentials(
             "-secret",
             credentials.secret,
         ],
-        timeout=5,
+        timeout=timeout,
         user=USER,
         working_dir=str(JENKINS_WORKDIR),
         combine_stderr=True,
     )
-    # The process will exit due to connection failure(invalid credentials) or timeout.
+    if on_exec:
+        on_exec(proc)
+    # The process will exit due to connection failure(invalid credentials), being stopped once
+    # the connection is confirmed or rejected, or timeout.
     # Check for successful connection log from the stdout.
-    connected = False
-    terminated = False
-    lines = ""
+    parser = remoting_log.RemotingLogParser()
+    outcome: typing.Optional[remoting_log.RemotingEvent] = None
     # The proc.stdout is iterable according to process.exec documentation
     for line in proc.stdout:  # type: ignore
-        lines += line
-        if "INFO: Connected" in line:
-            connected = True
-        if "INFO: Terminated" in line:
-            terminated = True
-    logger.debug(lines)
-    return connected and not terminated
+        # The output after the agent is stopped, e.g. its termination, is ignored.
+        if outcome:
+            continue
+        event = parser.feed(line)
+        if event and event.type in AGENT_OUTCOME_EVENTS:
+            _kill_process(proc, signal="SIGTERM")
+            outcome = event
+    logger.debug(parser.get_tail())
+    if not outcome or outcome.type != remoting_log.RemotingEventType.CONNECTED:
+        return False
+    logger.debug(
+        "Agent %s connected in %.2f s with %s.",
+        agent_name,
+        parser.connect_latency,
+        parser.protocol,
+    )
+    return True
+
+
+def _kill_process(proc: ops.pebble.ExecProcess, signal: str = "SIGKILL") -> None:
+    """Signal a credentials validation process, ignoring processes that have already exited.
+
+    Args:
+        proc: The agent process validating the credentials.
+        signal: The signal sent to the process.
+    """
+    try:
+        proc.send_signal(signal)
+    except (ops.pebble.APIError, ConnectionError) as exc:
+        logger.debug("Failed to kill credentials validation process, %s", exc)
+
+
+class _CredentialsSearch:
+    """A search for valid credentials among agent-token pairs validated concurrently.
+
+    The validation processes still running once the search is over are killed.
+    """
+
+    def __init__(
+        self,
+        server_url: str,
+        container: ops.Container,
+        timeout: float,
+        session: typing.Optional[requests.Session],
+        on_validated: typing.Optional[typing.Callable[[str, str, bool, float], None]],
+    ):
+        """Initialize the search.
+
+        Args:
+            server_url: The jenkins server url address.
+            container: The Jenkins agent workload container.
+            timeout: The time in seconds allowed for the agent to connect with each pair.
+            session: The HTTP session to the Jenkins server to pre-check the pairs with.
+            on_validated: Called with the validation outcomes, see find_valid_credentials.
+        """
+        self._server_url = server_url
+        self._container = container
+        self._timeout = timeout
+        self._session = session
+        self._on_validated = on_validated
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._running: typing.Set[ops.pebble.ExecProcess] = set()
+        # The priority of the first valid pair found, the pairs of lower priority being skipped.
+        self._found: typing.Optional[int] = None
+
+    def _track(
+        self, started: typing.List[ops.pebble.ExecProcess], proc: ops.pebble.ExecProcess
+    ) -> None:
+        """Track a validation process to kill it once the search is over.
 
+        Args:
+            started: The processes started by the validating thread.
+            proc: The agent process validating the credentials.
+        """
+        with self._lock:
+            started.append(proc)
+            self._running.add(proc)
+            if self._cancelled.is_set():
+                _kill_process(proc)
 
+    def validate(self, agent_name: str, agent_token: str, priority: int = 0) -> bool:
+        """Validate a pair, the process being killed once the search is over.
+
+        Args:
+            agent_name: The Jenkins agent name.
+            agent_token: The Jenkins agent token.
+            priority: The position of the pair in the search, lowest first.
+
+        Returns:
+            True if the pair is valid, False otherwise or if a pair of higher priority is valid.
+        """
+        with self._lock:
+            if self._found is not None and self._found < priority:
+                return False
+        start = time.monotonic()
+        credentials = Credentials(address=self._server_url, secret=agent_token)
+        started: typing.List[ops.pebble.ExecProcess] = []
+        valid = False
+        if not self._session or precheck_credentials(agent_name, credentials, self._session):
+            logger.debug("Validating %s", agent_name)
+            try:
+                valid = validate_credentials(
+                    agent_name=agent_name,
+                    credentials=credentials,
+                    container=self._container,
+                    on_exec=functools.partial(self._track, started),
+                    timeout=self._timeout,
+                )
+            finally:
+                with self._lock:
+                    self._running.difference_update(started)
+        if valid:
+            with self._lock:
+                self._found = min(priority, self._found if self._found is not None else priority)
+        if self._on_validated and not self._cancelled.is_set():
+            self._on_validated(agent_name, agent_token, valid, time.monotonic() - start)
+        return valid
+
+    def cancel(self) -> None:
+        """End the search, killing the running validation processes."""
+        with self._lock:
+            self._cancelled.set()
+            for proc in self._running:
+                _kill_process(proc)
+
+
+@metrics.timed("credentials_search_seconds")
 def find_valid_credentials(
     agent_name_token_pairs: typing.Iterable[typing.Tuple[str, str]],
     server_url: str,
     container: ops.Container,
+    max_workers: int = 1,
+    timeout: float = CREDENTIALS_VALIDATION_TIMEOUT,
+    session: typing.Optional[requests.Session] = None,
+    on_validated: typing.Optional[typing.Callable[[str, str, bool, float], None]] = None,
+    first_alone: bool = False,
 ) -> typing.Optional[typing.Tuple[str, str]]:
     """Find credentials that can be applied if available.
 
+    The pairs are validated concurrently by up to max_workers agent processes. The first valid
+    pair in the given order is returned and the remaining validation processes are killed. Given
+    an HTTP session, the pairs are pre-checked to start agent processes only for the pairs that
+    may be valid.
+
     Args:
-        agent_name_token_pairs: Matching agent name and token pair to check.
+        agent_name_token_pairs: Matching agent name and token pair to check, by priority.
         server_url: The jenkins server url address.
         container: The Jenkins agent workload container.
+        max_workers: The maximum number of credentials validated at once.
+        timeout: The time in seconds allowed for the agent to connect with each pair.
+        session: The HTTP session to the Jenkins server to pre-check the pairs with.
+        on_validated: Called from the validating thread with the agent name, the agent token,
+            the validation outcome and its duration in seconds, unless the validation was killed.
+        first_alone: Whether the first pair is validated alone before the other pairs, e.g. the
+            pair assigned to the unit, not to compete with other units for their pairs.
 
     Returns:
         Agent name and token pair that can be used. None if no pair is available.
     """
-    for agent_name, agent_token in agent_name_token_pairs:
-        logger.debug("Validating %s", agent_name)
-        if not validate_credentials(
-            agent_name=agent_name,
-            credentials=Credentials(address=server_url, secret=agent_token),
-            container=container,
-        ):
-            logger.debug("agent %s validation failed.", agent_name)
-            continue
-        return (agent_name, agent_token)
+    pairs = list(agent_name_token_pairs)
+    search = _CredentialsSearch(
+        server_url=server_url,
+        container=container,
+        timeout=timeout,
+        session=session,
+        on_validated=on_validated,
+    )
+    if first_alone and pairs:
+        first_pair = pairs.pop(0)
+        if search.validate(*first_pair):
+            return first_pair
+    if not pairs:
+        return None
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=max(1, min(max_workers, len(pairs))),
+        thread_name_prefix="validate-credentials",
+    ) as executor:
+        futures = [
+            executor.submit(search.validate, *pair, priority)
+            for priority, pair in enumerate(pairs)
+        ]
+        try:
+            for pair, future in zip(pairs, futures, strict=True):
+                if future.result():
+                    return pair
+                logger.debug("agent %s validation failed.", pair[0])
+        finally:
+            for future in futures:
+                future.cancel()
+            search.cancel()
     return None
@@ -6,16 +6,20 @@
 import logging
 import os
 import typing
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from pathlib import Path
 
 import ops
-from pydantic import AnyHttpUrl, BaseModel, Field, ValidationError, tools
+from pydantic import AnyHttpUrl, BaseModel, Field, ValidationError, model_validator, tools
 
 import metadata
 import server
 
 # agent relation name
 AGENT_RELATION = "agent"
+# The directories the absolute cache directories must be within, the cache directories being
+# replaced by links as root.
+CACHE_DIRECTORY_ROOTS = (server.JENKINS_WORKDIR, Path("/root"))
 
 logger = logging.getLogger()
 
@@ -43,11 +47,23 @@ class JenkinsConfig(BaseModel):
         server_url_not_validated: The Jenkins server url, to be validated with pydantic.
         server_url: The Jenkins server url, to be used by the charm.
         agent_name_token_pairs: Jenkins agent names paired with corresponding token value.
+        validation_workers: The maximum number of agent-token pairs validated at once.
+        assignment: How the agent-token pairs are assigned to the units. "ordered" validates the
+            pairs in the configured order, "ordinal" starts from the pair at the unit ordinal.
+        registration: How the agent-token pairs are validated. "validate" starts a validation
+            agent with each pair before starting the agent service, "start" starts the agent
+            service with each pair until it connects.
+        agent_services: The number of agent services run by the unit, each with its own
+            agent-token pair.
     """
 
     server_url_not_validated: AnyHttpUrl
 
     agent_name_token_pairs: typing.List[typing.Tuple[str, str]] = Field(..., min_length=1)
+    validation_workers: int = Field(4, ge=1)
+    assignment: typing.Literal["ordered", "ordinal"] = "ordered"
+    registration: typing.Literal["validate", "start"] = "validate"
+    agent_services: int = Field(1, ge=1)
 
     @property
     def server_url(self) -> str:
@@ -55,11 +71,18 @@ class JenkinsConfig(BaseModel):
         return str(self.server_url_not_validated).rstrip("/")
 
     @classmethod
-    def from_charm_config(cls, config: ops.ConfigData) -> typing.Optional["JenkinsConfig"]:
+    def from_charm_config(
+        cls, config: ops.ConfigData, unit_ordinal: int = 0
+    ) -> typing.Optional["JenkinsConfig"]:
         """Instantiate JenkinsConfig from charm config.
 
+        With the ordinal assignment, the pairs are rotated to start from the pair at the unit
+        ordinal, wrapping around, so that each unit first validates a different pair and falls
+        back to the next ones.
+
         Args:
             config: Charm configuration data.
+            unit_ordinal: The ordinal of the unit, e.g. 2 for jenkins-agent-k8s/2.
 
         Returns:
             JenkinsConfig if configuration exists, None otherwise.
@@ -74,12 +97,91 @@ class JenkinsConfig(BaseModel):
         agent_names = agent_name_config.split(":") if agent_name_config else []
         agent_tokens = agent_token_config.split(":") if agent_token_config else []
         agent_name_token_pairs = list(zip(agent_names, agent_tokens, strict=False))
+        assignment = config.get("jenkins_agent_assignment", "ordered")
+        if assignment == "ordinal" and agent_name_token_pairs:
+            slot = unit_ordinal % len(agent_name_token_pairs)
+            agent_name_token_pairs = agent_name_token_pairs[slot:] + agent_name_token_pairs[:slot]
         return cls(
             server_url_not_validated=tools.parse_obj_as(AnyHttpUrl, server_url) or "",
             agent_name_token_pairs=agent_name_token_pairs,
+            validation_workers=config.get("jenkins_agent_validation_workers", 4),
+            assignment=assignment,
+            registration=config.get("jenkins_agent_registration", "validate"),
+            agent_services=config.get("jenkins_agent_services", 1),
         )
 
 
+class WorkspaceGcConfig(BaseModel):
+    """The workspace garbage collector config from juju config values.
+
+    Attrs:
+        high_watermark: The disk usage percentage of the Jenkins home volume starting the
+            workspace eviction.
+        low_watermark: The disk usage percentage stopping the workspace eviction.
+    """
+
+    high_watermark: int = Field(85, ge=1, le=100)
+    low_watermark: int = Field(70, ge=0, le=100)
+
+    @model_validator(mode="after")
+    def check_watermarks(self) -> "WorkspaceGcConfig":
+        """Check that the low watermark is below the high watermark.
+
+        Returns:
+            The validated config.
+
+        Raises:
+            ValueError: if the low watermark is not below the high watermark.
+        """
+        if self.low_watermark >= self.high_watermark:
+            raise ValueError("low watermark must be below the high watermark")
+        return self
+
+    @classmethod
+    def from_charm_config(cls, config: ops.ConfigData) -> "WorkspaceGcConfig":
+        """Instantiate WorkspaceGcConfig from charm config.
+
+        Args:
+            config: Charm configuration data.
+
+        Returns:
+            The workspace garbage collector config.
+        """
+        return cls(
+            high_watermark=config.get("workspace_gc_high_watermark", 85),
+            low_watermark=config.get("workspace_gc_low_watermark", 70),
+        )
+
+
+def _parse_cache_directories(value: str) -> typing.List[str]:
+    """Parse the comma or space separated cache directories.
+
+    Args:
+        value: The cache directories configuration value.
+
+    Returns:
+        The cache directories, relative to the Jenkins home directory or absolute. The absolute
+        directories within the Jenkins home directory are made relative to it.
+
+    Raises:
+        ValueError: if a cache directory contains a parent reference or is an absolute directory
+            not within CACHE_DIRECTORY_ROOTS.
+    """
+    cache_directories = []
+    for cache_directory in value.replace(",", " ").split():
+        path = Path(cache_directory)
+        if ".." in path.parts:
+            raise ValueError(f"invalid cache directory {cache_directory}")
+        if path.is_absolute() and path.is_relative_to(server.JENKINS_WORKDIR):
+            cache_directory = str(path.relative_to(server.JENKINS_WORKDIR))
+        elif path.is_absolute() and not any(
+            path != root and path.is_relative_to(root) for root in CACHE_DIRECTORY_ROOTS
+        ):
+            raise ValueError(f"cache directory {cache_directory} not allowed")
+        cache_directories.append(cache_directory)
+    return cache_directories
+
+
 def _get_jenkins_unit(
     all_units: typing.Set[ops.Unit], current_app_name: str
 ) -> typing.Optional[ops.Unit]:
@@ -130,12 +232,22 @@ class State:
         agent_relation_credentials: The full set of credentials from the agent relation. None if
             partial data is set or the credentials do not belong to current agent.
         jenkins_agent_service_name: The Jenkins agent workload container name.
+        jvm_options: The JVM options of the agent from juju config, overriding the computed ones.
+        drain_timeout: The time in seconds to wait for the running builds before stopping or
+            restarting the agent.
+        workspace_gc_config: The workspace garbage collector config from juju config.
+        cache_directories: The build tool cache directories kept in the Jenkins home directory,
+            relative to it or absolute.
     """
 
     agent_meta: metadata.Agent
     jenkins_config: typing.Optional[JenkinsConfig]
     agent_relation_credentials: typing.Optional[server.Credentials]
     jenkins_agent_service_name: str = "jenkins-agent-k8s"
+    jvm_options: str = ""
+    drain_timeout: int = 300
+    workspace_gc_config: WorkspaceGcConfig = field(default_factory=WorkspaceGcConfig)
+    cache_directories: typing.List[str] = field(default_factory=list)
 
     @classmethod
     def from_charm(cls, charm: ops.CharmBase) -> "State":
@@ -161,11 +273,27 @@ class State:
             raise InvalidStateError("Invalid executor state.") from exc
 
         try:
-            jenkins_config = JenkinsConfig.from_charm_config(charm.config)
+            jenkins_config = JenkinsConfig.from_charm_config(
+                charm.config, unit_ordinal=int(charm.unit.name.rsplit("/", 1)[1])
+            )
         except ValidationError as exc:
             logging.error("Invalid jenkins config values, %s", exc)
             raise InvalidStateError("Invalid jenkins config values.") from exc
 
+        try:
+            workspace_gc_config = WorkspaceGcConfig.from_charm_config(charm.config)
+        except ValidationError as exc:
+            logging.error("Invalid workspace GC config values, %s", exc)
+            raise InvalidStateError("Invalid workspace GC config values.") from exc
+
+        try:
+            cache_directories = _parse_cache_directories(
+                str(charm.config.get("cache_directories", ""))
+            )
+        except ValueError as exc:
+            logging.error("Invalid cache directories, %s", exc)
+            raise InvalidStateError("Invalid cache directories.") from exc
+
         agent_relation = charm.model.get_relation(AGENT_RELATION)
         agent_relation_credentials: typing.Optional[server.Credentials] = None
         if agent_relation and (
@@ -179,4 +307,8 @@ class State:
             agent_meta=agent_meta,
             jenkins_config=jenkins_config,
             agent_relation_credentials=agent_relation_credentials,
+            jvm_options=str(charm.config.get("jvm_options", "")),
+            drain_timeout=max(0, int(charm.config.get("jenkins_agent_drain_timeout", 300))),
+            workspace_gc_config=workspace_gc_config,
+            cache_directories=cache_directories,
         )
@@ -0,0 +1,98 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""The module preparing the Jenkins home directory of the workload container, e.g. a volume."""
+
+import contextlib
+import logging
+import typing
+from pathlib import Path
+
+import ops
+
+import server
+
+logger = logging.getLogger(__name__)
+
+# The persistent location of the cache directories outside of the Jenkins home directory.
+CACHES_PATH = Path(server.JENKINS_WORKDIR / "caches")
+# Links a cache directory to its persistent location, given the cache directory and its persistent
+# location. The content of the directory, e.g. from the image of a new pod, is moved there without
+# overwriting the persisted files. The script runs as root, the cache directories being limited to
+# state.CACHE_DIRECTORY_ROOTS.
+CACHE_LINK_SCRIPT = f"""
+[ "$(readlink "$1")" = "$2" ] && exit 0
+mkdir -p "$2" "$(dirname "$1")"
+if [ -d "$1" ] && [ ! -L "$1" ]; then
+    cp -an "$1/." "$2/" && rm -rf "$1"
+fi
+chown -R {server.USER}:{server.USER} "$2"
+ln -sfn "$2" "$1"
+chown -h {server.USER}:{server.USER} "$1"
+"""
+
+
+def prepare(container: ops.Container, cache_directories: typing.Iterable[str] = ()) -> None:
+    """Prepare the Jenkins home directory and the cache directories.
+
+    A volume mounted as the Jenkins home directory is owned by root until handed over to the
+    agent user. The relative cache directories are created in the Jenkins home directory, the
+    absolute ones are linked to CACHES_PATH, so that both are kept across pod restarts.
+
+    Args:
+        container: The agent workload container.
+        cache_directories: The cache directories, relative to the Jenkins home directory or
+            absolute.
+    """
+    try:
+        owner = container.list_files(server.JENKINS_WORKDIR, itself=True)[0].user
+    except (ops.pebble.PathError, ops.pebble.APIError):
+        container.make_dir(
+            server.JENKINS_WORKDIR, make_parents=True, user=server.USER, group=server.USER
+        )
+        owner = server.USER
+    if owner != server.USER:
+        logger.info("Changing the owner of %s to %s.", server.JENKINS_WORKDIR, server.USER)
+        container.exec(
+            ["chown", f"{server.USER}:{server.USER}", str(server.JENKINS_WORKDIR)]
+        ).wait()
+    for cache_directory in cache_directories:
+        path = Path(cache_directory)
+        if not path.is_absolute():
+            container.make_dir(
+                server.JENKINS_WORKDIR / path,
+                make_parents=True,
+                user=server.USER,
+                group=server.USER,
+            )
+            continue
+        container.exec(
+            [
+                "bash",
+                "-c",
+                CACHE_LINK_SCRIPT,
+                "bash",
+                str(path),
+                str(CACHES_PATH / path.relative_to("/")),
+            ]
+        ).wait()
+
+
+def reset_agent_markers(container: ops.Container) -> None:
+    """Remove the ready markers and connection states left by the agents of a previous pod.
+
+    Args:
+        container: The agent workload container.
+    """
+    workdirs = [server.JENKINS_WORKDIR]
+    with contextlib.suppress(ops.pebble.PathError, ops.pebble.APIError):
+        workdirs.extend(
+            Path(info.path)
+            for info in container.list_files(server.AGENT_NODES_PATH)
+            if info.type == ops.pebble.FileType.DIRECTORY
+        )
+    for workdir in workdirs:
+        for marker in (server.AGENT_READY_PATH, server.AGENT_STATE_PATH):
+            container.remove_path(
+                workdir / marker.relative_to(server.JENKINS_WORKDIR), recursive=True
+            )
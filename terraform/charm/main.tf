@@ -12,7 +12,8 @@ resource "juju_application" "jenkins_agent_k8s" {
     base     = var.base
   }
 
-  config      = var.config
-  constraints = var.constraints
-  units       = var.units
+  config             = var.config
+  constraints        = var.constraints
+  storage_directives = var.storage
+  units              = var.units
 }
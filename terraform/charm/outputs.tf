@@ -8,6 +8,7 @@ output "app_name" {
 
 output "provides" {
   value = {
-    agent = "agent"
+    agent            = "agent"
+    metrics_endpoint = "metrics-endpoint"
   }
 }
@@ -43,6 +43,12 @@ variable "base" {
   default     = "ubuntu@22.04"
 }
 
+variable "storage" {
+  description = "Map of storage directives, e.g. `{ jenkins-home = \"50G\" }` for the Jenkins home volume."
+  type        = map(string)
+  default     = {}
+}
+
 variable "units" {
   description = "The number of units to deploy"
   type        = number
@@ -0,0 +1,4 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Benchmark tests module."""
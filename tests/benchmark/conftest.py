@@ -0,0 +1,246 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Fixtures for Jenkins-agent-k8s-operator charm benchmark tests."""
+
+import contextlib
+import http.server
+import io
+import json
+import os
+import pathlib
+import re
+import shutil
+import threading
+import typing
+import unittest.mock
+import urllib.parse
+import zipfile
+
+import ops
+import pytest
+
+import server
+
+# The size of the agent JAR executable served by the stand-in Jenkins server.
+AGENT_JAR_SIZE = 32 * 1024 * 1024
+
+
+class StandInJenkinsHandler(http.server.BaseHTTPRequestHandler):
+    """Request handler serving the Jenkins server endpoints used by the charm."""
+
+    server: "StandInJenkinsServer"
+
+    def do_GET(self) -> None:
+        """Serve the agent JAR executable and the agent JNLP files."""
+        self.server.count_request(self.path)
+        url = urllib.parse.urlsplit(self.path)
+        if match := re.fullmatch(r"/computer/([^/]+)/slave-agent.jnlp", url.path):
+            self._serve_jnlp(match.group(1), urllib.parse.parse_qs(url.query))
+            return
+        if match := re.fullmatch(r"/computer/([^/]+)/api/json", url.path):
+            self._serve_computer(match.group(1))
+            return
+        if self.path != "/jnlpJars/agent.jar":
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/java-archive")
+        self.send_header("Content-Length", str(len(self.server.agent_jar)))
+        self.end_headers()
+        self.wfile.write(self.server.agent_jar)
+
+    def _serve_jnlp(self, agent_name: str, query: typing.Dict[str, typing.List[str]]) -> None:
+        """Serve the JNLP file of an agent.
+
+        The JNLP file is served encrypted to anyone, as Jenkins does, and in clear text if the
+        secret query parameter matches the secret of an offline agent, standing in for the agent
+        handshake.
+
+        Args:
+            agent_name: The Jenkins agent name.
+            query: The request query parameters.
+        """
+        secret = self.server.agent_secrets.get(agent_name)
+        if secret is None:
+            self.send_error(404)
+            return
+        if query.get("encrypt") == ["true"]:
+            self._send_body(os.urandom(256), "application/octet-stream")
+            return
+        if query.get("secret") != [secret]:
+            self.send_error(403)
+            return
+        if agent_name in self.server.online_agents:
+            self.send_error(409, "Agent already connected")
+            return
+        self._send_body(b"<jnlp/>", "application/x-java-jnlp-file")
+
+    def _serve_computer(self, agent_name: str) -> None:
+        """Serve the status of an agent.
+
+        Args:
+            agent_name: The Jenkins agent name.
+        """
+        if agent_name not in self.server.agent_secrets:
+            self.send_error(404)
+            return
+        offline = agent_name not in self.server.online_agents
+        self._send_body(json.dumps({"offline": offline}).encode(), "application/json")
+
+    def _send_body(self, body: bytes, content_type: str) -> None:
+        """Send a successful response.
+
+        Args:
+            body: The response body.
+            content_type: The response content type.
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: typing.Any) -> None:  # noqa: A002
+        """Silence the per-request access log.
+
+        Args:
+            format: The log message format.
+            args: The log message arguments.
+        """
+
+
+class StandInJenkinsServer(http.server.ThreadingHTTPServer):
+    """A local HTTP stand-in for the Jenkins server.
+
+    Attrs:
+        agent_jar: The agent JAR executable content served.
+        agent_secrets: The secrets of the agents registered on the server by agent name.
+        online_agents: The names of the agents already connected to the server.
+        requests: The number of requests received per path.
+        url: The base URL of the server.
+    """
+
+    def __init__(
+        self,
+        agent_jar: bytes,
+        agent_secrets: typing.Optional[typing.Dict[str, str]] = None,
+        online_agents: typing.Optional[typing.Set[str]] = None,
+    ):
+        """Initialize the server on a free local port.
+
+        Args:
+            agent_jar: The agent JAR executable content to serve.
+            agent_secrets: The secrets of the agents registered on the server by agent name.
+            online_agents: The names of the agents already connected to the server.
+        """
+        super().__init__(("127.0.0.1", 0), StandInJenkinsHandler)
+        self.agent_jar = agent_jar
+        self.agent_secrets = agent_secrets or {}
+        self.online_agents = online_agents or set()
+        self.requests: typing.Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        """The base URL of the server."""
+        host, port = self.server_address[:2]
+        return f"http://{host!s}:{port}"
+
+    def count_request(self, path: str) -> None:
+        """Count a request to the given path.
+
+        Args:
+            path: The requested path.
+        """
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+
+def generate_agent_jar(size: int) -> bytes:
+    """Generate an agent JAR executable archive of roughly the given size.
+
+    Args:
+        size: The total size in bytes of the archived entries.
+
+    Returns:
+        The agent JAR executable content.
+    """
+    jar = io.BytesIO()
+    entry_size = 1024 * 1024
+    with zipfile.ZipFile(jar, "w", compression=zipfile.ZIP_STORED) as jar_file:
+        jar_file.writestr("META-INF/MANIFEST.MF", "Manifest-Version: 1.0\n")
+        for index in range(size // entry_size):
+            jar_file.writestr(f"hudson/remoting/Class{index}.class", os.urandom(entry_size))
+    return jar.getvalue()
+
+
+@contextlib.contextmanager
+def serve(
+    server: http.server.ThreadingHTTPServer,
+) -> typing.Iterator[http.server.ThreadingHTTPServer]:
+    """Run an HTTP server in a background thread.
+
+    Args:
+        server: The HTTP server to run.
+
+    Yields:
+        The running HTTP server.
+    """
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def get_directory_container(root: pathlib.Path) -> unittest.mock.MagicMock:
+    """Create a mock workload container backed by a local directory.
+
+    Args:
+        root: The local directory holding the container files.
+
+    Returns:
+        The mock workload container.
+    """
+
+    def push(path: pathlib.Path, source: typing.Union[str, typing.BinaryIO], **_kwargs) -> None:
+        """Write the pushed content to the local directory.
+
+        Args:
+            path: The container path.
+            source: The pushed content.
+        """
+        local_path = root / pathlib.Path(path).relative_to("/")
+        local_path.parent.mkdir(parents=True, exist_ok=True)
+        if isinstance(source, str):
+            local_path.write_text(source, encoding="utf-8")
+            return
+        with local_path.open("wb") as local_file:
+            shutil.copyfileobj(source, local_file)
+
+    container = unittest.mock.MagicMock(spec=ops.Container)
+    container.exists.side_effect = lambda path: (
+        root / pathlib.Path(path).relative_to("/")
+    ).exists()
+    container.pull.side_effect = lambda path, **_kwargs: (
+        root / pathlib.Path(path).relative_to("/")
+    ).open("r", encoding="utf-8")
+    container.push.side_effect = push
+    return container
+
+
+@pytest.fixture(scope="module", name="jenkins_server")
+def jenkins_server_fixture() -> typing.Iterator[StandInJenkinsServer]:
+    """A local stand-in Jenkins server running in a background thread."""
+    with serve(StandInJenkinsServer(agent_jar=generate_agent_jar(AGENT_JAR_SIZE))) as server:
+        yield typing.cast(StandInJenkinsServer, server)
+
+
+@pytest.fixture(scope="function", name="agent_jar_download_dir", autouse=True)
+def agent_jar_download_dir_fixture(monkeypatch: pytest.MonkeyPatch, tmp_path: pathlib.Path):
+    """The charm container directory keeping partially downloaded agent JAR executables."""
+    monkeypatch.setattr(server, "AGENT_JAR_DOWNLOAD_DIR", tmp_path / "downloads")
+    return tmp_path / "downloads"
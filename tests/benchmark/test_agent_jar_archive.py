@@ -0,0 +1,86 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Jenkins-agent-k8s agent JAR class data sharing archive benchmarks."""
+
+import logging
+import os
+import pathlib
+import shutil
+import statistics
+import subprocess  # nosec B404
+import time
+import typing
+
+import pytest
+
+import jar_store
+
+logger = logging.getLogger(__name__)
+
+# The path of a real agent JAR executable, e.g. downloaded from a Jenkins server.
+AGENT_JAR = os.environ.get("BENCHMARK_AGENT_JAR", "")
+# The number of agent starts measured with and without the archive.
+STARTS = 5
+
+pytestmark = pytest.mark.skipif(
+    not shutil.which("java") or not pathlib.Path(AGENT_JAR).is_file(),
+    reason="Requires a JVM and an agent JAR executable in BENCHMARK_AGENT_JAR.",
+)
+
+
+def _start_agent(agent_jar: pathlib.Path, *java_options: str) -> float:
+    """Run the agent until it fails to connect, as when recording the archive.
+
+    Args:
+        agent_jar: The agent JAR executable path.
+        java_options: The JVM options.
+
+    Returns:
+        The wall time of the agent run in seconds.
+    """
+    start = time.perf_counter()
+    subprocess.run(  # nosec B603 B607
+        ["java", *java_options, "-jar", str(agent_jar), *jar_store.ARCHIVE_TRAINING_ARGS],
+        capture_output=True,
+        check=False,
+        timeout=jar_store.ARCHIVE_TRAINING_TIMEOUT,
+    )
+    return time.perf_counter() - start
+
+
+def test_agent_jar_archive_startup(tmp_path: pathlib.Path):
+    """
+    arrange: given an agent JAR executable and its class data sharing archive.
+    act: when the agent is started with and without the archive.
+    assert: the agent starts faster with the archive.
+    """
+    agent_jar = tmp_path / "agent.jar"
+    shutil.copy(AGENT_JAR, agent_jar)
+    archive = tmp_path / "agent.jsa"
+    _start_agent(agent_jar, f"-XX:ArchiveClassesAtExit={archive}")
+    assert archive.is_file()
+
+    def median_start(*java_options: str) -> float:
+        """Measure the median agent start time.
+
+        Args:
+            java_options: The JVM options.
+
+        Returns:
+            The median wall time of the agent runs in seconds.
+        """
+        start_times: typing.List[float] = [
+            _start_agent(agent_jar, *java_options) for _ in range(STARTS)
+        ]
+        return statistics.median(start_times)
+
+    without_archive = median_start()
+    with_archive = median_start(f"-XX:SharedArchiveFile={archive}", "-Xshare:on")
+    logger.info(
+        "agent start without archive: %.3f s, with archive: %.3f s (%d KiB)",
+        without_archive,
+        with_archive,
+        archive.stat().st_size // 1024,
+    )
+    assert with_archive < without_archive
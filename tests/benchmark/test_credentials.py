@@ -0,0 +1,157 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Jenkins-agent-k8s credentials validation benchmarks."""
+
+import logging
+import secrets
+import threading
+import time
+import typing
+import unittest.mock
+
+import ops
+import requests
+
+import server
+
+from .conftest import StandInJenkinsServer, serve
+
+logger = logging.getLogger(__name__)
+
+# The time in seconds the agent JVM takes to start before connecting to the server.
+JVM_STARTUP_TIME = 0.5
+# The number of configured agent-token pairs to validate, only the last pair being valid.
+PAIR_COUNTS = (1, 5, 10, 20)
+MAX_WORKERS = 8
+
+
+def _get_agent_container() -> unittest.mock.MagicMock:
+    """Create a mock workload container running agent processes against the JNLP endpoint.
+
+    Each agent process waits for the JVM startup time, fetches the agent JNLP file with its
+    secret and outputs the agent connection logs, staying connected until killed or timed out.
+
+    Returns:
+        The mock workload container.
+    """
+
+    def exec_agent(
+        command: typing.List[str], timeout: float, **_kwargs: typing.Any
+    ) -> unittest.mock.MagicMock:
+        """Start an agent process.
+
+        Args:
+            command: The agent command.
+            timeout: The time in seconds after which the agent process is killed.
+
+        Returns:
+            The mock agent process.
+        """
+        jnlp_url = command[command.index("-jnlpUrl") + 1]
+        secret = command[command.index("-secret") + 1]
+        killed = threading.Event()
+
+        def run() -> typing.Iterator[str]:
+            """Connect to the server.
+
+            Yields:
+                The agent log lines.
+            """
+            if killed.wait(timeout=JVM_STARTUP_TIME):
+                return
+            res = requests.get(jnlp_url, params={"secret": secret}, timeout=5)
+            if not res.ok:
+                yield f"SEVERE: {res.status_code} {res.reason}"
+                return
+            yield "INFO: Connected"
+            killed.wait(timeout=timeout - JVM_STARTUP_TIME)
+
+        proc = unittest.mock.MagicMock(spec=ops.pebble.ExecProcess)
+        proc.stdout = run()
+        proc.send_signal.side_effect = lambda _signal: killed.set()
+        return proc
+
+    container = unittest.mock.MagicMock(spec=ops.Container)
+    container.exec.side_effect = exec_agent
+    return container
+
+
+def test_find_valid_credentials_latency():
+    """
+    arrange: given a stand-in Jenkins server where only the last configured agent is valid.
+    act: when the credentials are validated sequentially and with a worker pool.
+    assert: the worker pool validation latency grows with the number of pairs divided by the \
+        number of workers instead of the number of pairs.
+    """
+    pairs = [(f"agent-{index}", secrets.token_hex(16)) for index in range(max(PAIR_COUNTS))]
+    results: typing.Dict[typing.Tuple[int, int], float] = {}
+    for pair_count in PAIR_COUNTS:
+        configured_pairs = pairs[-pair_count:]
+        valid_name, valid_secret = configured_pairs[-1]
+        stand_in = StandInJenkinsServer(agent_jar=b"", agent_secrets={valid_name: valid_secret})
+        with serve(stand_in) as jenkins_server:
+            url = typing.cast(StandInJenkinsServer, jenkins_server).url
+            for max_workers in (1, MAX_WORKERS):
+                start = time.perf_counter()
+                found = server.find_valid_credentials(
+                    agent_name_token_pairs=configured_pairs,
+                    server_url=url,
+                    container=_get_agent_container(),
+                    max_workers=max_workers,
+                )
+                results[(pair_count, max_workers)] = time.perf_counter() - start
+                assert found == (valid_name, valid_secret)
+
+    for pair_count in PAIR_COUNTS:
+        logger.info(
+            "%d pairs: sequential %.2f s, %d workers %.2f s",
+            pair_count,
+            results[(pair_count, 1)],
+            MAX_WORKERS,
+            results[(pair_count, MAX_WORKERS)],
+        )
+    largest = max(PAIR_COUNTS)
+    assert results[(largest, MAX_WORKERS)] < results[(largest, 1)] / (MAX_WORKERS / 2)
+
+
+def test_find_valid_credentials_precheck():
+    """
+    arrange: given a stand-in Jenkins server where most configured agents were deleted or are \
+        already online.
+    act: when the credentials are validated with and without the HTTP pre-check.
+    assert: the pre-check avoids starting the agent for the stale pairs.
+    """
+    pairs = [(f"agent-{index}", secrets.token_hex(16)) for index in range(max(PAIR_COUNTS))]
+    # A quarter of the agents still exist, of which all but the last one are already online.
+    registered = dict(pairs[-len(pairs) // 4 :])
+    valid_name, valid_secret = pairs[-1]
+    stand_in = StandInJenkinsServer(
+        agent_jar=b"", agent_secrets=registered, online_agents=set(registered) - {valid_name}
+    )
+    results: typing.Dict[bool, typing.Tuple[float, int]] = {}
+    with serve(stand_in) as jenkins_server, requests.Session() as session:
+        url = typing.cast(StandInJenkinsServer, jenkins_server).url
+        for precheck in (False, True):
+            container = _get_agent_container()
+            start = time.perf_counter()
+            found = server.find_valid_credentials(
+                agent_name_token_pairs=pairs,
+                server_url=url,
+                container=container,
+                max_workers=MAX_WORKERS,
+                session=session if precheck else None,
+            )
+            results[precheck] = (time.perf_counter() - start, container.exec.call_count)
+            assert found == (valid_name, valid_secret)
+
+    for precheck, (elapsed, launches) in results.items():
+        logger.info(
+            "%d pairs, pre-check %s: %.2f s, %d agent launches",
+            len(pairs),
+            precheck,
+            elapsed,
+            launches,
+        )
+    assert results[True][1] == 1
+    assert results[True][0] < results[False][0]
@@ -0,0 +1,109 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Jenkins-agent-k8s agent JAR download benchmarks."""
+
+import hashlib
+import logging
+import time
+import tracemalloc
+import typing
+import unittest.mock
+
+import ops
+import requests
+
+import server
+
+from .conftest import StandInJenkinsServer
+
+logger = logging.getLogger(__name__)
+
+# The chunk size Pebble clients use to stream a file-like source to the container.
+PEBBLE_PUSH_CHUNK_SIZE = 16 * 1024
+
+
+def _consume(source: typing.Union[bytes, str, typing.BinaryIO], digest: "hashlib._Hash"):
+    """Consume a push source the way the Pebble client streams it to the container.
+
+    Args:
+        source: The pushed content or file-like source.
+        digest: The digest to update with the pushed content.
+    """
+    if isinstance(source, (bytes, str)):
+        content = source if isinstance(source, bytes) else source.encode()
+        for offset in range(0, len(content), PEBBLE_PUSH_CHUNK_SIZE):
+            digest.update(content[offset : offset + PEBBLE_PUSH_CHUNK_SIZE])
+        return
+    while chunk := source.read(PEBBLE_PUSH_CHUNK_SIZE):
+        digest.update(chunk)
+
+
+def _measure(download: typing.Callable[[ops.Container], None]) -> typing.Tuple[float, int, str]:
+    """Measure the wall time and peak memory of an agent JAR download.
+
+    Args:
+        download: The download function to measure.
+
+    Returns:
+        The wall time in seconds, the peak traced memory in bytes and the pushed JAR digest.
+    """
+    digest = hashlib.sha256()
+    container = unittest.mock.MagicMock(spec=ops.Container)
+    container.exists.return_value = False
+    container.push.side_effect = lambda path, source, **_kwargs: (
+        _consume(source, digest) if path.suffix == ".jar" else None
+    )
+    tracemalloc.start()
+    start = time.perf_counter()
+    download(container)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, digest.hexdigest()
+
+
+def test_download_jenkins_agent_memory(jenkins_server: StandInJenkinsServer):
+    """
+    arrange: given a stand-in Jenkins server serving a large agent JAR executable.
+    act: when the agent JAR is downloaded buffered in memory and streamed in chunks.
+    assert: the streamed download peak memory is a fraction of the JAR size.
+    """
+
+    def buffered_download(container: ops.Container) -> None:
+        """Download the agent JAR holding the full response content in memory.
+
+        Args:
+            container: The agent workload container.
+        """
+        res = requests.get(f"{jenkins_server.url}/jnlpJars/agent.jar", timeout=300)
+        res.raise_for_status()
+        container.push(path=server.AGENT_JAR_PATH, source=res.content, make_dirs=True)
+
+    def streamed_download(container: ops.Container) -> None:
+        """Download the agent JAR streaming the response content in chunks.
+
+        Args:
+            container: The agent workload container.
+        """
+        server.download_jenkins_agent(
+            server_url=jenkins_server.url,
+            container=container,
+            session=server.create_http_session(),
+        )
+
+    expected_digest = hashlib.sha256(jenkins_server.agent_jar).hexdigest()
+    buffered_time, buffered_peak, buffered_digest = _measure(buffered_download)
+    streamed_time, streamed_peak, streamed_digest = _measure(streamed_download)
+
+    logger.info(
+        "agent.jar %d bytes, buffered: %.3fs peak %d bytes, streamed: %.3fs peak %d bytes",
+        len(jenkins_server.agent_jar),
+        buffered_time,
+        buffered_peak,
+        streamed_time,
+        streamed_peak,
+    )
+    assert buffered_digest == streamed_digest == expected_digest
+    assert buffered_peak >= len(jenkins_server.agent_jar)
+    assert streamed_peak < len(jenkins_server.agent_jar) / 16
@@ -0,0 +1,126 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Jenkins-agent-k8s agent JAR peer distribution benchmarks."""
+
+import concurrent.futures
+import functools
+import http.server
+import logging
+import multiprocessing
+import pathlib
+import time
+import typing
+
+import server
+
+from .conftest import StandInJenkinsServer, generate_agent_jar, get_directory_container, serve
+
+logger = logging.getLogger(__name__)
+
+# The number of units fetching the agent JAR executable at once during a scale-out.
+UNITS = 50
+AGENT_JAR_SIZE = 2 * 1024 * 1024
+
+
+def _install_from_server(server_url: str, root: pathlib.Path) -> server.AgentJarMetadata:
+    """Install the agent JAR executable of a unit from the Jenkins server.
+
+    Args:
+        server_url: The Jenkins server URL address.
+        root: The directory holding the unit charm and workload containers.
+
+    Returns:
+        The installed agent JAR executable metadata.
+    """
+    server.AGENT_JAR_DOWNLOAD_DIR = root / "downloads"
+    return server.download_jenkins_agent(
+        server_url=server_url,
+        container=get_directory_container(root / "workload"),
+        session=server.create_http_session(),
+    )
+
+
+def _install_from_peer(
+    url: str, metadata: server.AgentJarMetadata, root: pathlib.Path
+) -> server.AgentJarMetadata:
+    """Install the agent JAR executable of a unit from the leader unit.
+
+    Args:
+        url: The agent JAR executable URL served by the leader unit.
+        metadata: The metadata of the agent JAR executable published by the leader unit.
+        root: The directory holding the unit charm and workload containers.
+
+    Returns:
+        The installed agent JAR executable metadata.
+    """
+    server.AGENT_JAR_DOWNLOAD_DIR = root / "downloads"
+    return server.download_peer_agent_jar(
+        url=url,
+        metadata=metadata,
+        container=get_directory_container(root / "workload"),
+        session=server.create_http_session(),
+    )
+
+
+def _scale_out(
+    install: typing.Callable[[pathlib.Path], server.AgentJarMetadata], root: pathlib.Path
+) -> float:
+    """Install the agent JAR executable on all units at once, one process per unit.
+
+    Args:
+        install: The agent JAR executable installation of a unit in its directory.
+        root: The directory holding the unit directories.
+
+    Returns:
+        The wall time in seconds of the scale-out.
+    """
+    start = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=UNITS, mp_context=multiprocessing.get_context("fork")
+    ) as executor:
+        installed = executor.map(install, (root / f"unit-{index}" for index in range(UNITS)))
+        digests = {metadata.sha256 for metadata in installed}
+    assert len(digests) == 1
+    return time.perf_counter() - start
+
+
+def test_peer_distribution_controller_load(tmp_path: pathlib.Path):
+    """
+    arrange: given a stand-in Jenkins server and a leader unit serving its agent JAR store.
+    act: when all units install the agent JAR at once from the server and from the leader unit.
+    assert: the server receives one agent JAR request per unit without peers and only the \
+        leader unit request with peers.
+    """
+    agent_jar = generate_agent_jar(AGENT_JAR_SIZE)
+    with serve(StandInJenkinsServer(agent_jar=agent_jar)) as jenkins:
+        jenkins_server = typing.cast(StandInJenkinsServer, jenkins)
+        server_time = _scale_out(
+            functools.partial(_install_from_server, jenkins_server.url), tmp_path / "server"
+        )
+        server_requests = jenkins_server.requests.pop("/jnlpJars/agent.jar")
+
+        leader_root = tmp_path / "peer" / "leader"
+        leader = _install_from_server(jenkins_server.url, leader_root)
+        handler = functools.partial(
+            http.server.SimpleHTTPRequestHandler,
+            directory=str(leader_root / "workload" / server.AGENT_JAR_STORE_PATH.relative_to("/")),
+        )
+        with serve(http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)) as peer:
+            host, port = peer.server_address[:2]
+            url = f"http://{host!s}:{port}/{leader.sha256}.jar"
+            peer_time = _scale_out(
+                functools.partial(_install_from_peer, url, leader), tmp_path / "peer"
+            )
+        peer_requests = jenkins_server.requests.pop("/jnlpJars/agent.jar")
+
+    logger.info(
+        "%d units, server: %d requests %.3fs, peers: %d requests %.3fs",
+        UNITS,
+        server_requests,
+        server_time,
+        peer_requests,
+        peer_time,
+    )
+    assert server_requests == UNITS
+    assert peer_requests == 1
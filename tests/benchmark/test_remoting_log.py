@@ -0,0 +1,118 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Jenkins-agent-k8s remoting log parser benchmarks."""
+
+import logging
+import time
+import tracemalloc
+import typing
+
+import remoting_log
+
+logger = logging.getLogger(__name__)
+
+# The remoting logs recorded on a successful agent connection.
+RECORDED_CONNECTION_LOG = """Oct 16, 2026 9:00:00 AM hudson.remoting.jnlp.Main createEngine
+INFO: Setting up agent: jenkins-agent-k8s-0
+Oct 16, 2026 9:00:00 AM hudson.remoting.Engine startEngine
+INFO: Using Remoting version: 3309.v27b_9314fd1a_4
+Oct 16, 2026 9:00:00 AM org.jenkinsci.remoting.engine.WorkDirManager initializeWorkDir
+INFO: Using /var/lib/jenkins/remoting as a remoting work directory
+Oct 16, 2026 9:00:00 AM hudson.remoting.jnlp.Main$CuiListener status
+INFO: Locating server among [http://10.1.0.10:8080/]
+Oct 16, 2026 9:00:00 AM org.jenkinsci.remoting.engine.JnlpAgentEndpointResolver resolve
+INFO: Remoting server accepts the following protocols: [JNLP4-connect, Ping]
+Oct 16, 2026 9:00:00 AM hudson.remoting.jnlp.Main$CuiListener status
+INFO: Agent discovery successful
+  Agent address: 10.1.0.10
+  Agent port:    50000
+  Identity:      3c:1b:8f:2e:6d:41:90:aa:7f:02:5e:c4:9b:13:d8:66
+Oct 16, 2026 9:00:00 AM hudson.remoting.jnlp.Main$CuiListener status
+INFO: Handshaking
+Oct 16, 2026 9:00:00 AM hudson.remoting.jnlp.Main$CuiListener status
+INFO: Connecting to 10.1.0.10:50000
+Oct 16, 2026 9:00:00 AM hudson.remoting.jnlp.Main$CuiListener status
+INFO: Trying protocol: JNLP4-connect
+Oct 16, 2026 9:00:01 AM org.jenkinsci.remoting.protocol.impl.BIONetworkLayer$Reader run
+INFO: Waiting for ProtocolStack to start.
+Oct 16, 2026 9:00:01 AM hudson.remoting.jnlp.Main$CuiListener status
+INFO: Remote identity confirmed: 3c:1b:8f:2e:6d:41:90:aa:7f:02:5e:c4:9b:13:d8:66
+Oct 16, 2026 9:00:01 AM hudson.remoting.jnlp.Main$CuiListener status
+INFO: Connected
+"""
+# The number of times the recorded logs are repeated, standing in for a chatty agent.
+REPEAT = 5000
+
+
+def _measure(parse: typing.Callable[[typing.Iterable[str]], bool]) -> typing.Tuple[float, int]:
+    """Measure the wall time and peak memory of parsing the repeated recorded logs.
+
+    Args:
+        parse: The parsing function, returning whether the agent connected.
+
+    Returns:
+        The wall time in seconds and the peak traced memory in bytes.
+    """
+    lines = RECORDED_CONNECTION_LOG.splitlines(keepends=True) * REPEAT
+    tracemalloc.start()
+    start = time.perf_counter()
+    assert parse(lines)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def test_remoting_log_parser():
+    """
+    arrange: given the recorded remoting logs of a chatty agent.
+    act: when the logs are parsed accumulating all lines and with the remoting log parser.
+    assert: the parser memory stays constant, a fraction of the accumulated logs size.
+    """
+
+    def accumulate(lines: typing.Iterable[str]) -> bool:
+        """Parse the logs accumulating all lines and matching raw substrings.
+
+        Args:
+            lines: The log lines.
+
+        Returns:
+            Whether the agent connected.
+        """
+        connected = False
+        output = ""
+        for line in lines:
+            output += line
+            if "INFO: Connected" in line:
+                connected = True
+        logger.debug("%d characters of logs", len(output))
+        return connected
+
+    def parse(lines: typing.Iterable[str]) -> bool:
+        """Parse the logs with the remoting log parser.
+
+        Args:
+            lines: The log lines.
+
+        Returns:
+            Whether the agent connected.
+        """
+        parser = remoting_log.RemotingLogParser()
+        for line in lines:
+            parser.feed(line)
+        logger.debug("%d characters of logs", len(parser.get_tail()))
+        return parser.connected
+
+    accumulated_time, accumulated_peak = _measure(accumulate)
+    parsed_time, parsed_peak = _measure(parse)
+    line_count = len(RECORDED_CONNECTION_LOG.splitlines()) * REPEAT
+    logger.info(
+        "%d lines accumulated: %.3f s, peak %d KiB; parsed: %.3f s, peak %d KiB",
+        line_count,
+        accumulated_time,
+        accumulated_peak // 1024,
+        parsed_time,
+        parsed_peak // 1024,
+    )
+    assert parsed_peak < accumulated_peak / 10
@@ -80,3 +80,26 @@ async def test_agent_run_sudo(
 
     assert action.results["return-code"] == 0, action.results["stderr"]
     assert "NOPASSWD" in action.results["stdout"]
+
+
+async def test_metrics_endpoint(
+    application: Application,
+):
+    """
+    arrange: given a jenkins-agent-k8s charm.
+    act: when the metrics endpoint of the unit is scraped.
+    assert: the agent metrics of the exporter and the charm timings are served.
+    """
+    unit = application.units[0]
+    # The charm container shares the network namespace of the workload container.
+    command = (
+        'python3 -c "import urllib.request; print(urllib.request.urlopen('
+        "'http://localhost:8082/metrics', timeout=10).read().decode())\""
+    )
+
+    action = await unit.run(command)
+    await action.wait()
+
+    assert action.results["return-code"] == 0, action.results["stderr"]
+    assert 'jenkins_agent_up{agent="0"}' in action.results["stdout"]
+    assert "jenkins_agent_charm_agent_reconcile_seconds_count" in action.results["stdout"]
@@ -3,14 +3,20 @@
 
 """Fixtures for Jenkins-k8s-operator charm unit tests."""
 
+import hashlib
+import io
+import pathlib
 import secrets
 import typing
 import unittest.mock
+import zipfile
 
 import ops
 import pytest
+import requests
 from ops.testing import Harness
 
+import jar_store
 import server
 import state
 from charm import JenkinsAgentCharm
@@ -111,6 +117,155 @@ def agent_credentials_fixture():
     return server.Credentials(address="http://test-jenkins-url", secret=secrets.token_hex(16))
 
 
+@pytest.fixture(scope="function", name="agent_jar_download_dir", autouse=True)
+def agent_jar_download_dir_fixture(monkeypatch: pytest.MonkeyPatch, tmp_path: pathlib.Path):
+    """The charm container directory keeping partially downloaded agent JAR executables."""
+    monkeypatch.setattr(server, "AGENT_JAR_DOWNLOAD_DIR", tmp_path / "downloads")
+    return tmp_path / "downloads"
+
+
+@pytest.fixture(scope="function", name="http_session")
+def http_session_fixture():
+    """The HTTP session to the Jenkins server."""
+    return unittest.mock.MagicMock(spec=requests.Session)
+
+
+@pytest.fixture(scope="function", name="redirecting_session")
+def redirecting_session_fixture():
+    """HTTP session to a Jenkins server behind a redirect, e.g. from http to https.
+
+    The requests to http:// URLs are redirected to https:// where the Jenkins headers are
+    returned.
+    """
+
+    class RedirectingAdapter(requests.adapters.BaseAdapter):
+        """Transport adapter redirecting http:// requests to https://."""
+
+        def send(
+            self, request: requests.PreparedRequest, *_args: typing.Any, **_kwargs: typing.Any
+        ) -> requests.Response:
+            """Send a request.
+
+            Args:
+                request: The request.
+                _args: The transport positional options.
+                _kwargs: The transport options.
+
+            Returns:
+                A redirection to https:// for http:// URLs, the Jenkins headers otherwise.
+            """
+            response = requests.Response()
+            response.request = request
+            response.url = str(request.url)
+            response.raw = io.BytesIO(b"")
+            if response.url.startswith("http://"):
+                response.status_code = requests.codes.found
+                response.headers["Location"] = response.url.replace("http://", "https://", 1)
+            else:
+                response.status_code = requests.codes.ok
+                response.headers.update(
+                    {"X-Jenkins": "2.401", "X-Remoting-Minimum-Version": "3107.v665000b_51092"}
+                )
+            return response
+
+        def close(self) -> None:
+            """Close the adapter."""
+
+    session = requests.Session()
+    session.mount("http://", RedirectingAdapter())
+    session.mount("https://", RedirectingAdapter())
+    return session
+
+
+@pytest.fixture(scope="function", name="agent_jar")
+def agent_jar_fixture():
+    """The agent JAR executable content served by the Jenkins server."""
+    jar = io.BytesIO()
+    with zipfile.ZipFile(jar, "w") as jar_file:
+        jar_file.writestr(
+            "META-INF/MANIFEST.MF", "Manifest-Version: 1.0\nVersion: 3309.v27b_9314fd1a_4\n"
+        )
+        jar_file.writestr("hudson/remoting/Launcher.class", secrets.token_bytes(1024))
+    return jar.getvalue()
+
+
+@pytest.fixture(scope="function", name="get_mock_response")
+def get_mock_response_fixture():
+    """The factory of mock streamed responses from the Jenkins server."""
+
+    def get_mock_response(
+        status_code: int = requests.codes.ok,
+        chunks: typing.Iterable[typing.Union[bytes, Exception]] = (),
+        headers: typing.Optional[typing.Dict[str, str]] = None,
+    ) -> unittest.mock.MagicMock:
+        """Create a new mock streamed response.
+
+        Args:
+            status_code: The response status code.
+            chunks: The content chunks streamed, an exception is raised when reached.
+            headers: The response headers.
+
+        Returns:
+            The mock response.
+        """
+
+        def iter_content(*_args, **_kwargs):
+            """Stream the response content chunks.
+
+            Yields:
+                The content chunks.
+            """
+            for chunk in chunks:
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+
+        mock_response = unittest.mock.MagicMock(spec=requests.Response)
+        mock_response.status_code = status_code
+        mock_response.headers = headers or {}
+        mock_response.iter_content.side_effect = iter_content
+        mock_response.raise_for_status.side_effect = (
+            requests.HTTPError(response=mock_response) if status_code >= 400 else None
+        )
+        return mock_response
+
+    return get_mock_response
+
+
+@pytest.fixture(scope="function", name="agent_jar_metadata")
+def agent_jar_metadata_fixture(agent_jar: bytes):
+    """The metadata of an agent JAR executable downloaded from the Jenkins server."""
+    return server.AgentJarMetadata(
+        sha256=hashlib.sha256(agent_jar).hexdigest(),
+        etag='"agent-jar-etag"',
+        last_modified="Wed, 21 Oct 2015 07:28:00 GMT",
+    )
+
+
+@pytest.fixture(scope="function", name="get_mock_store_container")
+def get_mock_store_container_fixture():
+    """The factory of mock workload containers with an agent JAR executable store."""
+
+    def get_mock_store_container(index: jar_store.StoreIndex) -> unittest.mock.MagicMock:
+        """Create a new mock workload container with the agent JAR executable store.
+
+        Args:
+            index: The agent JAR executable store index.
+
+        Returns:
+            The mock workload container.
+        """
+        mock_container = unittest.mock.MagicMock(spec=ops.Container)
+        mock_container.exists.return_value = True
+        mock_container.pull.side_effect = lambda *_args, **_kwargs: io.StringIO(
+            index.model_dump_json()
+        )
+        mock_container.list_files.return_value = [unittest.mock.MagicMock(size=5)]
+        return mock_container
+
+    return get_mock_store_container
+
+
 @pytest.fixture(scope="function", name="raise_exception")
 def raise_exception_fixture():
     """The mock function for patching."""
@@ -147,6 +302,15 @@ def jenkins_used_credential_log_fixture():
     return "Given agent already registered. Skipping."
 
 
+@pytest.fixture(scope="function", name="jenkins_rejected_connection_log")
+def jenkins_rejected_connection_log_fixture():
+    """The logs produced by Jenkins agent on a connection rejected by the server."""
+    return """<TIME_REDACTED> hudson.remoting.jnlp.Main$CuiListener error
+SEVERE: The server rejected the connection: None of the protocols were accepted
+java.lang.Exception: The server rejected the connection: None of the protocols were accepted
+"""
+
+
 @pytest.fixture(scope="function", name="jenkins_connection_log")
 def jenkins_connection_log_fixture():
     """The logs produced by Jenkins on successful connection."""
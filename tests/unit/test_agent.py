@@ -193,6 +193,7 @@ def test_agent_relation_changed(
     get_event_relation_data: typing.Callable[
         [str], typing.Tuple[unittest.mock.MagicMock, typing.Dict[str, str]]
     ],
+    agent_jar_metadata: server.AgentJarMetadata,
 ):
     """
     arrange: given a monkeypatched server actions that pass.
@@ -200,7 +201,9 @@ def test_agent_relation_changed(
     assert: the unit falls into ActiveStatus.
     """
     (mock_event, relation_data) = get_event_relation_data(state.AGENT_RELATION)
-    monkeypatch.setattr(server, "download_jenkins_agent", lambda *_args, **_kwargs: None)
+    monkeypatch.setattr(
+        server, "download_jenkins_agent", lambda *_args, **_kwargs: agent_jar_metadata
+    )
     monkeypatch.setattr(server, "validate_credentials", lambda *_args, **_kwargs: True)
     harness.set_can_connect("jenkins-agent-k8s", True)
     relation_id = harness.add_relation(state.AGENT_RELATION, "jenkins")
@@ -0,0 +1,393 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Jenkins-agent-k8s agent JAR module tests."""
+
+import typing
+import unittest.mock
+
+import ops
+import ops.testing
+import pytest
+
+import agent_jar
+import server
+from charm import JenkinsAgentCharm
+
+
+def test_install(
+    monkeypatch: pytest.MonkeyPatch,
+    harness: ops.testing.Harness,
+    agent_jar_metadata: server.AgentJarMetadata,
+):
+    """
+    arrange: given a monkeypatched download_jenkins_agent that returns agent JAR metadata.
+    act: when install is called repeatedly.
+    assert: the agent JAR metadata is kept in the charm state.
+    """
+    monkeypatch.setattr(
+        server,
+        "download_jenkins_agent",
+        unittest.mock.MagicMock(
+            spec=server.download_jenkins_agent, return_value=agent_jar_metadata
+        ),
+    )
+    harness.begin()
+    jenkins_charm = typing.cast(JenkinsAgentCharm, harness.charm)
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+
+    assert jenkins_charm.agent_jar_manager.metadata is None
+    for _ in range(2):
+        metadata = jenkins_charm.agent_jar_manager.install(
+            server_url="http://test-url", container=mock_container
+        )
+
+        assert metadata == agent_jar_metadata
+        assert jenkins_charm.agent_jar_manager.metadata == agent_jar_metadata
+
+
+@pytest.mark.parametrize(
+    "minimum_version, expected_bundled",
+    [
+        pytest.param(None, True, id="unknown minimum version"),
+        pytest.param("3107.v665000b_51092", True, id="compatible"),
+        pytest.param("3400.v1", False, id="incompatible"),
+    ],
+)
+def test_install_resource(
+    monkeypatch: pytest.MonkeyPatch,
+    harness: ops.testing.Harness,
+    agent_jar: bytes,
+    agent_jar_metadata: server.AgentJarMetadata,
+    minimum_version: typing.Optional[str],
+    expected_bundled: bool,
+):
+    """
+    arrange: given an agent JAR attached as the charm resource and a server minimum remoting \
+        version.
+    act: when install is called.
+    assert: the agent JAR resource is installed if compatible, otherwise it is downloaded.
+    """
+    monkeypatch.setattr(
+        server, "get_remoting_minimum_version", lambda *_args, **_kwargs: minimum_version
+    )
+    mock_install = unittest.mock.MagicMock(
+        spec=server.install_bundled_agent_jar, return_value=agent_jar_metadata
+    )
+    monkeypatch.setattr(server, "install_bundled_agent_jar", mock_install)
+    mock_download = unittest.mock.MagicMock(
+        spec=server.download_jenkins_agent, return_value=agent_jar_metadata
+    )
+    monkeypatch.setattr(server, "download_jenkins_agent", mock_download)
+    harness.add_resource("agent-jar", agent_jar)
+    harness.begin()
+    jenkins_charm = typing.cast(JenkinsAgentCharm, harness.charm)
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+
+    jenkins_charm.agent_jar_manager.install(server_url="http://test-url", container=mock_container)
+
+    assert mock_install.called == expected_bundled
+    assert mock_download.called != expected_bundled
+    if expected_bundled:
+        bundled = mock_install.call_args.kwargs["bundled"]
+        assert bundled.sha256 == agent_jar_metadata.sha256
+        assert bundled.version == "3309.v27b_9314fd1a_4"
+        assert not bundled.in_container
+
+
+@pytest.mark.parametrize(
+    "resource",
+    [
+        pytest.param(b"", id="empty resource"),
+        pytest.param(b"not a jar", id="invalid resource"),
+    ],
+)
+def test_install_rock(
+    monkeypatch: pytest.MonkeyPatch,
+    harness: ops.testing.Harness,
+    agent_jar_metadata: server.AgentJarMetadata,
+    resource: bytes,
+):
+    """
+    arrange: given an empty or invalid charm resource and an agent JAR baked into the rock.
+    act: when install is called.
+    assert: the agent JAR of the rock is installed.
+    """
+    monkeypatch.setattr(server, "get_remoting_minimum_version", lambda *_args, **_kwargs: None)
+    mock_install = unittest.mock.MagicMock(
+        spec=server.install_bundled_agent_jar, return_value=agent_jar_metadata
+    )
+    monkeypatch.setattr(server, "install_bundled_agent_jar", mock_install)
+    harness.add_resource("agent-jar", resource)
+    harness.set_can_connect("jenkins-agent-k8s", True)
+    harness.begin()
+    container = harness.model.unit.get_container("jenkins-agent-k8s")
+    container.push(
+        server.ROCK_AGENT_JAR_METADATA_PATH,
+        f'{{"sha256": "{agent_jar_metadata.sha256}", "version": "3309.v1"}}',
+        make_dirs=True,
+    )
+    jenkins_charm = typing.cast(JenkinsAgentCharm, harness.charm)
+
+    jenkins_charm.agent_jar_manager.install(server_url="http://test-url", container=container)
+
+    assert mock_install.call_args.kwargs["bundled"] == server.BundledAgentJar(
+        sha256=agent_jar_metadata.sha256,
+        version="3309.v1",
+        path=server.ROCK_AGENT_JAR_PATH,
+        in_container=True,
+    )
+
+
+@pytest.mark.parametrize(
+    "peer_data, peer_error, expected_peer",
+    [
+        pytest.param(None, None, False, id="no peer agent.jar"),
+        pytest.param("invalid", None, False, id="invalid peer agent.jar"),
+        pytest.param(
+            {"server_url": "http://other-url"}, None, False, id="peer agent.jar of other server"
+        ),
+        pytest.param({}, server.AgentJarDownloadError, False, id="peer download error"),
+        pytest.param({}, None, True, id="peer agent.jar"),
+    ],
+)
+def test_install_from_peer(
+    monkeypatch: pytest.MonkeyPatch,
+    harness: ops.testing.Harness,
+    agent_jar_metadata: server.AgentJarMetadata,
+    peer_data: typing.Optional[typing.Union[str, typing.Dict[str, str]]],
+    peer_error: typing.Optional[typing.Type[Exception]],
+    expected_peer: bool,
+):
+    """
+    arrange: given a non-leader unit and the agent JAR published by the leader unit.
+    act: when install is called.
+    assert: the agent JAR is installed from the leader unit if published for the same server, \
+        otherwise it is downloaded from the server.
+    """
+    mock_peer_download = unittest.mock.MagicMock(
+        spec=server.download_peer_agent_jar,
+        return_value=agent_jar_metadata,
+        side_effect=peer_error,
+    )
+    monkeypatch.setattr(server, "download_peer_agent_jar", mock_peer_download)
+    mock_download = unittest.mock.MagicMock(
+        spec=server.download_jenkins_agent, return_value=agent_jar_metadata
+    )
+    monkeypatch.setattr(server, "download_jenkins_agent", mock_download)
+    relation_id = harness.add_relation(agent_jar.PEER_RELATION, "jenkins-agent-k8s")
+    if isinstance(peer_data, dict):
+        peer_agent_jar = agent_jar.PeerAgentJar(
+            server_url="http://test-url",
+            url="http://10.0.0.1:8081/agent.jar",
+            metadata=agent_jar_metadata,
+        ).model_copy(update=peer_data)
+        harness.update_relation_data(
+            relation_id,
+            "jenkins-agent-k8s",
+            {agent_jar.PEER_AGENT_JAR_KEY: peer_agent_jar.model_dump_json()},
+        )
+    elif peer_data:
+        harness.update_relation_data(
+            relation_id, "jenkins-agent-k8s", {agent_jar.PEER_AGENT_JAR_KEY: peer_data}
+        )
+    harness.begin()
+    jenkins_charm = typing.cast(JenkinsAgentCharm, harness.charm)
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+    mock_container.exists.return_value = False
+
+    jenkins_charm.agent_jar_manager.install(server_url="http://test-url", container=mock_container)
+
+    assert mock_download.called != expected_peer
+    if expected_peer:
+        assert mock_peer_download.call_args.kwargs["url"] == "http://10.0.0.1:8081/agent.jar"
+
+
+def test_install_leader_publishes(
+    monkeypatch: pytest.MonkeyPatch,
+    harness: ops.testing.Harness,
+    agent_jar_metadata: server.AgentJarMetadata,
+):
+    """
+    arrange: given a leader unit with a peer relation.
+    act: when install is called.
+    assert: the agent JAR store is served and the installed agent JAR is published to the peer \
+        units.
+    """
+    monkeypatch.setattr(
+        server, "download_jenkins_agent", lambda *_args, **_kwargs: agent_jar_metadata
+    )
+    relation_id = harness.add_relation(agent_jar.PEER_RELATION, "jenkins-agent-k8s")
+    harness.set_leader(True)
+    harness.set_can_connect("jenkins-agent-k8s", True)
+    harness.begin()
+    jenkins_charm = typing.cast(JenkinsAgentCharm, harness.charm)
+    container = harness.model.unit.get_container("jenkins-agent-k8s")
+
+    jenkins_charm.agent_jar_manager.install(server_url="http://test-url", container=container)
+
+    peer_agent_jar = agent_jar.PeerAgentJar.model_validate_json(
+        harness.get_relation_data(relation_id, "jenkins-agent-k8s")[agent_jar.PEER_AGENT_JAR_KEY]
+    )
+    assert peer_agent_jar.server_url == "http://test-url"
+    assert peer_agent_jar.metadata == agent_jar_metadata
+    assert peer_agent_jar.url.endswith(f":8081/{agent_jar_metadata.sha256}.jar")
+    assert agent_jar.AGENT_JAR_SERVER_SERVICE in container.get_plan().services
+
+
+def test_install_leader_serves_only_agent_jar_server(
+    monkeypatch: pytest.MonkeyPatch,
+    harness: ops.testing.Harness,
+    agent_jar_metadata: server.AgentJarMetadata,
+):
+    """
+    arrange: given a leader unit with a peer relation and a stopped enabled agent service.
+    act: when install is called twice.
+    assert: only the agent JAR server is started, once, and the agent service is left stopped.
+    """
+    monkeypatch.setattr(
+        server, "download_jenkins_agent", lambda *_args, **_kwargs: agent_jar_metadata
+    )
+    harness.add_relation(agent_jar.PEER_RELATION, "jenkins-agent-k8s")
+    harness.set_leader(True)
+    harness.set_can_connect("jenkins-agent-k8s", True)
+    harness.begin()
+    jenkins_charm = typing.cast(JenkinsAgentCharm, harness.charm)
+    container = harness.model.unit.get_container("jenkins-agent-k8s")
+    container.add_layer(
+        "agent",
+        {"services": {"agent": {"override": "replace", "command": "agent", "startup": "enabled"}}},
+    )
+    restart = unittest.mock.MagicMock(wraps=container.restart)
+    monkeypatch.setattr(container, "restart", restart)
+
+    jenkins_charm.agent_jar_manager.install(server_url="http://test-url", container=container)
+    jenkins_charm.agent_jar_manager.install(server_url="http://test-url", container=container)
+
+    restart.assert_called_once_with(agent_jar.AGENT_JAR_SERVER_SERVICE)
+    assert container.get_service(agent_jar.AGENT_JAR_SERVER_SERVICE).is_running()
+    assert not container.get_service("agent").is_running()
+
+
+def test_install_leader_no_address(
+    monkeypatch: pytest.MonkeyPatch,
+    harness: ops.testing.Harness,
+    agent_jar_metadata: server.AgentJarMetadata,
+):
+    """
+    arrange: given a leader unit with a peer relation without a network binding.
+    act: when install is called.
+    assert: nothing is published to the peer units.
+    """
+    monkeypatch.setattr(
+        server, "download_jenkins_agent", lambda *_args, **_kwargs: agent_jar_metadata
+    )
+    relation_id = harness.add_relation(agent_jar.PEER_RELATION, "jenkins-agent-k8s")
+    harness.set_leader(True)
+    harness.begin()
+    monkeypatch.setattr(harness.model, "get_binding", lambda *_args: None)
+    jenkins_charm = typing.cast(JenkinsAgentCharm, harness.charm)
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+    mock_container.exists.return_value = False
+
+    jenkins_charm.agent_jar_manager.install(server_url="http://test-url", container=mock_container)
+
+    assert not harness.get_relation_data(relation_id, "jenkins-agent-k8s")
+    mock_container.add_layer.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "busy, previous_sha256, installed_version, expected_updated",
+    [
+        pytest.param(True, None, None, False, id="busy"),
+        pytest.param(False, None, None, True, id="first install"),
+        pytest.param(False, "previous", "2.401", True, id="new agent.jar"),
+        pytest.param(False, "same", None, False, id="same agent.jar"),
+    ],
+)
+def test_update(
+    monkeypatch: pytest.MonkeyPatch,
+    harness: ops.testing.Harness,
+    agent_jar_metadata: server.AgentJarMetadata,
+    busy: bool,
+    previous_sha256: typing.Optional[str],
+    installed_version: typing.Optional[str],
+    expected_updated: bool,
+):
+    """
+    arrange: given an idle or busy agent and a previously installed agent JAR.
+    act: when update is called after a server version change.
+    assert: the new agent JAR is only staged while busy, otherwise it is installed and the \
+        server version is recorded.
+    """
+    monkeypatch.setattr(server, "is_agent_busy", lambda *_args: busy)
+    mock_download = unittest.mock.MagicMock(
+        spec=server.download_jenkins_agent,
+        return_value=agent_jar_metadata.model_copy(update={"version": installed_version}),
+    )
+    monkeypatch.setattr(server, "download_jenkins_agent", mock_download)
+    harness.begin()
+    jenkins_charm = typing.cast(JenkinsAgentCharm, harness.charm)
+    if previous_sha256:
+        sha256 = agent_jar_metadata.sha256 if previous_sha256 == "same" else previous_sha256
+        jenkins_charm.agent_jar_manager._stored.agent_jar_metadata = {"sha256": sha256}
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+    mock_container.exists.return_value = False
+
+    updated = jenkins_charm.agent_jar_manager.update(
+        server_url="http://test-url", container=mock_container, version="2.401"
+    )
+
+    assert updated == expected_updated
+    assert mock_download.call_args.kwargs.get("activate", True) != busy
+    if busy:
+        mock_container.push.assert_not_called()
+    else:
+        mock_container.push.assert_called_once_with(
+            server.AGENT_JAR_VERSION_PATH, "2.401", make_dirs=True, user=server.USER
+        )
+
+
+@pytest.mark.parametrize(
+    "busy",
+    [pytest.param(True, id="busy"), pytest.param(False, id="idle")],
+)
+def test_update_bundled(
+    monkeypatch: pytest.MonkeyPatch,
+    harness: ops.testing.Harness,
+    agent_jar_metadata: server.AgentJarMetadata,
+    busy: bool,
+):
+    """
+    arrange: given a busy or idle agent and a bundled agent JAR supported by the new Jenkins \
+        server version.
+    act: when update is called after a server version change.
+    assert: nothing is downloaded from the server, the bundled agent JAR is installed once the \
+        agent is idle.
+    """
+    monkeypatch.setattr(server, "is_agent_busy", lambda *_args: busy)
+    monkeypatch.setattr(server, "get_remoting_minimum_version", lambda *_args, **_kwargs: None)
+    mock_install = unittest.mock.MagicMock(
+        spec=server.install_bundled_agent_jar, return_value=agent_jar_metadata
+    )
+    monkeypatch.setattr(server, "install_bundled_agent_jar", mock_install)
+    mock_download = unittest.mock.MagicMock(spec=server.download_jenkins_agent)
+    monkeypatch.setattr(server, "download_jenkins_agent", mock_download)
+    harness.set_can_connect("jenkins-agent-k8s", True)
+    harness.begin()
+    container = harness.model.unit.get_container("jenkins-agent-k8s")
+    container.push(
+        server.ROCK_AGENT_JAR_METADATA_PATH,
+        f'{{"sha256": "{agent_jar_metadata.sha256}", "version": "3309.v1"}}',
+        make_dirs=True,
+    )
+    jenkins_charm = typing.cast(JenkinsAgentCharm, harness.charm)
+
+    updated = jenkins_charm.agent_jar_manager.update(
+        server_url="http://test-url", container=container, version="2.401"
+    )
+
+    mock_download.assert_not_called()
+    assert mock_install.called != busy
+    assert updated != busy
+    assert container.exists(str(server.AGENT_JAR_VERSION_PATH)) != busy
@@ -0,0 +1,228 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Jenkins-agent-k8s cache bundle module tests."""
+
+import hashlib
+import io
+import tarfile
+import typing
+import unittest.mock
+from pathlib import Path
+
+import ops
+import pytest
+from ops.testing import Harness
+
+import cache_bundle
+
+
+def _add_file(bundle: tarfile.TarFile, name: str, content: bytes) -> None:
+    """Add a regular file to a tar archive.
+
+    Args:
+        bundle: The tar archive.
+        name: The file name.
+        content: The file content.
+    """
+    info = tarfile.TarInfo(name)
+    info.size = len(content)
+    bundle.addfile(info, io.BytesIO(content))
+
+
+def _create_bundle(path: Path, jar_content: bytes = b"jar") -> Path:
+    """Create a cache bundle with a directory, files, links and unsafe entries.
+
+    Args:
+        path: The cache bundle path.
+        jar_content: The content of the cached JAR file.
+
+    Returns:
+        The cache bundle path.
+    """
+    with tarfile.open(path, "w:gz") as bundle:
+        directory = tarfile.TarInfo(".m2")
+        directory.type = tarfile.DIRTYPE
+        bundle.addfile(directory)
+        _add_file(bundle, ".m2/repository/lib.jar", jar_content)
+        _add_file(bundle, "tools/jdk/bin/java", b"java")
+        link = tarfile.TarInfo("tools/jdk/bin/java-link")
+        link.type, link.linkname = tarfile.LNKTYPE, "tools/jdk/bin/java"
+        bundle.addfile(link)
+        symlink = tarfile.TarInfo("tools/current")
+        symlink.type, symlink.linkname = tarfile.SYMTYPE, "jdk"
+        bundle.addfile(symlink)
+        _add_file(bundle, "../escape", b"unsafe")
+        escaping_symlink = tarfile.TarInfo("tools/etc")
+        escaping_symlink.type, escaping_symlink.linkname = tarfile.SYMTYPE, "../../etc"
+        bundle.addfile(escaping_symlink)
+        fifo = tarfile.TarInfo("tools/fifo")
+        fifo.type = tarfile.FIFOTYPE
+        bundle.addfile(fifo)
+    return path
+
+
+@pytest.fixture(name="container")
+def container_fixture() -> unittest.mock.MagicMock:
+    """Workload container mock keeping the pushed files."""
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+    files: typing.Dict[Path, bytes] = {}
+
+    def push(path: Path, source: typing.Union[str, typing.IO[bytes]], **_: typing.Any) -> None:
+        """Keep a pushed file.
+
+        Args:
+            path: The file path.
+            source: The file content.
+            _: The push options.
+        """
+        files[path] = source.encode("utf-8") if isinstance(source, str) else source.read()
+
+    def pull(path: Path, **_: typing.Any) -> io.StringIO:
+        """Read a pushed file.
+
+        Args:
+            path: The file path.
+            _: The pull options.
+
+        Raises:
+            PathError: if the file was not pushed.
+
+        Returns:
+            The file content.
+        """
+        if path not in files:
+            raise ops.pebble.PathError("not-found", "not found")
+        return io.StringIO(files[path].decode("utf-8"))
+
+    mock_container.push.side_effect = push
+    mock_container.pull.side_effect = pull
+    mock_container.files = files
+    return mock_container
+
+
+def _unpack(container: unittest.mock.MagicMock) -> typing.List[str]:
+    """Unpack the pushed delta as the unpacking service does.
+
+    Args:
+        container: The workload container mock.
+
+    Returns:
+        The names of the delta entries.
+    """
+    files = container.files
+    with tarfile.open(fileobj=io.BytesIO(files.pop(cache_bundle.DELTA_PATH))) as delta:
+        names = delta.getnames()
+    files[cache_bundle.MANIFEST_PATH] = files.pop(cache_bundle.PENDING_MANIFEST_PATH)
+    return names
+
+
+def test_fetch_resource(harness: Harness):
+    """
+    arrange: given a charm without cache bundle resource, then with an empty one.
+    act: when fetch_resource is called.
+    assert: no cache bundle is returned.
+    """
+    harness.begin()
+
+    assert cache_bundle.fetch_resource(harness.model) is None
+    harness.add_resource(cache_bundle.CACHE_BUNDLE_RESOURCE_NAME, b"")
+    assert cache_bundle.fetch_resource(harness.model) is None
+
+
+def test_push_delta(tmp_path: Path, container: unittest.mock.MagicMock):
+    """
+    arrange: given a cache bundle with unsafe entries and no unpacked cache bundle.
+    act: when push_delta is called.
+    assert: the safe entries are pushed, the hard link as a regular file.
+    """
+    bundle_path = _create_bundle(tmp_path / "cache-bundle.tar")
+
+    assert cache_bundle.push_delta(container, bundle_path)
+
+    with tarfile.open(fileobj=io.BytesIO(container.files[cache_bundle.DELTA_PATH])) as delta:
+        assert delta.getnames() == [
+            ".m2",
+            ".m2/repository/lib.jar",
+            "tools/jdk/bin/java",
+            "tools/jdk/bin/java-link",
+            "tools/current",
+        ]
+        link_file = typing.cast(typing.IO[bytes], delta.extractfile("tools/jdk/bin/java-link"))
+        assert link_file.read() == b"java"
+    assert cache_bundle.MANIFEST_PATH not in container.files
+
+
+def test_push_delta_dangling_hard_link(tmp_path: Path, container: unittest.mock.MagicMock):
+    """
+    arrange: given a cache bundle with a hard link to a missing entry.
+    act: when push_delta is called.
+    assert: the other entries are pushed and the hard link is ignored.
+    """
+    bundle_path = tmp_path / "cache-bundle.tar"
+    with tarfile.open(bundle_path, "w") as bundle:
+        link = tarfile.TarInfo("tools/dangling")
+        link.type, link.linkname = tarfile.LNKTYPE, "tools/missing"
+        bundle.addfile(link)
+        _add_file(bundle, "tools/java", b"java")
+
+    assert cache_bundle.push_delta(container, bundle_path)
+
+    assert _unpack(container) == ["tools/java"]
+    manifest = cache_bundle.CacheBundleManifest.model_validate_json(
+        container.files[cache_bundle.MANIFEST_PATH]
+    )
+    assert list(manifest.entries) == ["tools/java"]
+
+
+def test_push_delta_changed(tmp_path: Path, container: unittest.mock.MagicMock):
+    """
+    arrange: given an unpacked cache bundle.
+    act: when push_delta is called with the same cache bundle, then a cache bundle with a \
+        changed entry.
+    assert: nothing is pushed for the same cache bundle, only the changed entry otherwise.
+    """
+    cache_bundle.push_delta(container, _create_bundle(tmp_path / "cache-bundle.tar"))
+    _unpack(container)
+
+    assert not cache_bundle.push_delta(container, tmp_path / "cache-bundle.tar")
+    assert cache_bundle.push_delta(
+        container, _create_bundle(tmp_path / "cache-bundle-2.tar", b"new jar")
+    )
+    assert _unpack(container) == [".m2/repository/lib.jar"]
+
+
+def test_push_delta_unchanged_entries(tmp_path: Path, container: unittest.mock.MagicMock):
+    """
+    arrange: given an unpacked cache bundle.
+    act: when push_delta is called with a repacked cache bundle with the same entries.
+    assert: no delta is pushed and the manifest is updated.
+    """
+    cache_bundle.push_delta(container, _create_bundle(tmp_path / "cache-bundle.tar"))
+    _unpack(container)
+    with (
+        tarfile.open(tmp_path / "cache-bundle.tar") as bundle,
+        tarfile.open(tmp_path / "repacked.tar", "w") as repacked,
+    ):
+        for member in bundle:
+            repacked.addfile(member, bundle.extractfile(member) if member.isfile() else None)
+
+    assert not cache_bundle.push_delta(container, tmp_path / "repacked.tar")
+    assert cache_bundle.DELTA_PATH not in container.files
+    manifest = cache_bundle.CacheBundleManifest.model_validate_json(
+        container.files[cache_bundle.MANIFEST_PATH]
+    )
+    assert manifest.sha256 == hashlib.sha256((tmp_path / "repacked.tar").read_bytes()).hexdigest()
+    assert not cache_bundle.push_delta(container, tmp_path / "repacked.tar")
+
+
+def test_push_delta_invalid_manifest(tmp_path: Path, container: unittest.mock.MagicMock):
+    """
+    arrange: given an invalid manifest of the unpacked cache bundle.
+    act: when push_delta is called.
+    assert: all the entries are pushed.
+    """
+    container.files[cache_bundle.MANIFEST_PATH] = b"{}"
+
+    assert cache_bundle.push_delta(container, _create_bundle(tmp_path / "cache-bundle.tar"))
+    assert len(_unpack(container)) == 5
@@ -14,11 +14,13 @@ import ops
 import pytest
 from ops.testing import Harness
 
+import cache_bundle
+import pebble
 import server
 import state
 from charm import JenkinsAgentCharm
 
-from .constants import ACTIVE_STATUS_NAME, BLOCKED_STATUS_NAME
+from .constants import ACTIVE_STATUS_NAME, BLOCKED_STATUS_NAME, MAINTENANCE_STATUS_NAME
 
 
 def test___init___invalid_state(
@@ -125,14 +127,19 @@ def test__register_agent_from_config_no_valid_credentials(
     monkeypatch: pytest.MonkeyPatch,
     harness: Harness,
     config: typing.Dict[str, str],
+    agent_jar_metadata: server.AgentJarMetadata,
 ):
     """
     arrange: given a charm with monkeypatched validate_credentials that returns false.
     act: when _on_config_changed is called.
     assert: unit falls into BlockedStatus.
     """
-    monkeypatch.setattr(server, "download_jenkins_agent", lambda *_args, **_kwargs: None)
+    monkeypatch.setattr(
+        server, "download_jenkins_agent", lambda *_args, **_kwargs: agent_jar_metadata
+    )
     monkeypatch.setattr(server, "validate_credentials", lambda *_args, **_kwargs: False)
+    monkeypatch.setattr(server, "get_credentials_validation_timeout", lambda **_kwargs: 5)
+    monkeypatch.setattr(server, "precheck_credentials", lambda *_args, **_kwargs: True)
     harness.set_can_connect("jenkins-agent-k8s", True)
     harness.update_config(config)
     harness.begin()
@@ -170,14 +177,19 @@ def test__register_agent_from_config(
     monkeypatch: pytest.MonkeyPatch,
     harness: Harness,
     config: typing.Dict[str, str],
+    agent_jar_metadata: server.AgentJarMetadata,
 ):
     """
     arrange: given a charm with monkeypatched server functions that returns passing values.
     act: when _register_agent_from_config is called.
     assert: unit falls into ActiveStatus.
     """
-    monkeypatch.setattr(server, "download_jenkins_agent", lambda *_args, **_kwargs: None)
+    monkeypatch.setattr(
+        server, "download_jenkins_agent", lambda *_args, **_kwargs: agent_jar_metadata
+    )
     monkeypatch.setattr(server, "validate_credentials", lambda *_args, **_kwargs: True)
+    monkeypatch.setattr(server, "get_credentials_validation_timeout", lambda **_kwargs: 5)
+    monkeypatch.setattr(server, "precheck_credentials", lambda *_args, **_kwargs: True)
     harness.set_can_connect("jenkins-agent-k8s", True)
     harness.update_config(config)
     harness.begin()
@@ -189,16 +201,219 @@ def test__register_agent_from_config(
     assert jenkins_charm.unit.status.name == ACTIVE_STATUS_NAME
 
 
+@pytest.mark.parametrize(
+    "started_pair, expected_status_name",
+    [
+        pytest.param(("agent", "token"), ACTIVE_STATUS_NAME, id="agent connected"),
+        pytest.param(None, BLOCKED_STATUS_NAME, id="no valid pair"),
+    ],
+)
+def test__register_agent_from_config_by_starting(  # pylint: disable=too-many-arguments
+    monkeypatch: pytest.MonkeyPatch,
+    harness: Harness,
+    config: typing.Dict[str, str],
+    agent_jar_metadata: server.AgentJarMetadata,
+    started_pair: typing.Optional[typing.Tuple[str, str]],
+    expected_status_name: str,
+):
+    """
+    arrange: given a charm configured to register by starting the agent service.
+    act: when _register_agent_from_config is called.
+    assert: the agent service is started without validation agents and the unit status \
+        reflects whether it connected.
+    """
+    monkeypatch.setattr(
+        server, "download_jenkins_agent", lambda *_args, **_kwargs: agent_jar_metadata
+    )
+    mock_validate = MagicMock(spec=server.validate_credentials)
+    monkeypatch.setattr(server, "validate_credentials", mock_validate)
+    monkeypatch.setattr(server, "get_credentials_validation_timeout", lambda **_kwargs: 5)
+    mock_start_agent = MagicMock(return_value=started_pair)
+    monkeypatch.setattr(pebble.PebbleService, "start_agent", mock_start_agent)
+    harness.set_can_connect("jenkins-agent-k8s", True)
+    harness.update_config({**config, "jenkins_agent_registration": "start"})
+    harness.begin()
+    mock_event = MagicMock(spec=ops.ConfigChangedEvent)
+
+    jenkins_charm = typing.cast(JenkinsAgentCharm, harness.charm)
+    jenkins_charm._on_config_changed(mock_event)
+
+    assert jenkins_charm.unit.status.name == expected_status_name
+    assert mock_start_agent.call_args.kwargs["timeout"] == 5
+    mock_validate.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "started_pairs, expected_agent_count, expected_message",
+    [
+        pytest.param(
+            [("agent-0", "token"), ("agent-1", "token"), ("agent-2", "token")],
+            3,
+            "",
+            id="all agents connected",
+        ),
+        pytest.param(
+            [("agent-0", "token"), ("agent-2", "token"), None],
+            2,
+            "2 of 3 agents connected.",
+            id="agents missing",
+        ),
+    ],
+)
+def test__register_agent_from_config_extra_agents(  # pylint: disable=too-many-arguments
+    monkeypatch: pytest.MonkeyPatch,
+    harness: Harness,
+    config: typing.Dict[str, str],
+    agent_jar_metadata: server.AgentJarMetadata,
+    started_pairs: typing.List[typing.Optional[typing.Tuple[str, str]]],
+    expected_agent_count: int,
+    expected_message: str,
+):
+    """
+    arrange: given a charm configured to run three agent services with three pairs.
+    act: when _register_agent_from_config is called.
+    assert: the additional agents are started with the pairs not used by the other agents and \
+        the agents beyond the connected ones are stopped.
+    """
+    monkeypatch.setattr(
+        server, "download_jenkins_agent", lambda *_args, **_kwargs: agent_jar_metadata
+    )
+    monkeypatch.setattr(server, "get_credentials_validation_timeout", lambda **_kwargs: 5)
+    started = iter(started_pairs)
+    start_calls: typing.List[typing.Tuple[int, typing.List[typing.Tuple[str, str]]]] = []
+
+    def start_agent(*_args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+        """Record the index and pairs of an agent start.
+
+        Args:
+            kwargs: The start_agent keyword arguments.
+
+        Returns:
+            The next started pair.
+        """
+        start_calls.append((kwargs.get("index", 0), list(kwargs["agent_token_pairs"])))
+        return next(started)
+
+    monkeypatch.setattr(pebble.PebbleService, "start_agent", start_agent)
+    mock_stop_extra_agents = MagicMock()
+    monkeypatch.setattr(pebble.PebbleService, "stop_extra_agents", mock_stop_extra_agents)
+    harness.set_can_connect("jenkins-agent-k8s", True)
+    harness.update_config(
+        {
+            **config,
+            "jenkins_agent_name": "agent-0:agent-1:agent-2",
+            "jenkins_agent_token": "token:token:token",
+            "jenkins_agent_registration": "start",
+            "jenkins_agent_services": 3,
+        }
+    )
+    harness.begin()
+    mock_event = MagicMock(spec=ops.ConfigChangedEvent)
+
+    jenkins_charm = typing.cast(JenkinsAgentCharm, harness.charm)
+    jenkins_charm._on_config_changed(mock_event)
+
+    assert jenkins_charm.unit.status.name == ACTIVE_STATUS_NAME
+    assert jenkins_charm.unit.status.message == expected_message
+    assert start_calls[1:] == [
+        (1, [("agent-1", "token"), ("agent-2", "token")]),
+        (
+            2,
+            [
+                pair
+                for pair in (("agent-1", "token"), ("agent-2", "token"))
+                if pair != started_pairs[1]
+            ],
+        ),
+    ]
+    assert mock_stop_extra_agents.call_args.kwargs["agent_count"] == expected_agent_count
+
+
+@pytest.mark.parametrize(
+    "can_connect, expected_updated",
+    [
+        pytest.param(False, False, id="container not ready"),
+        pytest.param(True, True, id="container ready"),
+    ],
+)
+def test__on_update_status(
+    monkeypatch: pytest.MonkeyPatch, harness: Harness, can_connect: bool, expected_updated: bool
+):
+    """
+    arrange: given a charm with a monkeypatched pebble service.
+    act: when update status is fired.
+    assert: the agent checks are adapted to the agent connection state if the container is ready.
+    """
+    mock_update_checks = MagicMock()
+    monkeypatch.setattr(pebble.PebbleService, "update_checks", mock_update_checks)
+    harness.set_can_connect("jenkins-agent-k8s", can_connect)
+    harness.begin()
+
+    harness.charm.on.update_status.emit()
+
+    assert mock_update_checks.called == expected_updated
+
+
+@pytest.mark.parametrize(
+    "params, idle",
+    [
+        pytest.param({}, True, id="idle"),
+        pytest.param({"timeout": 10}, False, id="builds running"),
+    ],
+)
+def test__on_drain_action(
+    monkeypatch: pytest.MonkeyPatch, harness: Harness, params: typing.Dict[str, int], idle: bool
+):
+    """
+    arrange: given a charm with agents idle or running builds.
+    act: when the drain action is run.
+    assert: the agents are drained for the given time and stopped.
+    """
+    mock_drain_agent = MagicMock(return_value=idle)
+    monkeypatch.setattr(pebble.PebbleService, "drain_agent", mock_drain_agent)
+    mock_stop_agent = MagicMock()
+    monkeypatch.setattr(pebble.PebbleService, "stop_agent", mock_stop_agent)
+    harness.set_can_connect("jenkins-agent-k8s", True)
+    harness.begin()
+
+    output = harness.run_action("drain", params)
+
+    assert output.results == {"idle": idle}
+    assert mock_drain_agent.call_args.kwargs["timeout"] == params.get("timeout")
+    assert mock_stop_agent.call_args.kwargs["drain"] is False
+    assert harness.charm.unit.status.name == MAINTENANCE_STATUS_NAME
+
+
+def test__on_drain_action_container_not_ready(harness: Harness):
+    """
+    arrange: given a charm with a workload container that is not ready yet.
+    act: when the drain action is run.
+    assert: the action fails.
+    """
+    harness.set_can_connect("jenkins-agent-k8s", False)
+    harness.begin()
+
+    with pytest.raises(ops.testing.ActionFailed):
+        harness.run_action("drain")
+
+
 def test__on_upgrade_charm(
-    monkeypatch: pytest.MonkeyPatch, harness: Harness, config: typing.Dict[str, str]
+    monkeypatch: pytest.MonkeyPatch,
+    harness: Harness,
+    config: typing.Dict[str, str],
+    agent_jar_metadata: server.AgentJarMetadata,
 ):
     """
     arrange: given a charm with monkeypatched server functions that returns passing values.
     act: when _on_upgrade_charm is called.
     assert: unit falls into ActiveStatus.
     """
-    monkeypatch.setattr(server, "download_jenkins_agent", lambda *_args, **_kwargs: None)
+    monkeypatch.setattr(
+        server, "download_jenkins_agent", lambda *_args, **_kwargs: agent_jar_metadata
+    )
     monkeypatch.setattr(server, "validate_credentials", lambda *_args, **_kwargs: True)
+    monkeypatch.setattr(server, "get_credentials_validation_timeout", lambda **_kwargs: 5)
+    monkeypatch.setattr(server, "precheck_credentials", lambda *_args, **_kwargs: True)
     harness.set_can_connect("jenkins-agent-k8s", True)
     harness.update_config(config)
     harness.begin()
@@ -210,6 +425,74 @@ def test__on_upgrade_charm(
     assert jenkins_charm.unit.status.name == ACTIVE_STATUS_NAME
 
 
+@pytest.mark.parametrize(
+    "unpacking, pushed, expected_started",
+    [
+        pytest.param(False, True, True, id="changed"),
+        pytest.param(False, False, False, id="unchanged"),
+        pytest.param(True, True, False, id="unpacking"),
+    ],
+)
+def test__install_cache_bundle(
+    monkeypatch: pytest.MonkeyPatch,
+    harness: Harness,
+    unpacking: bool,
+    pushed: bool,
+    expected_started: bool,
+):
+    """
+    arrange: given an attached cache bundle, with or without changed entries, being unpacked \
+        or not.
+    act: when _install_cache_bundle is called.
+    assert: the changed entries are unpacked unless an unpacking is running.
+    """
+    harness.add_resource(cache_bundle.CACHE_BUNDLE_RESOURCE_NAME, b"bundle")
+    harness.begin()
+    charm = typing.cast(JenkinsAgentCharm, harness.charm)
+    monkeypatch.setattr(
+        cache_bundle,
+        "push_delta",
+        (mock_push_delta := MagicMock(spec=cache_bundle.push_delta, return_value=pushed)),
+    )
+    monkeypatch.setattr(
+        charm.pebble_service,
+        "is_cache_bundle_unpacking",
+        MagicMock(return_value=unpacking),
+    )
+    monkeypatch.setattr(
+        charm.pebble_service,
+        "start_cache_bundle_unpack",
+        (mock_start := MagicMock()),
+    )
+    container = harness.model.unit.get_container("jenkins-agent-k8s")
+
+    charm._install_cache_bundle(container)
+
+    assert mock_push_delta.called != unpacking
+    assert mock_start.called == expected_started
+
+
+def test__on_upgrade_charm_container_not_ready(harness: Harness, monkeypatch: pytest.MonkeyPatch):
+    """
+    arrange: given a charm container that is not yet connectable.
+    act: when _on_upgrade_charm is called.
+    assert: the event is deferred and the cache bundle is not installed.
+    """
+    harness.begin()
+    charm = typing.cast(JenkinsAgentCharm, harness.charm)
+    monkeypatch.setattr(
+        cache_bundle,
+        "fetch_resource",
+        (mock_fetch := MagicMock(spec=cache_bundle.fetch_resource)),
+    )
+    mock_event = MagicMock(spec=ops.UpgradeCharmEvent)
+
+    charm._on_upgrade_charm(mock_event)
+
+    mock_event.defer.assert_called_once()
+    mock_fetch.assert_not_called()
+
+
 def test__on_jenkins_agent_k8s_pebble_ready_container_not_ready(
     harness: Harness, monkeypatch: pytest.MonkeyPatch
 ):
@@ -255,7 +538,11 @@ def test__on_jenkins_agent_k8s_pebble_ready_agent_download_error(
         charm._on_jenkins_agent_k8s_pebble_ready(MagicMock(spec=ops.PebbleReadyEvent))
 
 
-def test__on_jenkins_agent_k8s_pebble_ready(harness: Harness, monkeypatch: pytest.MonkeyPatch):
+def test__on_jenkins_agent_k8s_pebble_ready(
+    harness: Harness,
+    monkeypatch: pytest.MonkeyPatch,
+    agent_jar_metadata: server.AgentJarMetadata,
+):
     """
     arrange: given a mocked server functions.
     act: when _on_jenkins_agent_k8s_pebble_ready is called.
@@ -270,9 +557,100 @@ def test__on_jenkins_agent_k8s_pebble_ready(harness: Harness, monkeypatch: pytes
     monkeypatch.setattr(
         server,
         "download_jenkins_agent",
-        MagicMock(spec=server.download_jenkins_agent),
+        MagicMock(spec=server.download_jenkins_agent, return_value=agent_jar_metadata),
     )
 
     charm._on_jenkins_agent_k8s_pebble_ready(MagicMock(spec=ops.PebbleReadyEvent))
 
     assert charm.unit.status.name == ACTIVE_STATUS_NAME
+    assert charm.agent_jar_manager.metadata == agent_jar_metadata
+
+
+def test__on_jenkins_agent_k8s_pebble_ready_no_storage(harness: Harness):
+    """
+    arrange: given a unit without the jenkins-home storage attached.
+    act: when _on_jenkins_agent_k8s_pebble_ready is called.
+    assert: the Jenkins home directory is prepared on the container filesystem.
+    """
+    harness.set_can_connect(state.State.jenkins_agent_service_name, True)
+    harness.begin()
+    charm = typing.cast(JenkinsAgentCharm, harness.charm)
+    container = charm.unit.get_container(state.State.jenkins_agent_service_name)
+
+    charm._on_jenkins_agent_k8s_pebble_ready(MagicMock(spec=ops.PebbleReadyEvent))
+
+    assert not charm.model.storages["jenkins-home"]
+    assert container.isdir(server.JENKINS_WORKDIR)
+    assert pebble.WORKSPACE_GC_SERVICE in container.get_plan().services
+
+
+@pytest.mark.parametrize(
+    "notice_key, server_source, can_connect, update_result, expected_restarted",
+    [
+        pytest.param("other.com/notice", "config", True, True, False, id="other notice"),
+        pytest.param(server.AGENT_JAR_UPDATE_NOTICE, None, True, True, False, id="no server"),
+        pytest.param(
+            server.AGENT_JAR_UPDATE_NOTICE, "config", False, True, False, id="container not ready"
+        ),
+        pytest.param(
+            server.AGENT_JAR_UPDATE_NOTICE,
+            "config",
+            True,
+            server.AgentJarDownloadError(),
+            False,
+            id="download error",
+        ),
+        pytest.param(
+            server.AGENT_JAR_UPDATE_NOTICE, "config", True, False, False, id="not updated"
+        ),
+        pytest.param(server.AGENT_JAR_UPDATE_NOTICE, "config", True, True, True, id="updated"),
+        pytest.param(
+            server.AGENT_JAR_UPDATE_NOTICE, "relation", True, True, True, id="updated relation"
+        ),
+    ],
+)
+def test__on_jenkins_agent_k8s_pebble_custom_notice(  # pylint: disable=too-many-arguments
+    monkeypatch: pytest.MonkeyPatch,
+    harness: Harness,
+    config: typing.Dict[str, str],
+    notice_key: str,
+    server_source: typing.Optional[str],
+    can_connect: bool,
+    update_result: typing.Union[bool, Exception],
+    expected_restarted: bool,
+):
+    """
+    arrange: given a charm with a Jenkins server from config or relation and a monkeypatched \
+        agent JAR update.
+    act: when _on_jenkins_agent_k8s_pebble_custom_notice is called.
+    assert: the agent JAR is updated on agent JAR update notices and the agent is restarted if \
+        a different agent JAR was activated.
+    """
+    harness.set_can_connect(state.State.jenkins_agent_service_name, can_connect)
+    if server_source == "config":
+        harness.update_config(config)
+    harness.begin()
+    charm = typing.cast(JenkinsAgentCharm, harness.charm)
+    if server_source == "relation":
+        charm.state.agent_relation_credentials = server.Credentials(
+            address="http://test-url", secret=secrets.token_hex(16)
+        )
+    mock_update = MagicMock(spec=charm.agent_jar_manager.update)
+    if isinstance(update_result, Exception):
+        mock_update.side_effect = update_result
+    else:
+        mock_update.return_value = update_result
+    monkeypatch.setattr(charm.agent_jar_manager, "update", mock_update)
+    mock_restart = MagicMock(spec=charm.pebble_service.restart_agent)
+    monkeypatch.setattr(charm.pebble_service, "restart_agent", mock_restart)
+    mock_event = MagicMock(spec=ops.PebbleCustomNoticeEvent)
+    mock_event.notice = MagicMock(
+        spec=ops.pebble.Notice, key=notice_key, last_data={"version": "2.401"}
+    )
+    mock_event.workload = charm.unit.get_container(state.State.jenkins_agent_service_name)
+
+    charm._on_jenkins_agent_k8s_pebble_custom_notice(mock_event)
+
+    assert mock_restart.called == expected_restarted
+    if expected_restarted:
+        assert mock_update.call_args.kwargs["version"] == "2.401"
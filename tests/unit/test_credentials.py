@@ -0,0 +1,231 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Jenkins-agent-k8s credentials validation module tests."""
+
+import typing
+import unittest.mock
+
+import ops
+import ops.testing
+import pytest
+import requests
+
+import credentials
+import server
+from charm import JenkinsAgentCharm
+
+PAIRS = [("agent-1", "token-1"), ("agent-2", "token-2"), ("agent-3", "token-3")]
+
+
+def _get_mock_container(
+    valid_tokens: typing.Set[str], connection_log: str, error_log: str
+) -> unittest.mock.MagicMock:
+    """Create a mock container validating the given agent tokens.
+
+    Args:
+        valid_tokens: The agent tokens the agent connects with.
+        connection_log: The agent logs on successful connection.
+        error_log: The agent logs on failed connection.
+
+    Returns:
+        The mock container.
+    """
+
+    def exec_agent(command: typing.List[str], **_kwargs: typing.Any) -> unittest.mock.MagicMock:
+        """Start a validation process.
+
+        Args:
+            command: The agent command.
+
+        Returns:
+            The mock process.
+        """
+        mock_process = unittest.mock.MagicMock(spec=ops.pebble.ExecProcess)
+        log = connection_log if command[-1] in valid_tokens else error_log
+        mock_process.stdout = log.split("\n")
+        return mock_process
+
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+    mock_container.exec.side_effect = exec_agent
+    return mock_container
+
+
+def _get_validated_tokens(mock_container: unittest.mock.MagicMock) -> typing.List[str]:
+    """Get the agent tokens validated in the mock container, in order.
+
+    Args:
+        mock_container: The mock container.
+
+    Returns:
+        The validated agent tokens.
+    """
+    return [call.args[0][-1] for call in mock_container.exec.call_args_list]
+
+
+def test_find_valid_credentials_connected(
+    harness: ops.testing.Harness, jenkins_connection_log: str, jenkins_error_log: str
+):
+    """
+    arrange: given a validator that has found a valid pair.
+    act: when find_valid_credentials is called again while the agent is connected with it.
+    assert: the last known good pair is returned without validation.
+    """
+    harness.begin()
+    validator = typing.cast(JenkinsAgentCharm, harness.charm).credentials_validator
+    mock_container = _get_mock_container({"token-2"}, jenkins_connection_log, jenkins_error_log)
+    assert validator.find_valid_credentials(
+        PAIRS, "http://test-url", mock_container, connected=False
+    ) == ("agent-2", "token-2")
+    mock_container.exec.reset_mock()
+
+    found = validator.find_valid_credentials(
+        PAIRS, "http://test-url", mock_container, connected=True, running_pair=PAIRS[1]
+    )
+
+    assert found == ("agent-2", "token-2")
+    mock_container.exec.assert_not_called()
+
+
+def test_find_valid_credentials_disconnected(
+    harness: ops.testing.Harness, jenkins_connection_log: str, jenkins_error_log: str
+):
+    """
+    arrange: given a validator that has found valid and invalid pairs.
+    act: when find_valid_credentials is called while the agent is disconnected.
+    assert: the last known good pair is validated first and the known invalid pairs last.
+    """
+    harness.begin()
+    validator = typing.cast(JenkinsAgentCharm, harness.charm).credentials_validator
+    mock_container = _get_mock_container({"token-3"}, jenkins_connection_log, jenkins_error_log)
+    validator.find_valid_credentials(PAIRS[1:], "http://test-url", mock_container, connected=False)
+    mock_container.exec.reset_mock()
+    mock_container.exec.side_effect = _get_mock_container(
+        set(), jenkins_connection_log, jenkins_error_log
+    ).exec.side_effect
+
+    found = validator.find_valid_credentials(
+        PAIRS, "http://test-url", mock_container, connected=False
+    )
+
+    assert found is None
+    assert _get_validated_tokens(mock_container) == ["token-3", "token-1", "token-2"]
+
+
+def test_find_valid_credentials_connected_expired(
+    monkeypatch: pytest.MonkeyPatch,
+    harness: ops.testing.Harness,
+    jenkins_connection_log: str,
+    jenkins_error_log: str,
+):
+    """
+    arrange: given a validator that has found a valid pair longer ago than the cache TTL.
+    act: when find_valid_credentials is called twice while the agent is connected with it, the \
+        second time after the cache TTL again.
+    assert: the last known good pair is returned without validation both times.
+    """
+    harness.begin()
+    validator = typing.cast(JenkinsAgentCharm, harness.charm).credentials_validator
+    mock_container = _get_mock_container({"token-2"}, jenkins_connection_log, jenkins_error_log)
+    validator.find_valid_credentials(PAIRS, "http://test-url", mock_container, connected=False)
+    mock_container.exec.reset_mock()
+    now = credentials.time.time()
+    monkeypatch.setattr(
+        credentials.time, "time", lambda: now + credentials.VALIDATION_CACHE_TTL + 1
+    )
+
+    found = validator.find_valid_credentials(
+        PAIRS, "http://test-url", mock_container, connected=True, running_pair=PAIRS[1]
+    )
+    monkeypatch.setattr(
+        credentials.time, "time", lambda: now + 2 * credentials.VALIDATION_CACHE_TTL
+    )
+    found_again = validator.find_valid_credentials(
+        PAIRS, "http://test-url", mock_container, connected=True, running_pair=PAIRS[1]
+    )
+
+    assert found == found_again == ("agent-2", "token-2")
+    mock_container.exec.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "running_pair",
+    [
+        pytest.param(None, id="no running service"),
+        pytest.param(("agent-2", "token-4"), id="unknown running pair"),
+    ],
+)
+def test_find_valid_credentials_running_pair_mismatch(
+    harness: ops.testing.Harness,
+    jenkins_connection_log: str,
+    jenkins_error_log: str,
+    running_pair: typing.Optional[typing.Tuple[str, str]],
+):
+    """
+    arrange: given a validator that has found a valid pair.
+    act: when find_valid_credentials is called while the agent is connected, the running agent \
+        service not using one of the given pairs.
+    assert: the pairs are validated again, the last known good pair first.
+    """
+    harness.begin()
+    validator = typing.cast(JenkinsAgentCharm, harness.charm).credentials_validator
+    mock_container = _get_mock_container({"token-2"}, jenkins_connection_log, jenkins_error_log)
+    validator.find_valid_credentials(PAIRS, "http://test-url", mock_container, connected=False)
+    mock_container.exec.reset_mock()
+
+    found = validator.find_valid_credentials(
+        PAIRS, "http://test-url", mock_container, connected=True, running_pair=running_pair
+    )
+
+    assert found == ("agent-2", "token-2")
+    assert _get_validated_tokens(mock_container) == ["token-2"]
+
+
+def test_find_valid_credentials_connected_unknown(
+    harness: ops.testing.Harness, jenkins_connection_log: str, jenkins_error_log: str
+):
+    """
+    arrange: given a validator without last known good pair, e.g. after a registration change.
+    act: when find_valid_credentials is called while the agent is connected with one of the \
+        given pairs, then while it is disconnected.
+    assert: the running pair is returned without validation, then validated first.
+    """
+    harness.begin()
+    validator = typing.cast(JenkinsAgentCharm, harness.charm).credentials_validator
+    mock_container = _get_mock_container(set(), jenkins_connection_log, jenkins_error_log)
+
+    found = validator.find_valid_credentials(
+        PAIRS, "http://test-url", mock_container, connected=True, running_pair=PAIRS[2]
+    )
+    mock_container.exec.assert_not_called()
+    validator.find_valid_credentials(PAIRS, "http://test-url", mock_container, connected=False)
+
+    assert found == ("agent-3", "token-3")
+    assert _get_validated_tokens(mock_container) == ["token-3", "token-1", "token-2"]
+
+
+def test_find_valid_credentials_session(
+    monkeypatch: pytest.MonkeyPatch, harness: ops.testing.Harness, http_session: requests.Session
+):
+    """
+    arrange: given a monkeypatched find_valid_credentials and credentials validation timeout.
+    act: when find_valid_credentials is called with an HTTP session.
+    assert: the pairs are validated with the timeout adapted to the server round trip time.
+    """
+    monkeypatch.setattr(server, "get_credentials_validation_timeout", lambda **_kwargs: 42)
+    monkeypatch.setattr(
+        server,
+        "find_valid_credentials",
+        mock_find := unittest.mock.MagicMock(
+            spec=server.find_valid_credentials, return_value=None
+        ),
+    )
+    harness.begin()
+    validator = typing.cast(JenkinsAgentCharm, harness.charm).credentials_validator
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+
+    assert not validator.find_valid_credentials(
+        PAIRS, "http://test-url", mock_container, connected=False, session=http_session
+    )
+    assert mock_find.call_args.kwargs["timeout"] == 42
+    assert mock_find.call_args.kwargs["session"] == http_session
@@ -0,0 +1,298 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Jenkins-agent-k8s agent JAR executable store tests."""
+
+import io
+import pathlib
+import typing
+import unittest.mock
+
+import ops
+import pytest
+
+import jar_store
+
+STORE_PATH = pathlib.Path("/var/lib/jenkins/agent-jars")
+LINK_PATH = pathlib.Path("/var/lib/jenkins/agent.jar")
+
+
+def test_activate_evicts_least_recently_used(
+    monkeypatch: pytest.MonkeyPatch,
+    get_mock_store_container: typing.Callable[..., unittest.mock.MagicMock],
+):
+    """
+    arrange: given a full store with an active and two inactive agent.jar entries.
+    act: when a new agent.jar entry is added and activated.
+    assert: the least recently used inactive entries and their archives are evicted until the \
+        store fits.
+    """
+    monkeypatch.setattr(jar_store, "STORE_MAX_SIZE", 30)
+    index = jar_store.StoreIndex(
+        active="active",
+        entries={
+            "oldest": jar_store.StoreEntry(sha256="oldest", size=10, last_used=1),
+            "older": jar_store.StoreEntry(sha256="older", size=10, last_used=2),
+            "active": jar_store.StoreEntry(sha256="active", size=10, last_used=0),
+        },
+    )
+    mock_container = get_mock_store_container(index)
+    store = jar_store.AgentJarStore(
+        container=mock_container, store_path=STORE_PATH, link_path=LINK_PATH, user="user"
+    )
+
+    store.add(jar_store.StoreEntry(sha256="new", size=15), io.BytesIO(b"new"))
+    store.activate("new")
+
+    assert store.active == store.index.entries["new"]
+    assert set(store.index.entries) == {"active", "new"}
+    assert [call.args[0] for call in mock_container.remove_path.call_args_list] == [
+        str(STORE_PATH / "oldest.jar"),
+        str(STORE_PATH / "oldest.jsa"),
+        str(STORE_PATH / "older.jar"),
+        str(STORE_PATH / "older.jsa"),
+    ]
+    mock_container.exec.assert_any_call(
+        ["mv", "-Tf", str(LINK_PATH.with_name(".agent.jar.tmp")), str(LINK_PATH)], user="user"
+    )
+
+
+def test_activate_evicts_archive_size(
+    monkeypatch: pytest.MonkeyPatch,
+    get_mock_store_container: typing.Callable[..., unittest.mock.MagicMock],
+):
+    """
+    arrange: given a store whose agent.jar entries fit the store but not with their archives.
+    act: when an inactive entry is activated.
+    assert: the least recently used inactive entry is evicted with its archive.
+    """
+    monkeypatch.setattr(jar_store, "STORE_MAX_SIZE", 30)
+    index = jar_store.StoreIndex(
+        active="active",
+        entries={
+            "older": jar_store.StoreEntry(sha256="older", size=10, archive_size=10, last_used=1),
+            "new": jar_store.StoreEntry(sha256="new", size=10, archive_size=10, last_used=2),
+            "active": jar_store.StoreEntry(sha256="active", size=5, last_used=0),
+        },
+    )
+    mock_container = get_mock_store_container(index)
+    store = jar_store.AgentJarStore(
+        container=mock_container, store_path=STORE_PATH, link_path=LINK_PATH, user="user"
+    )
+
+    store.activate("new")
+
+    assert set(store.index.entries) == {"active", "new"}
+    assert [call.args[0] for call in mock_container.remove_path.call_args_list] == [
+        str(STORE_PATH / "older.jar"),
+        str(STORE_PATH / "older.jsa"),
+    ]
+
+
+def test_activate_keeps_active(
+    monkeypatch: pytest.MonkeyPatch,
+    get_mock_store_container: typing.Callable[..., unittest.mock.MagicMock],
+):
+    """
+    arrange: given a store with an inactive agent.jar entry larger than the store size limit.
+    act: when the entry is activated.
+    assert: the other entries are evicted and the active entry is kept.
+    """
+    monkeypatch.setattr(jar_store, "STORE_MAX_SIZE", 10)
+    index = jar_store.StoreIndex(
+        active="previous",
+        entries={
+            "previous": jar_store.StoreEntry(sha256="previous", size=10),
+            "large": jar_store.StoreEntry(sha256="large", size=20),
+        },
+    )
+    mock_container = get_mock_store_container(index)
+    store = jar_store.AgentJarStore(
+        container=mock_container, store_path=STORE_PATH, link_path=LINK_PATH, user="user"
+    )
+
+    store.activate("large")
+
+    assert list(store.index.entries) == ["large"]
+    assert store.index.active == "large"
+
+
+def test_activate_active(
+    get_mock_store_container: typing.Callable[..., unittest.mock.MagicMock],
+):
+    """
+    arrange: given a store with an active agent.jar entry.
+    act: when the active entry is activated again.
+    assert: nothing is changed in the container.
+    """
+    index = jar_store.StoreIndex(
+        active="active", entries={"active": jar_store.StoreEntry(sha256="active")}
+    )
+    mock_container = get_mock_store_container(index)
+    store = jar_store.AgentJarStore(
+        container=mock_container, store_path=STORE_PATH, link_path=LINK_PATH, user="user"
+    )
+
+    store.activate("active")
+
+    mock_container.exec.assert_not_called()
+    mock_container.push.assert_not_called()
+
+
+def test_find_by_version(
+    get_mock_store_container: typing.Callable[..., unittest.mock.MagicMock],
+):
+    """
+    arrange: given a store with agent.jar entries served by different server versions.
+    act: when find_by_version is called.
+    assert: the entry served by the version is returned, None for an unknown version.
+    """
+    index = jar_store.StoreIndex(
+        entries={
+            "first": jar_store.StoreEntry(sha256="first", versions=["2.400"]),
+            "second": jar_store.StoreEntry(sha256="second", versions=["2.401", "2.402"]),
+        },
+    )
+    store = jar_store.AgentJarStore(
+        container=get_mock_store_container(index),
+        store_path=STORE_PATH,
+        link_path=LINK_PATH,
+        user="user",
+    )
+
+    assert store.find_by_version("2.402") == index.entries["second"]
+    assert store.find_by_version("2.403") is None
+
+
+def test_copy_stored(
+    get_mock_store_container: typing.Callable[..., unittest.mock.MagicMock],
+):
+    """
+    arrange: given a store with an agent.jar entry.
+    act: when the same agent.jar is copied from the workload container.
+    assert: the agent.jar is not copied again.
+    """
+    index = jar_store.StoreIndex(entries={"stored": jar_store.StoreEntry(sha256="stored")})
+    mock_container = get_mock_store_container(index)
+    store = jar_store.AgentJarStore(
+        container=mock_container, store_path=STORE_PATH, link_path=LINK_PATH, user="user"
+    )
+
+    store.copy(jar_store.StoreEntry(sha256="stored"), pathlib.Path("/usr/share/agent.jar"))
+
+    mock_container.exec.assert_not_called()
+    mock_container.push.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "wait_error, archive_created",
+    [
+        pytest.param(
+            ops.pebble.ExecError(["java"], 1, None, None), True, id="agent fails to connect"
+        ),
+        pytest.param(
+            ops.pebble.ChangeError("timed out", unittest.mock.MagicMock()),
+            False,
+            id="agent times out",
+        ),
+    ],
+)
+def test_activate_creates_archive(
+    get_mock_store_container: typing.Callable[..., unittest.mock.MagicMock],
+    wait_error: Exception,
+    archive_created: bool,
+):
+    """
+    arrange: given a store with an agent.jar entry without class data sharing archive.
+    act: when the entry is activated.
+    assert: the archive is recorded by a run of the active agent.jar and linked if created, \
+        the archive link is removed otherwise.
+    """
+    index = jar_store.StoreIndex(entries={"new": jar_store.StoreEntry(sha256="new")})
+    mock_container = get_mock_store_container(index)
+    archive_path = str(STORE_PATH / "new.jsa")
+    archive_exists = iter([False, archive_created])
+    mock_container.exists.side_effect = lambda path: (
+        next(archive_exists) if path == archive_path else True
+    )
+    mock_container.exec.return_value.wait_output.side_effect = wait_error
+    store = jar_store.AgentJarStore(
+        container=mock_container, store_path=STORE_PATH, link_path=LINK_PATH, user="user"
+    )
+
+    store.activate("new")
+
+    mock_container.exec.assert_any_call(
+        [
+            "java",
+            f"-XX:ArchiveClassesAtExit={archive_path}",
+            "-jar",
+            str(LINK_PATH),
+            *jar_store.ARCHIVE_TRAINING_ARGS,
+        ],
+        timeout=jar_store.ARCHIVE_TRAINING_TIMEOUT,
+        user="user",
+    )
+    archive_link_path = str(LINK_PATH.with_suffix(".jsa"))
+    archive_linked = unittest.mock.call(
+        ["mv", "-Tf", str(LINK_PATH.with_name(".agent.jsa.tmp")), archive_link_path],
+        user="user",
+    )
+    assert (archive_linked in mock_container.exec.call_args_list) == archive_created
+    assert (
+        unittest.mock.call(archive_link_path, recursive=True)
+        in mock_container.remove_path.call_args_list
+    ) != archive_created
+    assert store.index.entries["new"].archive_size == (5 if archive_created else 0)
+    assert store.index.entries["new"].archive_failed != archive_created
+
+
+def test_activate_failed_archive(
+    get_mock_store_container: typing.Callable[..., unittest.mock.MagicMock],
+):
+    """
+    arrange: given a store with an agent.jar entry whose class data sharing archive failed to \
+        be created.
+    act: when the entry is activated.
+    assert: the archive is not recorded again and the archive link is removed.
+    """
+    index = jar_store.StoreIndex(
+        entries={"failed": jar_store.StoreEntry(sha256="failed", archive_failed=True)}
+    )
+    mock_container = get_mock_store_container(index)
+    mock_container.exists.side_effect = lambda path: path != str(STORE_PATH / "failed.jsa")
+    store = jar_store.AgentJarStore(
+        container=mock_container, store_path=STORE_PATH, link_path=LINK_PATH, user="user"
+    )
+
+    store.activate("failed")
+
+    executed = [call.args[0][0] for call in mock_container.exec.call_args_list]
+    assert "java" not in executed
+    mock_container.remove_path.assert_called_once_with(
+        str(LINK_PATH.with_suffix(".jsa")), recursive=True
+    )
+
+
+def test_activate_links_stored_archive(
+    get_mock_store_container: typing.Callable[..., unittest.mock.MagicMock],
+):
+    """
+    arrange: given a store with an agent.jar entry and its class data sharing archive.
+    act: when the entry is activated.
+    assert: the stored archive is linked without recording it again.
+    """
+    index = jar_store.StoreIndex(entries={"stored": jar_store.StoreEntry(sha256="stored")})
+    mock_container = get_mock_store_container(index)
+    store = jar_store.AgentJarStore(
+        container=mock_container, store_path=STORE_PATH, link_path=LINK_PATH, user="user"
+    )
+
+    store.activate("stored")
+
+    executed = [call.args[0][0] for call in mock_container.exec.call_args_list]
+    assert executed == ["ln", "mv", "ln", "mv"]
+    mock_container.exec.assert_any_call(
+        ["ln", "-sfn", "agent-jars/stored.jsa", str(LINK_PATH.with_name(".agent.jsa.tmp"))],
+        user="user",
+    )
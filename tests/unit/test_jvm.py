@@ -0,0 +1,180 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Jenkins-agent-k8s JVM options module tests."""
+
+import io
+import typing
+import unittest.mock
+
+import ops
+import pytest
+
+import jvm
+
+GIB = 1024 * 1024 * 1024
+
+
+def _get_mock_cgroup_container(files: typing.Dict[str, str]) -> unittest.mock.MagicMock:
+    """Get a mock workload container with cgroup files.
+
+    Args:
+        files: The cgroup file contents by path relative to the cgroup directory.
+
+    Returns:
+        The mock workload container.
+    """
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+
+    def pull(path: typing.Any, **_kwargs: typing.Any) -> io.StringIO:
+        """Read a cgroup file.
+
+        Args:
+            path: The cgroup file path.
+
+        Returns:
+            The cgroup file content.
+
+        Raises:
+            PathError: if the cgroup file does not exist.
+        """
+        relative_path = str(path.relative_to(jvm.CGROUP_PATH))
+        if relative_path not in files:
+            raise ops.pebble.PathError("not-found", "not found")
+        return io.StringIO(f"{files[relative_path]}\n")
+
+    mock_container.pull.side_effect = pull
+    return mock_container
+
+
+@pytest.mark.parametrize(
+    "files, expected_limits",
+    [
+        pytest.param(
+            {"memory.max": str(2 * GIB), "cpu.max": "150000 100000"},
+            jvm.ResourceLimits(memory=2 * GIB, cpus=2),
+            id="cgroup v2 limited",
+        ),
+        pytest.param(
+            {"memory.max": "max", "cpu.max": "max 100000"},
+            jvm.ResourceLimits(),
+            id="cgroup v2 unlimited",
+        ),
+        pytest.param(
+            {"memory.max": str(GIB)}, jvm.ResourceLimits(memory=GIB), id="cgroup v2 memory only"
+        ),
+        pytest.param(
+            {
+                "memory/memory.limit_in_bytes": str(GIB),
+                "cpu/cpu.cfs_quota_us": "50000",
+                "cpu/cpu.cfs_period_us": "100000",
+            },
+            jvm.ResourceLimits(memory=GIB, cpus=1),
+            id="cgroup v1 limited",
+        ),
+        pytest.param(
+            {
+                "memory/memory.limit_in_bytes": "9223372036854771712",
+                "cpu/cpu.cfs_quota_us": "-1",
+                "cpu/cpu.cfs_period_us": "100000",
+            },
+            jvm.ResourceLimits(),
+            id="cgroup v1 unlimited",
+        ),
+        pytest.param({}, jvm.ResourceLimits(), id="no cgroup"),
+        pytest.param({"memory.max": "invalid"}, jvm.ResourceLimits(), id="invalid cgroup"),
+    ],
+)
+def test_get_resource_limits(files: typing.Dict[str, str], expected_limits: jvm.ResourceLimits):
+    """
+    arrange: given a workload container with cgroup v2, v1 or no cgroup files.
+    act: when get_resource_limits is called.
+    assert: the memory limit and CPU count of the quota are returned, None if unlimited.
+    """
+    mock_container = _get_mock_cgroup_container(files)
+
+    assert jvm.get_resource_limits(mock_container) == expected_limits
+
+
+@pytest.mark.parametrize(
+    "limits, jvm_options, expected_options",
+    [
+        pytest.param(
+            jvm.ResourceLimits(),
+            "",
+            ["-XX:MaxRAMPercentage=25.0", "-XX:+UseG1GC"],
+            id="unlimited",
+        ),
+        pytest.param(
+            jvm.ResourceLimits(memory=4 * GIB, cpus=2),
+            "",
+            ["-XX:MaxRAMPercentage=25.0", "-XX:ActiveProcessorCount=2", "-XX:+UseG1GC"],
+            id="large container",
+        ),
+        pytest.param(
+            jvm.ResourceLimits(memory=512 * 1024 * 1024, cpus=1),
+            "",
+            ["-XX:MaxRAMPercentage=50.0", "-XX:ActiveProcessorCount=1"],
+            id="small container",
+        ),
+        pytest.param(
+            jvm.ResourceLimits(memory=128 * 1024 * 1024),
+            "",
+            ["-XX:MaxRAMPercentage=75.0"],
+            id="tiny container",
+        ),
+        pytest.param(
+            jvm.ResourceLimits(memory=4 * GIB),
+            " -XX:MaxRAMPercentage=50 -XX:+UseZGC ",
+            ["-XX:MaxRAMPercentage=25.0", "-XX:MaxRAMPercentage=50 -XX:+UseZGC"],
+            id="configured options",
+        ),
+    ],
+)
+def test_get_java_options(
+    limits: jvm.ResourceLimits, jvm_options: str, expected_options: typing.List[str]
+):
+    """
+    arrange: given the workload container limits and configured JVM options.
+    act: when get_java_options is called.
+    assert: the heap percentage and processor count follow the limits and the configured \
+        options come last.
+    """
+    options = jvm.get_java_options(limits, jvm_options)
+
+    positions = [options.index(option) for option in expected_options]
+    assert positions == sorted(positions)
+    assert f"-XX:G1PeriodicGCInterval={jvm.PERIODIC_GC_INTERVAL}" in options
+    assert options.endswith(jvm_options.strip())
+
+
+@pytest.mark.parametrize(
+    "limits, agent_count, expected_option",
+    [
+        pytest.param(jvm.ResourceLimits(), 2, "-XX:MaxRAMPercentage=12.5", id="unlimited"),
+        pytest.param(
+            jvm.ResourceLimits(memory=4 * GIB), 4, "-XX:MaxRAMPercentage=6.2", id="large container"
+        ),
+        pytest.param(
+            jvm.ResourceLimits(memory=GIB), 3, "-XX:MaxRAMPercentage=25.0", id="small container"
+        ),
+        pytest.param(
+            jvm.ResourceLimits(memory=512 * 1024 * 1024),
+            3,
+            "-XX:MaxRAMPercentage=25.0",
+            id="tiny container",
+        ),
+    ],
+)
+def test_get_java_options_agent_count(
+    limits: jvm.ResourceLimits, agent_count: int, expected_option: str
+):
+    """
+    arrange: given the workload container limits and a number of agents sharing the container.
+    act: when get_java_options is called.
+    assert: the agents share the heap percentage, each heap reaching the minimum heap size up \
+        to the maximum heap percentage.
+    """
+    options = jvm.get_java_options(limits, agent_count=agent_count)
+
+    assert options.split()[0] == expected_option
@@ -0,0 +1,149 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Jenkins-agent-k8s metrics module tests."""
+
+import json
+import typing
+import unittest.mock
+
+import ops
+import pytest
+from ops.testing import Harness
+
+import metrics
+import server
+from charm import JenkinsAgentCharm
+
+
+@pytest.fixture(autouse=True, name="observations")
+def observations_fixture() -> typing.Iterator[None]:
+    """Clear the durations observed by the other tests."""
+    metrics.pop_observations()
+    yield
+    metrics.pop_observations()
+
+
+def test_timed():
+    """
+    arrange: given a timed function raising an error.
+    act: when the function is called.
+    assert: the duration of the call is observed once.
+    """
+
+    @metrics.timed("agent_reconcile_seconds")
+    def reconcile() -> None:
+        """Fail to reconcile.
+
+        Raises:
+            RuntimeError: always.
+        """
+        raise RuntimeError
+
+    with pytest.raises(RuntimeError):
+        reconcile()
+
+    observations = metrics.pop_observations()
+    assert list(observations) == ["agent_reconcile_seconds"]
+    assert len(observations["agent_reconcile_seconds"]) == 1
+    assert not metrics.pop_observations()
+
+
+def test_render():
+    """
+    arrange: given a charm timing histogram.
+    act: when render is called.
+    assert: the histogram is rendered in the Prometheus text format.
+    """
+    buckets = list(range(len(metrics.HISTOGRAM_BUCKETS)))
+
+    rendered = metrics.render(
+        {"agent_jar_download_seconds": {"buckets": buckets, "sum": 1.5, "count": 20}}
+    )
+
+    lines = rendered.splitlines()
+    assert lines[0].startswith("# HELP jenkins_agent_charm_agent_jar_download_seconds ")
+    assert lines[1] == "# TYPE jenkins_agent_charm_agent_jar_download_seconds histogram"
+    assert 'jenkins_agent_charm_agent_jar_download_seconds_bucket{le="0.05"} 0' in lines
+    assert 'jenkins_agent_charm_agent_jar_download_seconds_bucket{le="+Inf"} 20' in lines
+    assert lines[-2:] == [
+        "jenkins_agent_charm_agent_jar_download_seconds_sum 1.5",
+        "jenkins_agent_charm_agent_jar_download_seconds_count 20",
+    ]
+
+
+def test_metrics_recorder(harness: Harness):
+    """
+    arrange: given durations observed while the workload container is not reachable.
+    act: when the charm state is committed, then committed again once the container is reachable.
+    assert: the histograms are kept in the charm state and written to the container once \
+        reachable.
+    """
+    harness.begin()
+    charm = typing.cast(JenkinsAgentCharm, harness.charm)
+    metrics.observe("credentials_validation_seconds", 0.2)
+    metrics.observe("credentials_validation_seconds", 3)
+
+    harness.framework.on.pre_commit.emit()
+    harness.set_can_connect("jenkins-agent-k8s", True)
+    harness.framework.on.pre_commit.emit()
+
+    container = charm.unit.get_container("jenkins-agent-k8s")
+    lines = container.pull(server.CHARM_METRICS_PATH).read().splitlines()
+    assert 'jenkins_agent_charm_credentials_validation_seconds_bucket{le="0.25"} 1' in lines
+    assert 'jenkins_agent_charm_credentials_validation_seconds_bucket{le="5.0"} 2' in lines
+    assert "jenkins_agent_charm_credentials_validation_seconds_sum 3.2" in lines
+    assert "jenkins_agent_charm_credentials_validation_seconds_count 2" in lines
+
+
+def test_metrics_recorder_push_error(harness: Harness, monkeypatch: pytest.MonkeyPatch):
+    """
+    arrange: given durations observed and a workload container failing to write files.
+    act: when the charm state is committed, then committed again.
+    assert: the histograms are written on the next commit.
+    """
+    harness.set_can_connect("jenkins-agent-k8s", True)
+    harness.begin()
+    charm = typing.cast(JenkinsAgentCharm, harness.charm)
+    container = charm.unit.get_container("jenkins-agent-k8s")
+    metrics.observe("agent_reconcile_seconds", 1)
+    monkeypatch.setattr(
+        ops.Container,
+        "push",
+        unittest.mock.MagicMock(side_effect=ops.pebble.APIError({}, 500, "error", "error")),
+    )
+
+    harness.framework.on.pre_commit.emit()
+    monkeypatch.undo()
+    harness.framework.on.pre_commit.emit()
+
+    assert "jenkins_agent_charm_agent_reconcile_seconds_count 1" in (
+        container.pull(server.CHARM_METRICS_PATH).read().splitlines()
+    )
+
+
+@pytest.mark.parametrize(
+    "leader", [pytest.param(True, id="leader"), pytest.param(False, id="non-leader")]
+)
+def test_metrics_endpoint_provider(harness: Harness, leader: bool):
+    """
+    arrange: given a leader or non-leader unit.
+    act: when the metrics endpoint relation is joined.
+    assert: the unit address is published, and the scrape job by the leader.
+    """
+    harness.set_leader(leader)
+    harness.begin()
+
+    relation_id = harness.add_relation(metrics.METRICS_RELATION, "prometheus")
+    harness.add_relation_unit(relation_id, "prometheus/0")
+
+    unit_data = harness.get_relation_data(relation_id, "jenkins-agent-k8s/0")
+    assert unit_data["prometheus_scrape_unit_name"] == "jenkins-agent-k8s/0"
+    app_data = harness.get_relation_data(relation_id, "jenkins-agent-k8s")
+    if leader:
+        assert json.loads(app_data["scrape_jobs"])[0]["static_configs"] == [
+            {"targets": [f"*:{metrics.METRICS_PORT}"]}
+        ]
+        assert json.loads(app_data["scrape_metadata"])["charm_name"] == "jenkins-agent-k8s"
+    else:
+        assert "scrape_jobs" not in app_data
@@ -6,19 +6,47 @@
 # Need access to protected functions for testing
 # pylint:disable=protected-access
 
+import io
 import secrets
 import typing
 import unittest.mock
 
 import ops
 import ops.testing
+import pytest
 
+import metrics
 import pebble
 import server
 import state
 from charm import JenkinsAgentCharm
 
 
+@pytest.fixture(scope="function", name="busy_checks", autouse=True)
+def busy_checks_fixture(monkeypatch: pytest.MonkeyPatch):
+    """The agent busy check results, in order, and the checked work directories.
+
+    The agent is idle once the results are exhausted.
+    """
+    results: typing.List[bool] = []
+    workdirs: typing.List[typing.Any] = []
+
+    def is_agent_busy(_: ops.Container, workdir: typing.Any = None) -> bool:
+        """Return the next busy check result.
+
+        Args:
+            workdir: The work directory of the checked agent.
+
+        Returns:
+            Whether the agent is busy.
+        """
+        workdirs.append(workdir)
+        return results.pop(0) if results else False
+
+    monkeypatch.setattr(server, "is_agent_busy", is_agent_busy)
+    return results, workdirs
+
+
 def test__get_pebble_layer(harness: ops.testing.Harness):
     """
     arrange: given a server url, and an agent_token pair.
@@ -30,7 +58,7 @@ def test__get_pebble_layer(harness: ops.testing.Harness):
     harness.begin()
     jenkins_charm = typing.cast(JenkinsAgentCharm, harness.charm)
     layer = jenkins_charm.pebble_service._get_pebble_layer(
-        server_url=test_url, agent_token_pair=test_agent_token_pair
+        server_url=test_url, agent_token_pair=test_agent_token_pair, java_options="-Xmx1g"
     )
 
     assert layer.services["jenkins-agent-k8s"] == {
@@ -41,20 +69,54 @@ def test__get_pebble_layer(harness: ops.testing.Harness):
             "JENKINS_URL": test_url,
             "JENKINS_AGENT": test_agent_token_pair[0],
             "JENKINS_TOKEN": test_agent_token_pair[1],
+            "JAVA_OPTS": "-Xmx1g",
+            "HOME": str(server.JENKINS_WORKDIR),
         },
         "startup": "enabled",
         "user": server.USER,
+        "on-check-failure": {"connection": "restart"},
     }
+    assert layer.services[pebble.AGENT_JAR_UPDATER_SERVICE].environment == {
+        "JENKINS_URL": test_url
+    }
+    assert layer.checks["ready"].level == ops.pebble.CheckLevel.READY
+    assert str(server.AGENT_STATE_PATH) in layer.checks["connection"].exec["command"]  # type: ignore[index]
+
+
+def test__get_pebble_layer_extra_agent(harness: ops.testing.Harness):
+    """
+    arrange: given a server url, and an agent_token pair.
+    act: when _get_pebble_layer is called for an additional agent.
+    assert: the agent service and checks are suffixed with the agent index and the agent runs \
+        in its own work directory.
+    """
+    harness.begin()
+    jenkins_charm = typing.cast(JenkinsAgentCharm, harness.charm)
+
+    layer = jenkins_charm.pebble_service._get_pebble_layer(
+        server_url="http://test-url", agent_token_pair=("agent-2", "token"), index=2
+    )
+
+    service = layer.services["jenkins-agent-k8s-2"]
+    assert service.environment["JENKINS_AGENT_WORKDIR"] == str(server.get_agent_workdir(2))
+    assert service.on_check_failure == {"connection-2": "restart"}
+    assert set(layer.checks) == {"ready-2", "connection-2"}
+    assert str(server.get_agent_state_path(2)) in layer.checks["ready-2"].exec["command"]  # type: ignore[index]
 
 
 def test_reconcile():
     """
     arrange: given a server url, and an agent_token pair.
     act: when reconcile is called.
-    assert: pebble service is initialized and the unit status becomes Active.
+    assert: pebble service is initialized with the JVM options.
     """
     mock_state = unittest.mock.MagicMock(spec=state.State)
+    mock_state.drain_timeout = 0
+    mock_state.jenkins_agent_service_name = state.State.jenkins_agent_service_name
+    mock_state.jvm_options = "-XX:+UseZGC"
+    mock_state.jenkins_config = None
     mock_container = unittest.mock.MagicMock(spec=ops.Container)
+    mock_container.pull.side_effect = ops.pebble.PathError("not-found", "not found")
     pebble_service = pebble.PebbleService(state=mock_state)
 
     pebble_service.reconcile(
@@ -64,6 +126,9 @@ def test_reconcile():
     )
 
     mock_container.add_layer.assert_called_once()
+    layer = mock_container.add_layer.call_args.kwargs["layer"]
+    java_options = layer.services[state.State.jenkins_agent_service_name].environment["JAVA_OPTS"]
+    assert java_options.endswith("-XX:+UseZGC")
     mock_container.replan.assert_called_once()
 
 
@@ -74,6 +139,7 @@ def test_stop_agent_service_not_exists():
     assert: nothing happens since the service was not started.
     """
     mock_state = unittest.mock.MagicMock(spec=state.State)
+    mock_state.drain_timeout = 0
     mock_state.jenkins_agent_service_name = state.State.jenkins_agent_service_name
     mock_container = unittest.mock.MagicMock(spec=ops.Container)
     mock_container.get_service.side_effect = [ops.ModelError()]
@@ -85,17 +151,791 @@ def test_stop_agent_service_not_exists():
     mock_container.remove_path.assert_not_called()
 
 
-def test_stop_agent():
+@pytest.mark.parametrize(
+    "services, expected_stopped",
+    [
+        pytest.param({}, 1, id="without updater"),
+        pytest.param({pebble.AGENT_JAR_UPDATER_SERVICE: None}, 2, id="with updater"),
+    ],
+)
+def test_stop_agent(
+    busy_checks: typing.Tuple[typing.List[bool], typing.List[typing.Any]],
+    services: typing.Dict[str, None],
+    expected_stopped: int,
+):
     """
-    arrange: given a monkeypatched _jenkins_agent_container representing non connectable container.
+    arrange: given a container running the agent service with or without the JAR updater.
     act: when stop_agent is called.
-    assert: nothing happens since the workload should not be ready yet.
+    assert: the agents are drained, the agent and JAR updater services are stopped and the \
+        ready marker and connection state of the agent are removed.
     """
     mock_state = unittest.mock.MagicMock(spec=state.State)
+    mock_state.drain_timeout = 0
     mock_container = unittest.mock.MagicMock(spec=ops.Container)
+    mock_container.get_services.return_value = services
     pebble_service = pebble.PebbleService(state=mock_state)
 
     pebble_service.stop_agent(container=mock_container)
 
-    mock_container.stop.assert_called_once()
-    mock_container.remove_path.assert_called_once()
+    assert mock_container.stop.call_count == expected_stopped
+    assert [call.args[0] for call in mock_container.remove_path.call_args_list] == [
+        str(server.AGENT_READY_PATH),
+        str(server.AGENT_STATE_PATH),
+    ]
+    assert busy_checks[1] == [None]
+
+
+def _get_reconciled_container(
+    monkeypatch: pytest.MonkeyPatch, agent_jar_sha256: str
+) -> unittest.mock.MagicMock:
+    """Get a mock container running the services of a reconciled layer.
+
+    Args:
+        monkeypatch: The pytest monkeypatch fixture.
+        agent_jar_sha256: The SHA-256 hex digest of the agent JAR executable of the layer.
+
+    Returns:
+        The mock agent workload container planning and running the reconciled services.
+    """
+    monkeypatch.setattr(server, "get_active_agent_jar_sha256", lambda _: agent_jar_sha256)
+    mock_state = unittest.mock.MagicMock(spec=state.State)
+    mock_state.drain_timeout = 0
+    mock_state.jenkins_agent_service_name = state.State.jenkins_agent_service_name
+    mock_state.jvm_options = ""
+    mock_state.jenkins_config = None
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+    mock_container.pull.side_effect = ops.pebble.PathError("not-found", "not found")
+    mock_container.get_plan.return_value = ops.pebble.Plan({})
+    pebble.PebbleService(state=mock_state).reconcile(
+        server_url="http://test-url", agent_token_pair=("agent", "token"), container=mock_container
+    )
+    layer = mock_container.add_layer.call_args.kwargs["layer"]
+    mock_container.get_plan.return_value = ops.pebble.Plan(
+        {
+            "services": {name: service.to_dict() for name, service in layer.services.items()},
+            "checks": {name: check.to_dict() for name, check in layer.checks.items()},
+        }
+    )
+    mock_container.get_services.return_value = {
+        name: unittest.mock.MagicMock(spec=ops.pebble.ServiceInfo) for name in layer.services
+    }
+    mock_container.reset_mock(return_value=False, side_effect=False)
+    return mock_container
+
+
+@pytest.mark.parametrize(
+    "agent_jar_sha256, jvm_options, running, expected_replanned",
+    [
+        pytest.param("sha256", "", True, False, id="up to date"),
+        pytest.param("sha256", "", False, True, id="service not running"),
+        pytest.param("other", "", True, True, id="agent JAR changed"),
+        pytest.param("sha256", "-XX:+UseZGC", True, True, id="JVM options changed"),
+    ],
+)
+def test_reconcile_fingerprint(
+    monkeypatch: pytest.MonkeyPatch,
+    agent_jar_sha256: str,
+    jvm_options: str,
+    running: bool,
+    expected_replanned: bool,
+):
+    """
+    arrange: given a container running the services of a reconciled layer.
+    act: when reconcile is called again.
+    assert: the layer is only replanned if the agent JAR, the layer or the service state changed.
+    """
+    mock_container = _get_reconciled_container(monkeypatch, "sha256")
+    for info in mock_container.get_services.return_value.values():
+        info.is_running.return_value = running
+    monkeypatch.setattr(server, "get_active_agent_jar_sha256", lambda _: agent_jar_sha256)
+    mock_state = unittest.mock.MagicMock(spec=state.State)
+    mock_state.drain_timeout = 0
+    mock_state.jenkins_agent_service_name = state.State.jenkins_agent_service_name
+    mock_state.jvm_options = jvm_options
+    mock_state.jenkins_config = None
+    pebble_service = pebble.PebbleService(state=mock_state)
+
+    replanned = pebble_service.reconcile(
+        server_url="http://test-url", agent_token_pair=("agent", "token"), container=mock_container
+    )
+
+    assert replanned == expected_replanned
+    assert mock_container.replan.called == expected_replanned
+
+
+def test_reconcile_drains(
+    monkeypatch: pytest.MonkeyPatch,
+    busy_checks: typing.Tuple[typing.List[bool], typing.List[typing.Any]],
+):
+    """
+    arrange: given a container running the services of a reconciled layer with a running build.
+    act: when reconcile is called with another agent JAR executable.
+    assert: the agent is replanned once its build is finished.
+    """
+    results, workdirs = busy_checks
+    results.extend([True, True])
+    monkeypatch.setattr(pebble.time, "sleep", lambda _: None)
+    mock_container = _get_reconciled_container(monkeypatch, "sha256")
+    for info in mock_container.get_services.return_value.values():
+        info.is_running.return_value = True
+    monkeypatch.setattr(server, "get_active_agent_jar_sha256", lambda _: "other")
+    mock_state = unittest.mock.MagicMock(spec=state.State)
+    mock_state.drain_timeout = 60
+    mock_state.jenkins_agent_service_name = state.State.jenkins_agent_service_name
+    mock_state.jvm_options = ""
+    mock_state.jenkins_config = None
+    pebble_service = pebble.PebbleService(state=mock_state)
+
+    replanned = pebble_service.reconcile(
+        server_url="http://test-url", agent_token_pair=("agent", "token"), container=mock_container
+    )
+
+    assert replanned
+    assert workdirs == [server.JENKINS_WORKDIR] * 3
+
+
+@pytest.mark.parametrize(
+    "busy_results, expected_idle",
+    [
+        pytest.param([], True, id="idle"),
+        pytest.param([True, True], True, id="builds finished"),
+        pytest.param([True] * 10, False, id="builds running"),
+    ],
+)
+def test_drain_agent(
+    monkeypatch: pytest.MonkeyPatch,
+    busy_checks: typing.Tuple[typing.List[bool], typing.List[typing.Any]],
+    busy_results: typing.List[bool],
+    expected_idle: bool,
+):
+    """
+    arrange: given agents running builds finishing or not within the grace period.
+    act: when drain_agent is called.
+    assert: the agents are idle only if their builds finished within the grace period.
+    """
+    results, workdirs = busy_checks
+    results.extend(busy_results)
+    clock = iter(range(0, 1000, pebble.DRAIN_POLL_INTERVAL))
+    monkeypatch.setattr(pebble.time, "monotonic", lambda: next(clock))
+    monkeypatch.setattr(pebble.time, "sleep", lambda _: None)
+    mock_state = unittest.mock.MagicMock(spec=state.State)
+    mock_state.drain_timeout = 30
+    pebble_service = pebble.PebbleService(state=mock_state)
+
+    idle = pebble_service.drain_agent(container=unittest.mock.MagicMock(spec=ops.Container))
+
+    assert idle == expected_idle
+    assert set(workdirs) == {None}
+
+
+def test_drain_agent_timeout(
+    monkeypatch: pytest.MonkeyPatch,
+    busy_checks: typing.Tuple[typing.List[bool], typing.List[typing.Any]],
+):
+    """
+    arrange: given agents running builds and a grace period longer than the given timeout.
+    act: when drain_agent is called with the timeout.
+    assert: the agents are not idle once the timeout is over.
+    """
+    results, _ = busy_checks
+    results.extend([True] * 10)
+    clock = iter(range(0, 1000, pebble.DRAIN_POLL_INTERVAL))
+    monkeypatch.setattr(pebble.time, "monotonic", lambda: next(clock))
+    monkeypatch.setattr(pebble.time, "sleep", lambda _: None)
+    mock_state = unittest.mock.MagicMock(spec=state.State)
+    mock_state.drain_timeout = 300
+    pebble_service = pebble.PebbleService(state=mock_state)
+
+    idle = pebble_service.drain_agent(
+        container=unittest.mock.MagicMock(spec=ops.Container), timeout=20
+    )
+
+    assert not idle
+    assert len(busy_checks[1]) == 2
+
+
+def test_reconcile_updates_checks(monkeypatch: pytest.MonkeyPatch):
+    """
+    arrange: given a container running the services of a reconciled layer, once connected.
+    act: when reconcile is called again.
+    assert: only the checks are updated to the steady period, without replan.
+    """
+    mock_container = _get_reconciled_container(monkeypatch, "sha256")
+    mock_container.pull.side_effect = lambda *_args, **_kwargs: io.StringIO("connected\n")
+    mock_state = unittest.mock.MagicMock(spec=state.State)
+    mock_state.drain_timeout = 0
+    mock_state.jenkins_agent_service_name = state.State.jenkins_agent_service_name
+    mock_state.jvm_options = ""
+    mock_state.jenkins_config = None
+    pebble_service = pebble.PebbleService(state=mock_state)
+
+    replanned = pebble_service.reconcile(
+        server_url="http://test-url", agent_token_pair=("agent", "token"), container=mock_container
+    )
+
+    assert not replanned
+    mock_container.replan.assert_not_called()
+    layer = mock_container.add_layer.call_args.kwargs["layer"]
+    assert {check.period for check in layer.checks.values()} == {pebble.STEADY_CHECK_PERIOD}
+
+
+@pytest.mark.parametrize(
+    "service_error, running, expected_restarted",
+    [
+        pytest.param(ops.ModelError(), False, False, id="service not exists"),
+        pytest.param(None, False, False, id="service not running"),
+        pytest.param(None, True, True, id="service running"),
+    ],
+)
+def test_restart_agent(
+    service_error: typing.Optional[Exception], running: bool, expected_restarted: bool
+):
+    """
+    arrange: given a container with or without a running agent service, not planned.
+    act: when restart_agent is called.
+    assert: the agent service is restarted only if running.
+    """
+    mock_state = unittest.mock.MagicMock(spec=state.State)
+    mock_state.drain_timeout = 0
+    mock_state.jenkins_agent_service_name = state.State.jenkins_agent_service_name
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+    mock_container.get_service.side_effect = service_error
+    mock_container.get_service.return_value.is_running.return_value = running
+    mock_container.get_plan.return_value = ops.pebble.Plan({})
+    pebble_service = pebble.PebbleService(state=mock_state)
+
+    pebble_service.restart_agent(container=mock_container)
+
+    assert mock_container.restart.called == expected_restarted
+
+
+@pytest.mark.parametrize(
+    "agent_jar_sha256, expected_restarted",
+    [
+        pytest.param("sha256", True, id="agent JAR unchanged"),
+        pytest.param("other", False, id="agent JAR changed"),
+    ],
+)
+def test_restart_agent_reconciles(
+    monkeypatch: pytest.MonkeyPatch, agent_jar_sha256: str, expected_restarted: bool
+):
+    """
+    arrange: given a container running the services of a reconciled layer.
+    act: when restart_agent is called after the agent JAR changed or not.
+    assert: the agent service is replanned with the new agent JAR fingerprint instead of \
+        restarted, restarted otherwise.
+    """
+    mock_container = _get_reconciled_container(monkeypatch, "sha256")
+    mock_container.get_service.return_value.is_running.return_value = True
+    monkeypatch.setattr(server, "get_active_agent_jar_sha256", lambda _: agent_jar_sha256)
+    mock_state = unittest.mock.MagicMock(spec=state.State)
+    mock_state.drain_timeout = 0
+    mock_state.jenkins_agent_service_name = state.State.jenkins_agent_service_name
+    mock_state.jvm_options = ""
+    mock_state.jenkins_config = None
+    pebble_service = pebble.PebbleService(state=mock_state)
+
+    pebble_service.restart_agent(container=mock_container)
+
+    assert mock_container.restart.called == expected_restarted
+    assert mock_container.replan.called != expected_restarted
+
+
+@pytest.mark.parametrize(
+    "service_error, running, agent_state, expected_connected",
+    [
+        pytest.param(ops.ModelError(), False, "", False, id="service not exists"),
+        pytest.param(None, False, "connected", False, id="service not running"),
+        pytest.param(None, True, "connecting", False, id="agent connecting"),
+        pytest.param(None, True, "connected", True, id="agent connected"),
+    ],
+)
+def test_is_agent_connected(
+    service_error: typing.Optional[Exception],
+    running: bool,
+    agent_state: str,
+    expected_connected: bool,
+):
+    """
+    arrange: given a container with or without a running agent service in a connection state.
+    act: when is_agent_connected is called.
+    assert: the agent is connected only if its service is running and its state is connected.
+    """
+    mock_state = unittest.mock.MagicMock(spec=state.State)
+    mock_state.drain_timeout = 0
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+    mock_container.get_service.side_effect = service_error
+    mock_container.get_service.return_value.is_running.return_value = running
+    mock_container.pull.side_effect = lambda *_args, **_kwargs: io.StringIO(f"{agent_state}\n")
+    pebble_service = pebble.PebbleService(state=mock_state)
+
+    assert pebble_service.is_agent_connected(container=mock_container) == expected_connected
+
+
+@pytest.mark.parametrize(
+    "agent_state, planned_period, expected_period",
+    [
+        pytest.param("connecting", pebble.STARTUP_CHECK_PERIOD, None, id="startup unchanged"),
+        pytest.param(
+            "connected",
+            pebble.STARTUP_CHECK_PERIOD,
+            pebble.STEADY_CHECK_PERIOD,
+            id="agent connected",
+        ),
+        pytest.param(
+            "exited", pebble.STEADY_CHECK_PERIOD, pebble.STARTUP_CHECK_PERIOD, id="agent exited"
+        ),
+        pytest.param("connected", None, None, id="service not planned"),
+    ],
+)
+def test_update_checks(
+    agent_state: str, planned_period: typing.Optional[str], expected_period: typing.Optional[str]
+):
+    """
+    arrange: given a container planning the agent checks with a period, or not planned.
+    act: when update_checks is called.
+    assert: the checks are probed less often once the agent is connected, and only updated if \
+        their period changed.
+    """
+    mock_state = unittest.mock.MagicMock(spec=state.State)
+    mock_state.drain_timeout = 0
+    mock_state.jenkins_agent_service_name = state.State.jenkins_agent_service_name
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+    mock_container.pull.side_effect = lambda *_args, **_kwargs: io.StringIO(f"{agent_state}\n")
+    mock_container.get_plan.return_value = ops.pebble.Plan(
+        {
+            "services": {state.State.jenkins_agent_service_name: {"command": "entrypoint"}},
+            "checks": typing.cast(
+                typing.Dict[str, typing.Any], pebble._get_checks(planned_period)
+            ),
+        }
+        if planned_period
+        else {}
+    )
+    pebble_service = pebble.PebbleService(state=mock_state)
+
+    pebble_service.update_checks(container=mock_container)
+
+    if not expected_period:
+        mock_container.add_layer.assert_not_called()
+        return
+    layer = mock_container.add_layer.call_args.kwargs["layer"]
+    assert not layer.services
+    assert {check.period for check in layer.checks.values()} == {expected_period}
+
+
+def _get_mock_agent_container(
+    running_pair: typing.Optional[typing.Tuple[str, str]],
+    agent_states: typing.List[str],
+    index: int = 0,
+) -> unittest.mock.MagicMock:
+    """Get a mock container running an agent service and reporting its connection states.
+
+    Args:
+        running_pair: The agent-token pair of the planned agent service, if any.
+        agent_states: The agent connection states read in order, empty for a missing state file.
+        index: The index of the agent service.
+
+    Returns:
+        The mock agent workload container.
+    """
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+    services: typing.Dict[str, ops.pebble.ServiceDict] = {}
+    if running_pair:
+        service_name = state.State.jenkins_agent_service_name
+        services[f"{service_name}-{index}" if index else service_name] = {
+            "environment": {"JENKINS_AGENT": running_pair[0], "JENKINS_TOKEN": running_pair[1]}
+        }
+    mock_container.get_plan.return_value = ops.pebble.Plan({"services": services})
+
+    def pull(path: typing.Any, **_kwargs: typing.Any) -> io.StringIO:
+        """Read the next agent connection state.
+
+        Args:
+            path: The pulled file path.
+
+        Returns:
+            The agent state file content.
+
+        Raises:
+            PathError: if the agent state file, or any other file, does not exist.
+        """
+        if str(path) != str(server.get_agent_state_path(index)):
+            raise ops.pebble.PathError("not-found", "not found")
+        agent_state = agent_states.pop(0)
+        if not agent_state:
+            raise ops.pebble.PathError("not-found", "not found")
+        return io.StringIO(f"{agent_state}\n")
+
+    mock_container.pull.side_effect = pull
+    return mock_container
+
+
+@pytest.mark.parametrize(
+    "running_pair, agent_states, expected_pair, expected_started",
+    [
+        pytest.param(
+            None, ["", "connecting", "connected"], ("first", "token"), 1, id="first connects"
+        ),
+        pytest.param(
+            None, ["rejected", "exited", "connected"], ("third", "token"), 3, id="third connects"
+        ),
+        pytest.param(
+            ("second", "token"), ["connected"], ("second", "token"), 1, id="running connected"
+        ),
+        pytest.param(
+            ("other", "token"), ["connected"], ("first", "token"), 1, id="running not configured"
+        ),
+        pytest.param(None, ["rejected", "rejected", "exited"], None, 3, id="no valid pair"),
+    ],
+)
+def test_start_agent(
+    monkeypatch: pytest.MonkeyPatch,
+    running_pair: typing.Optional[typing.Tuple[str, str]],
+    agent_states: typing.List[str],
+    expected_pair: typing.Optional[typing.Tuple[str, str]],
+    expected_started: int,
+):
+    """
+    arrange: given a container reporting the connection states of the agent service.
+    act: when start_agent is called with several agent-token pairs.
+    assert: the agent service is started with each pair until it connects, starting with the \
+        running pair.
+    """
+    monkeypatch.setattr(pebble.time, "sleep", lambda _: None)
+    monkeypatch.setattr(
+        pebble.PebbleService, "_get_check_period", lambda *_: pebble.STARTUP_CHECK_PERIOD
+    )
+    mock_state = unittest.mock.MagicMock(spec=state.State)
+    mock_state.drain_timeout = 0
+    mock_state.jenkins_agent_service_name = state.State.jenkins_agent_service_name
+    mock_state.jvm_options = ""
+    mock_state.jenkins_config = None
+    mock_container = _get_mock_agent_container(running_pair, agent_states)
+    pebble_service = pebble.PebbleService(state=mock_state)
+
+    started_pair = pebble_service.start_agent(
+        server_url="http://test-url",
+        agent_token_pairs=[("first", "token"), ("second", "token"), ("third", "token")],
+        container=mock_container,
+        timeout=60,
+    )
+
+    assert started_pair == expected_pair
+    assert mock_container.replan.call_count == expected_started
+    assert mock_container.stop.called == (expected_pair is None)
+
+
+def test_start_agent_timeout(monkeypatch: pytest.MonkeyPatch):
+    """
+    arrange: given a container where the agent service never reports a connection outcome.
+    act: when start_agent is called.
+    assert: the next pair is tried once the timeout has elapsed.
+    """
+    clock = iter(range(0, 100, 10))
+    monkeypatch.setattr(pebble.time, "monotonic", lambda: next(clock))
+    monkeypatch.setattr(pebble.time, "sleep", lambda _: None)
+    monkeypatch.setattr(
+        pebble.PebbleService, "_get_check_period", lambda *_: pebble.STARTUP_CHECK_PERIOD
+    )
+    mock_state = unittest.mock.MagicMock(spec=state.State)
+    mock_state.drain_timeout = 0
+    mock_state.jenkins_agent_service_name = state.State.jenkins_agent_service_name
+    mock_state.jvm_options = ""
+    mock_state.jenkins_config = None
+    mock_container = _get_mock_agent_container(None, ["connecting", "connecting", "connected"])
+    pebble_service = pebble.PebbleService(state=mock_state)
+
+    started_pair = pebble_service.start_agent(
+        server_url="http://test-url",
+        agent_token_pairs=[("first", "token"), ("second", "token")],
+        container=mock_container,
+        timeout=15,
+    )
+
+    assert started_pair == ("second", "token")
+
+
+def test_start_agent_extra_agent_fails(monkeypatch: pytest.MonkeyPatch):
+    """
+    arrange: given a container where an additional agent service is rejected with every pair.
+    act: when start_agent is called for the additional agent.
+    assert: only the additional agent service is stopped.
+    """
+    monkeypatch.setattr(pebble.time, "sleep", lambda _: None)
+    monkeypatch.setattr(
+        pebble.PebbleService, "_get_check_period", lambda *_: pebble.STARTUP_CHECK_PERIOD
+    )
+    mock_state = unittest.mock.MagicMock(spec=state.State)
+    mock_state.drain_timeout = 0
+    mock_state.jenkins_agent_service_name = state.State.jenkins_agent_service_name
+    mock_state.jvm_options = ""
+    mock_state.jenkins_config = None
+    mock_container = _get_mock_agent_container(("first", "token"), ["rejected"], index=1)
+    pebble_service = pebble.PebbleService(state=mock_state)
+
+    started_pair = pebble_service.start_agent(
+        server_url="http://test-url",
+        agent_token_pairs=[("first", "token")],
+        container=mock_container,
+        timeout=60,
+        index=1,
+    )
+
+    assert started_pair is None
+    assert mock_container.add_layer.call_args.kwargs["label"] == "jenkins-agent-k8s-1"
+    mock_container.stop_checks.assert_called_once_with("ready-1", "connection-1")
+    mock_container.stop.assert_called_once_with("jenkins-agent-k8s-1")
+
+
+@pytest.mark.parametrize(
+    "running, expected_stopped",
+    [
+        pytest.param(True, True, id="agent running"),
+        pytest.param(False, False, id="agent not running"),
+    ],
+)
+def test_stop_extra_agents(
+    busy_checks: typing.Tuple[typing.List[bool], typing.List[typing.Any]],
+    running: bool,
+    expected_stopped: bool,
+):
+    """
+    arrange: given a container planning the main agent service and two additional agents.
+    act: when stop_extra_agents is called to keep two agents.
+    assert: the last agent service and its checks are disabled, the service drained and \
+        stopped if running, and its connection state removed.
+    """
+    mock_state = unittest.mock.MagicMock(spec=state.State)
+    mock_state.drain_timeout = 0
+    mock_state.jenkins_agent_service_name = state.State.jenkins_agent_service_name
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+    mock_container.get_plan.return_value = ops.pebble.Plan(
+        {
+            "services": {
+                "jenkins-agent-k8s": {},
+                "jenkins-agent-k8s-1": {},
+                "jenkins-agent-k8s-2": {},
+                "jenkins-agent-k8s-other": {},
+                pebble.AGENT_JAR_UPDATER_SERVICE: {},
+            }
+        }
+    )
+    mock_container.get_service.return_value.is_running.return_value = running
+    pebble_service = pebble.PebbleService(state=mock_state)
+
+    pebble_service.stop_extra_agents(container=mock_container, agent_count=2)
+
+    layer = mock_container.add_layer.call_args.kwargs["layer"]
+    assert layer.services["jenkins-agent-k8s-2"].startup == "disabled"
+    assert set(layer.checks) == {"ready-2", "connection-2"}
+    mock_container.stop_checks.assert_called_once_with("ready-2", "connection-2")
+    assert mock_container.stop.called == expected_stopped
+    assert busy_checks[1] == ([server.get_agent_workdir(2)] if expected_stopped else [])
+    mock_container.remove_path.assert_called_once_with(
+        str(server.get_agent_state_path(2)), recursive=True
+    )
+
+
+def test_stop_extra_agents_drain_grace_period(
+    monkeypatch: pytest.MonkeyPatch,
+    busy_checks: typing.Tuple[typing.List[bool], typing.List[typing.Any]],
+):
+    """
+    arrange: given a container running two additional agents running builds for longer than the \
+        grace period.
+    act: when stop_extra_agents is called to keep the main agent only.
+    assert: both agents are stopped once the grace period shared by their drains is over.
+    """
+    results, workdirs = busy_checks
+    results.extend([True] * 10)
+    clock = iter(range(0, 1000, pebble.DRAIN_POLL_INTERVAL))
+    monkeypatch.setattr(pebble.time, "monotonic", lambda: next(clock))
+    monkeypatch.setattr(pebble.time, "sleep", lambda _: None)
+    mock_state = unittest.mock.MagicMock(spec=state.State)
+    mock_state.drain_timeout = 30
+    mock_state.jenkins_agent_service_name = state.State.jenkins_agent_service_name
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+    mock_container.get_plan.return_value = ops.pebble.Plan(
+        {
+            "services": {
+                "jenkins-agent-k8s": {},
+                "jenkins-agent-k8s-1": {},
+                "jenkins-agent-k8s-2": {},
+            }
+        }
+    )
+    mock_container.get_service.return_value.is_running.return_value = True
+    pebble_service = pebble.PebbleService(state=mock_state)
+
+    pebble_service.stop_extra_agents(container=mock_container, agent_count=1)
+
+    assert workdirs == [server.get_agent_workdir(1)] * 3 + [server.get_agent_workdir(2)]
+    assert mock_container.stop.call_count == 2
+
+
+def test_update_checks_stopped_extra_agents(harness: ops.testing.Harness):
+    """
+    arrange: given a container planning the main agent and two additional agents, the \
+        additional agents stopped.
+    act: when update_checks is called.
+    assert: the checks of the additional agents stay disabled.
+    """
+    harness.set_can_connect(state.State.jenkins_agent_service_name, True)
+    harness.begin()
+    pebble_service = typing.cast(JenkinsAgentCharm, harness.charm).pebble_service
+    container = harness.model.unit.get_container(state.State.jenkins_agent_service_name)
+    for index in range(3):
+        layer = pebble_service._get_pebble_layer(
+            server_url="http://test-url", agent_token_pair=(f"agent-{index}", "token"), index=index
+        )
+        container.add_layer(label=f"agent-{index}", layer=layer, combine=True)
+    pebble_service.stop_extra_agents(container=container, agent_count=1, drain=False)
+
+    pebble_service.update_checks(container=container)
+
+    checks = container.get_plan().checks
+    assert all(
+        checks[name].startup == ops.pebble.CheckStartup.DISABLED
+        for name in ("ready-1", "connection-1", "ready-2", "connection-2")
+    )
+    assert checks["ready"].startup != ops.pebble.CheckStartup.DISABLED
+
+
+def test_update_checks_extra_agents():
+    """
+    arrange: given a container planning the checks of the main agent and an additional agent.
+    act: when update_checks is called once the agents are connected.
+    assert: the checks of each agent are probed less often.
+    """
+    mock_state = unittest.mock.MagicMock(spec=state.State)
+    mock_state.drain_timeout = 0
+    mock_state.jenkins_agent_service_name = state.State.jenkins_agent_service_name
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+    mock_container.pull.side_effect = lambda *_args, **_kwargs: io.StringIO("connected\n")
+    mock_container.get_plan.return_value = ops.pebble.Plan(
+        {
+            "services": {"jenkins-agent-k8s": {}, "jenkins-agent-k8s-1": {}},
+            "checks": typing.cast(
+                typing.Dict[str, typing.Any],
+                {
+                    **pebble._get_checks(pebble.STARTUP_CHECK_PERIOD),
+                    **pebble._get_checks(pebble.STARTUP_CHECK_PERIOD, 1),
+                },
+            ),
+        }
+    )
+    pebble_service = pebble.PebbleService(state=mock_state)
+
+    pebble_service.update_checks(container=mock_container)
+
+    labels = [call.kwargs["label"] for call in mock_container.add_layer.call_args_list]
+    assert labels == ["jenkins-agent-k8s", "jenkins-agent-k8s-1"]
+    layer = mock_container.add_layer.call_args.kwargs["layer"]
+    assert {name: check.period for name, check in layer.checks.items()} == {
+        "ready-1": pebble.STEADY_CHECK_PERIOD,
+        "connection-1": pebble.STEADY_CHECK_PERIOD,
+    }
+
+
+@pytest.mark.parametrize(
+    "low_watermark, running, expected_restarted",
+    [
+        pytest.param(70, True, False, id="up to date"),
+        pytest.param(70, False, True, id="service not running"),
+        pytest.param(50, True, True, id="watermark changed"),
+    ],
+)
+def test_reconcile_workspace_gc(low_watermark: int, running: bool, expected_restarted: bool):
+    """
+    arrange: given a container running the workspace GC service planned with watermarks.
+    act: when reconcile_workspace_gc is called.
+    assert: the service is only replanned and restarted if its configuration changed or it is \
+        not running.
+    """
+    mock_state = unittest.mock.MagicMock(spec=state.State)
+    mock_state.workspace_gc_config = state.WorkspaceGcConfig()
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+    mock_container.get_plan.return_value = ops.pebble.Plan({})
+    pebble_service = pebble.PebbleService(state=mock_state)
+    pebble_service.reconcile_workspace_gc(container=mock_container)
+    layer = mock_container.add_layer.call_args.kwargs["layer"]
+    mock_container.get_plan.return_value = ops.pebble.Plan(
+        {"services": {name: service.to_dict() for name, service in layer.services.items()}}
+    )
+    mock_container.get_services.return_value = {
+        pebble.WORKSPACE_GC_SERVICE: unittest.mock.MagicMock(spec=ops.pebble.ServiceInfo)
+    }
+    mock_container.get_services.return_value[
+        pebble.WORKSPACE_GC_SERVICE
+    ].is_running.return_value = running
+    mock_container.reset_mock(return_value=False, side_effect=False)
+    mock_state.workspace_gc_config = state.WorkspaceGcConfig(low_watermark=low_watermark)
+
+    restarted = pebble_service.reconcile_workspace_gc(container=mock_container)
+
+    assert restarted == expected_restarted
+    assert mock_container.restart.called == expected_restarted
+    if expected_restarted:
+        gc_service = mock_container.add_layer.call_args.kwargs["layer"].services[
+            pebble.WORKSPACE_GC_SERVICE
+        ]
+        assert gc_service.environment["WORKSPACE_GC_LOW_WATERMARK"] == str(low_watermark)
+        assert gc_service.environment["WORKSPACE_GC_STATS_FILE"] == str(
+            server.WORKSPACE_GC_STATS_PATH
+        )
+
+
+@pytest.mark.parametrize(
+    "start_error",
+    [
+        pytest.param(None, id="running"),
+        pytest.param(
+            ops.pebble.ChangeError("exited quickly", unittest.mock.MagicMock()),
+            id="exited quickly",
+        ),
+    ],
+)
+def test_start_cache_bundle_unpack(start_error: typing.Optional[Exception]):
+    """
+    arrange: given a container whose cache bundle unpacking service runs or exits quickly.
+    act: when start_cache_bundle_unpack is called.
+    assert: the unpacking service is planned disabled and started once.
+    """
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+    mock_container.start.side_effect = start_error
+    pebble_service = pebble.PebbleService(state=unittest.mock.MagicMock(spec=state.State))
+
+    pebble_service.start_cache_bundle_unpack(container=mock_container)
+
+    service = mock_container.add_layer.call_args.kwargs["layer"].services[
+        pebble.CACHE_BUNDLE_SERVICE
+    ]
+    assert service.startup == "disabled"
+    assert service.on_success == "ignore"
+    mock_container.start.assert_called_once_with(pebble.CACHE_BUNDLE_SERVICE)
+    assert pebble_service.is_cache_bundle_unpacking(container=mock_container)
+
+
+def test_reconcile_metrics_exporter():
+    """
+    arrange: given a container without metrics exporter service.
+    act: when reconcile_metrics_exporter is called.
+    assert: the metrics exporter service is planned on the metrics port and started.
+    """
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+    mock_container.get_plan.return_value = ops.pebble.Plan({})
+    pebble_service = pebble.PebbleService(state=unittest.mock.MagicMock(spec=state.State))
+
+    restarted = pebble_service.reconcile_metrics_exporter(container=mock_container)
+
+    assert restarted
+    service = mock_container.add_layer.call_args.kwargs["layer"].services[
+        pebble.METRICS_EXPORTER_SERVICE
+    ]
+    assert service.environment == {
+        "METRICS_PORT": str(metrics.METRICS_PORT),
+        "WORKSPACE_GC_STATS_FILE": str(server.WORKSPACE_GC_STATS_PATH),
+        "CHARM_METRICS_FILE": str(server.CHARM_METRICS_PATH),
+    }
+    mock_container.restart.assert_called_once_with(pebble.METRICS_EXPORTER_SERVICE)
@@ -0,0 +1,99 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Jenkins-agent-k8s remoting log parser tests."""
+
+import itertools
+import typing
+
+import pytest
+
+import remoting_log
+from remoting_log import RemotingEventType
+
+
+def test_feed_connection_log(jenkins_connection_log: str):
+    """
+    arrange: given the remoting logs of a successful connection.
+    act: when the log lines are fed to the parser.
+    assert: the connection events are parsed in order with their details and times.
+    """
+    clock = itertools.count()
+    parser = remoting_log.RemotingLogParser(clock=lambda: float(next(clock)))
+
+    events = [
+        event
+        for line in jenkins_connection_log.splitlines(keepends=True)
+        if (event := parser.feed(line))
+    ]
+
+    assert [(event.type, event.detail) for event in events] == [
+        (RemotingEventType.CONNECTING, "[<IP_REDACTED>]"),
+        (RemotingEventType.CONNECTING, "<IP_REDACTED>:<PORT_REDACTED>"),
+        (RemotingEventType.PROTOCOL, "JNLP4-connect"),
+        (RemotingEventType.CONNECTED, ""),
+    ]
+    assert [event.elapsed for event in events] == [1, 2, 3, 4]
+    assert parser.connected and not parser.rejected
+    assert parser.protocol == "JNLP4-connect"
+    assert parser.connect_latency == 4
+
+
+@pytest.mark.parametrize(
+    "log_fixture, expected_types",
+    [
+        pytest.param("jenkins_error_log", [], id="error log"),
+        pytest.param(
+            "jenkins_rejected_connection_log",
+            [RemotingEventType.REJECTED, RemotingEventType.REJECTED],
+            id="rejected connection log",
+        ),
+    ],
+)
+def test_feed_failed_log(
+    log_fixture: str,
+    expected_types: typing.List[RemotingEventType],
+    request: pytest.FixtureRequest,
+):
+    """
+    arrange: given the remoting logs of a failed connection.
+    act: when the log lines are fed to the parser.
+    assert: the agent is not connected and the rejections are parsed.
+    """
+    parser = remoting_log.RemotingLogParser()
+
+    events = [parser.feed(line) for line in request.getfixturevalue(log_fixture).splitlines()]
+
+    assert [event.type for event in events if event] == expected_types
+    assert not parser.connected
+    assert parser.rejected == bool(expected_types)
+
+
+def test_feed_terminated_log(jenkins_terminated_connection_log: str):
+    """
+    arrange: given the remoting logs of a connection terminated right after connecting.
+    act: when the log lines are fed to the parser.
+    assert: the agent connection is reported as rejected, the first connection time being kept.
+    """
+    clock = itertools.count()
+    parser = remoting_log.RemotingLogParser(clock=lambda: float(next(clock)))
+
+    for line in (jenkins_terminated_connection_log + "\nINFO: Connected").splitlines():
+        parser.feed(line)
+
+    assert parser.connected and parser.rejected
+    assert parser.connect_latency == 4
+
+
+def test_tail():
+    """
+    arrange: given a parser keeping the last 3 log lines.
+    act: when more log lines are fed to the parser.
+    assert: only the last 3 log lines are kept, without line endings.
+    """
+    parser = remoting_log.RemotingLogParser(tail_size=3)
+
+    for index in range(10):
+        parser.feed(f"line {index}\r\n")
+
+    assert parser.get_tail() == "line 7\nline 8\nline 9"
@@ -6,18 +6,42 @@
 # Need access to protected functions for testing
 # pylint:disable=protected-access
 
+import contextlib
+import hashlib
+import io
+import pathlib
 import secrets
+import threading
+import time
 import typing
 import unittest.mock
+import zipfile
 
 import ops
 import ops.testing
 import pytest
 import requests
 
+import jar_store
 import server
 
 
+def test_create_http_session():
+    """
+    arrange: given no existing HTTP session.
+    act: when create_http_session is called.
+    assert: a session with a pooled, retrying adapter for HTTP and HTTPS is returned.
+    """
+    session = server.create_http_session()
+
+    for url in ("http://test-url", "https://test-url"):
+        adapter = session.get_adapter(url)
+        assert isinstance(adapter, requests.adapters.HTTPAdapter)
+        assert adapter.poolmanager.connection_pool_kw["maxsize"] == server.HTTP_POOL_MAXSIZE
+        assert adapter.max_retries.total == server.HTTP_RETRIES
+        assert adapter.max_retries.read == 0
+
+
 @pytest.mark.parametrize(
     "exception",
     [
@@ -27,38 +51,545 @@ import server
     ],
 )
 def test_download_jenkins_agent_download_error(
-    monkeypatch: pytest.MonkeyPatch, raise_exception: typing.Callable, exception: Exception
+    monkeypatch: pytest.MonkeyPatch,
+    raise_exception: typing.Callable,
+    exception: Exception,
+    http_session: requests.Session,
 ):
     """
-    arrange: given a monkeypatched requests.get that raises an exception.
+    arrange: given a monkeypatched HTTP session that raises an exception.
     act: when download_jenkins_agent is called.
     assert: AgentJarDownloadError is raised.
     """
-    monkeypatch.setattr(requests, "get", lambda *_args, **_kwargs: raise_exception(exception))
+    monkeypatch.setattr(http_session, "get", lambda *_args, **_kwargs: raise_exception(exception))
+    monkeypatch.setattr(server, "AGENT_JAR_DOWNLOAD_BUDGET", 0)
     mock_contaier = unittest.mock.MagicMock(spec=ops.Container)
     with pytest.raises(server.AgentJarDownloadError):
-        server.download_jenkins_agent(server_url="http://test-url", container=mock_contaier)
+        server.download_jenkins_agent(
+            server_url="http://test-url", container=mock_contaier, session=http_session
+        )
 
 
 def test_download_jenkins_agent_download(
-    monkeypatch: pytest.MonkeyPatch, harness: ops.testing.Harness
+    monkeypatch: pytest.MonkeyPatch,
+    harness: ops.testing.Harness,
+    agent_jar: bytes,
+    get_mock_response: typing.Callable[..., unittest.mock.MagicMock],
+    agent_jar_download_dir: pathlib.Path,
+    http_session: requests.Session,
 ):
     """
-    arrange: given a monkeypatched requests.get that returns the agent.jar content.
+    arrange: given a monkeypatched HTTP session that returns the agent.jar content.
     act: when download_jenkins_agent is called.
-    assert: the agent.jar is installed in the workload container.
+    assert: the agent.jar is added to the store and activated and the partial download is \
+        removed.
     """
-    response_content = "hello"
-    mock_response = unittest.mock.MagicMock(spec=requests.Response)
-    mock_response.content = response_content
-    monkeypatch.setattr(requests, "get", lambda *_args, **_kwags: mock_response)
+    mock_response = get_mock_response(
+        chunks=[agent_jar[:100], agent_jar[100:]],
+        headers={"ETag": '"test-etag"', "X-Jenkins": "2.401"},
+    )
+    monkeypatch.setattr(http_session, "get", lambda *_args, **_kwags: mock_response)
     harness.set_can_connect("jenkins-agent-k8s", True)
+    harness.handle_exec("jenkins-agent-k8s", ["ln"], result=0)
+    harness.handle_exec("jenkins-agent-k8s", ["mv"], result=0)
+    harness.handle_exec("jenkins-agent-k8s", ["java"], result=1)
     harness.begin()
 
     container = harness.model.unit.get_container("jenkins-agent-k8s")
-    server.download_jenkins_agent(server_url="http://test-url", container=container)
+    metadata = server.download_jenkins_agent(
+        server_url="http://test-url", container=container, session=http_session
+    )
+
+    sha256 = hashlib.sha256(agent_jar).hexdigest()
+    assert metadata == server.AgentJarMetadata(sha256=sha256, etag='"test-etag"', version="2.401")
+    store_path = server.AGENT_JAR_STORE_PATH
+    assert container.pull(store_path / f"{sha256}.jar", encoding=None).read() == agent_jar
+    index = jar_store.StoreIndex.model_validate_json(
+        container.pull(store_path / jar_store.INDEX_FILENAME, encoding="utf-8").read()
+    )
+    assert index.active == sha256
+    assert index.entries[sha256].size == len(agent_jar)
+    assert index.entries[sha256].versions == ["2.401"]
+    assert not list(agent_jar_download_dir.iterdir())
+
+
+def test_download_jenkins_agent_not_modified(
+    monkeypatch: pytest.MonkeyPatch,
+    agent_jar_metadata: server.AgentJarMetadata,
+    get_mock_response: typing.Callable[..., unittest.mock.MagicMock],
+    get_mock_store_container: typing.Callable[..., unittest.mock.MagicMock],
+    http_session: requests.Session,
+):
+    """
+    arrange: given an active agent.jar in the store and a monkeypatched HTTP session that \
+        returns an unknown server version and 304 Not Modified.
+    act: when download_jenkins_agent is called.
+    assert: a conditional request is made and the server version is recorded for the active \
+        agent.jar.
+    """
+    monkeypatch.setattr(
+        http_session,
+        "head",
+        lambda *_args, **_kwargs: get_mock_response(headers={"X-Jenkins": "2.401"}),
+    )
+    mock_get = unittest.mock.MagicMock(
+        spec=requests.Session.get,
+        return_value=get_mock_response(status_code=requests.codes.not_modified),
+    )
+    monkeypatch.setattr(http_session, "get", mock_get)
+    index = jar_store.StoreIndex(
+        active=agent_jar_metadata.sha256,
+        entries={
+            agent_jar_metadata.sha256: jar_store.StoreEntry(
+                **agent_jar_metadata.model_dump(exclude={"version"})
+            )
+        },
+    )
+    mock_container = get_mock_store_container(index)
+
+    metadata = server.download_jenkins_agent(
+        server_url="http://test-url", container=mock_container, session=http_session
+    )
+
+    assert metadata == agent_jar_metadata.model_copy(update={"version": "2.401"})
+    assert mock_get.call_args.kwargs["headers"] == {
+        "If-None-Match": agent_jar_metadata.etag,
+        "If-Modified-Since": agent_jar_metadata.last_modified,
+    }
+    pushed_index = jar_store.StoreIndex.model_validate_json(mock_container.push.call_args.args[1])
+    assert pushed_index.entries[agent_jar_metadata.sha256].versions == ["2.401"]
+    mock_container.exec.assert_not_called()
+
+
+def test_download_jenkins_agent_known_version(
+    monkeypatch: pytest.MonkeyPatch,
+    agent_jar_metadata: server.AgentJarMetadata,
+    get_mock_response: typing.Callable[..., unittest.mock.MagicMock],
+    get_mock_store_container: typing.Callable[..., unittest.mock.MagicMock],
+    http_session: requests.Session,
+):
+    """
+    arrange: given a store with an inactive agent.jar served by a known server version and a \
+        monkeypatched HTTP session that returns that server version.
+    act: when download_jenkins_agent is called.
+    assert: the stored agent.jar is activated without downloading it.
+    """
+    monkeypatch.setattr(
+        http_session,
+        "head",
+        lambda *_args, **_kwargs: get_mock_response(headers={"X-Jenkins": "2.401"}),
+    )
+    mock_get = unittest.mock.MagicMock(spec=requests.Session.get)
+    monkeypatch.setattr(http_session, "get", mock_get)
+    index = jar_store.StoreIndex(
+        active="previous",
+        entries={
+            "previous": jar_store.StoreEntry(sha256="previous", versions=["2.400"]),
+            agent_jar_metadata.sha256: jar_store.StoreEntry(
+                **agent_jar_metadata.model_dump(exclude={"version"}), versions=["2.401"]
+            ),
+        },
+    )
+    mock_container = get_mock_store_container(index)
+
+    metadata = server.download_jenkins_agent(
+        server_url="http://test-url", container=mock_container, session=http_session
+    )
+
+    assert metadata == agent_jar_metadata.model_copy(update={"version": "2.401"})
+    mock_get.assert_not_called()
+    mock_container.exec.assert_any_call(
+        ["ln", "-sfn", f"agent-jars/{agent_jar_metadata.sha256}.jar", unittest.mock.ANY],
+        user=server.USER,
+    )
+
+
+@pytest.mark.parametrize(
+    "headers, expected_etag",
+    [
+        pytest.param({}, '"agent-jar-etag"', id="no cache headers"),
+        pytest.param({"ETag": '"agent-jar-etag"'}, '"agent-jar-etag"', id="same cache headers"),
+        pytest.param({"ETag": '"new-etag"'}, '"new-etag"', id="new cache headers"),
+    ],
+)
+def test_download_jenkins_agent_unchanged(
+    monkeypatch: pytest.MonkeyPatch,
+    agent_jar: bytes,
+    agent_jar_metadata: server.AgentJarMetadata,
+    get_mock_response: typing.Callable[..., unittest.mock.MagicMock],
+    get_mock_store_container: typing.Callable[..., unittest.mock.MagicMock],
+    http_session: requests.Session,
+    headers: typing.Dict[str, str],
+    expected_etag: str,
+):
+    """
+    arrange: given an active agent.jar in the store and a monkeypatched HTTP session that \
+        returns the same agent.jar content.
+    act: when download_jenkins_agent is called.
+    assert: the agent.jar is not pushed again and only changed cache headers are stored.
+    """
+    monkeypatch.setattr(
+        http_session, "head", lambda *_args, **_kwargs: get_mock_response(headers={})
+    )
+    monkeypatch.setattr(
+        http_session,
+        "get",
+        lambda *_args, **_kwargs: get_mock_response(chunks=[agent_jar], headers=headers),
+    )
+    index = jar_store.StoreIndex(
+        active=agent_jar_metadata.sha256,
+        entries={
+            agent_jar_metadata.sha256: jar_store.StoreEntry(
+                **agent_jar_metadata.model_dump(exclude={"version"})
+            )
+        },
+    )
+    mock_container = get_mock_store_container(index)
+
+    metadata = server.download_jenkins_agent(
+        server_url="http://test-url", container=mock_container, session=http_session
+    )
+
+    assert metadata == agent_jar_metadata.model_copy(update={"etag": expected_etag})
+    pushed_paths = [call.args[0] for call in mock_container.push.call_args_list]
+    changed = expected_etag != agent_jar_metadata.etag
+    assert pushed_paths == ([server.AGENT_JAR_STORE_PATH / jar_store.INDEX_FILENAME] * changed)
+
+
+@pytest.mark.parametrize(
+    "installed_files",
+    [
+        pytest.param({}, id="no store"),
+        pytest.param({server.AGENT_JAR_PATH: "agent"}, id="agent.jar without store"),
+        pytest.param(
+            {server.AGENT_JAR_STORE_PATH / jar_store.INDEX_FILENAME: "invalid"},
+            id="invalid store index",
+        ),
+        pytest.param(
+            {
+                server.AGENT_JAR_STORE_PATH / jar_store.INDEX_FILENAME: jar_store.StoreIndex(
+                    active="sha256",
+                    entries={"sha256": jar_store.StoreEntry(sha256="sha256", etag='"etag"')},
+                ).model_dump_json()
+            },
+            id="missing agent.jar link",
+        ),
+    ],
+)
+def test_download_jenkins_agent_no_active_agent_jar(
+    monkeypatch: pytest.MonkeyPatch,
+    harness: ops.testing.Harness,
+    installed_files: typing.Dict[pathlib.Path, str],
+    agent_jar: bytes,
+    get_mock_response: typing.Callable[..., unittest.mock.MagicMock],
+    raise_exception: typing.Callable,
+    http_session: requests.Session,
+):
+    """
+    arrange: given a workload container without an active agent.jar in the store and a \
+        server version that cannot be fetched.
+    act: when download_jenkins_agent is called.
+    assert: an unconditional request is made and the agent.jar is added to the store.
+    """
+    monkeypatch.setattr(
+        http_session,
+        "head",
+        lambda *_args, **_kwargs: raise_exception(requests.ConnectionError),
+    )
+    mock_get = unittest.mock.MagicMock(
+        spec=requests.Session.get, return_value=get_mock_response(chunks=[agent_jar])
+    )
+    monkeypatch.setattr(http_session, "get", mock_get)
+    harness.set_can_connect("jenkins-agent-k8s", True)
+    harness.handle_exec("jenkins-agent-k8s", ["ln"], result=0)
+    harness.handle_exec("jenkins-agent-k8s", ["mv"], result=0)
+    harness.handle_exec("jenkins-agent-k8s", ["java"], result=1)
+    harness.begin()
+    container = harness.model.unit.get_container("jenkins-agent-k8s")
+    for path, content in installed_files.items():
+        container.push(path, content, make_dirs=True)
+
+    metadata = server.download_jenkins_agent(
+        server_url="http://test-url", container=container, session=http_session
+    )
+
+    assert mock_get.call_args.kwargs["headers"] == {}
+    assert metadata.version is None
+    entry_path = server.AGENT_JAR_STORE_PATH / f"{metadata.sha256}.jar"
+    assert container.pull(entry_path, encoding=None).read() == agent_jar
+
+
+@pytest.mark.parametrize(
+    "exception",
+    [
+        pytest.param(requests.exceptions.ChunkedEncodingError(), id="ChunkedEncodingError"),
+        pytest.param(requests.Timeout(), id="TimeoutError"),
+        pytest.param(requests.ConnectionError(), id="ConnectionError"),
+    ],
+)
+def test_download_jenkins_agent_resume(
+    monkeypatch: pytest.MonkeyPatch,
+    agent_jar: bytes,
+    get_mock_response: typing.Callable[..., unittest.mock.MagicMock],
+    exception: Exception,
+    http_session: requests.Session,
+):
+    """
+    arrange: given a monkeypatched HTTP session whose first response fails mid-stream and \
+        a server that supports range requests.
+    act: when download_jenkins_agent is called.
+    assert: the download is resumed from the received bytes and the complete agent.jar is \
+        installed.
+    """
+    half = len(agent_jar) // 2
+    responses = [
+        get_mock_response(
+            chunks=[agent_jar[:half], exception],
+            headers={"ETag": '"test-etag"', "Content-Length": str(len(agent_jar))},
+        ),
+        get_mock_response(
+            status_code=requests.codes.partial_content,
+            chunks=[agent_jar[half:]],
+            headers={"Content-Range": f"bytes {half}-{len(agent_jar) - 1}/{len(agent_jar)}"},
+        ),
+    ]
+    mock_get = unittest.mock.MagicMock(spec=requests.Session.get, side_effect=responses)
+    monkeypatch.setattr(http_session, "get", mock_get)
+    monkeypatch.setattr(time, "sleep", mock_sleep := unittest.mock.MagicMock(spec=time.sleep))
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+    mock_container.exists.return_value = False
+    pushed = io.BytesIO()
+    mock_container.push.side_effect = lambda path, source, **_kwargs: (
+        pushed.write(source.read()) if path.suffix == ".jar" else None
+    )
+
+    metadata = server.download_jenkins_agent(
+        server_url="http://test-url", container=mock_container, session=http_session
+    )
+
+    assert mock_get.call_args.kwargs["headers"] == {
+        "Range": f"bytes={half}-",
+        "If-Range": '"test-etag"',
+    }
+    mock_sleep.assert_called_once()
+    assert pushed.getvalue() == agent_jar
+    assert metadata.sha256 == hashlib.sha256(agent_jar).hexdigest()
+
+
+def test_download_jenkins_agent_resume_next_attempt(
+    monkeypatch: pytest.MonkeyPatch,
+    agent_jar: bytes,
+    get_mock_response: typing.Callable[..., unittest.mock.MagicMock],
+    http_session: requests.Session,
+):
+    """
+    arrange: given a download that fails mid-stream without remaining time budget.
+    act: when download_jenkins_agent is called again.
+    assert: the first call raises AgentJarDownloadError and the second call resumes the \
+        partial download.
+    """
+    half = len(agent_jar) // 2
+    responses = [
+        get_mock_response(
+            chunks=[agent_jar[:half], requests.ConnectionError()],
+            headers={"Last-Modified": "Wed, 21 Oct 2015 07:28:00 GMT"},
+        ),
+        get_mock_response(
+            status_code=requests.codes.partial_content,
+            chunks=[agent_jar[half:]],
+            headers={"Content-Range": f"bytes {half}-{len(agent_jar) - 1}/{len(agent_jar)}"},
+        ),
+    ]
+    mock_get = unittest.mock.MagicMock(spec=requests.Session.get, side_effect=responses)
+    monkeypatch.setattr(http_session, "get", mock_get)
+    monkeypatch.setattr(server, "AGENT_JAR_DOWNLOAD_BUDGET", 0)
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+    mock_container.exists.return_value = False
+
+    with pytest.raises(server.AgentJarDownloadError):
+        server.download_jenkins_agent(
+            server_url="http://test-url", container=mock_container, session=http_session
+        )
+    metadata = server.download_jenkins_agent(
+        server_url="http://test-url", container=mock_container, session=http_session
+    )
+
+    assert mock_get.call_args.kwargs["headers"]["If-Range"] == "Wed, 21 Oct 2015 07:28:00 GMT"
+    assert metadata.sha256 == hashlib.sha256(agent_jar).hexdigest()
+
+
+def test_download_jenkins_agent_range_not_satisfiable(
+    monkeypatch: pytest.MonkeyPatch,
+    agent_jar: bytes,
+    agent_jar_download_dir: pathlib.Path,
+    get_mock_response: typing.Callable[..., unittest.mock.MagicMock],
+    http_session: requests.Session,
+):
+    """
+    arrange: given a stale partial download the server cannot resume.
+    act: when download_jenkins_agent is called.
+    assert: the partial download is discarded and the agent.jar is downloaded from scratch.
+    """
+    agent_jar_download_dir.mkdir()
+    part_path, state_path = server._get_partial_download_paths("http://test-url")
+    part_path.write_bytes(b"stale content")
+    state_path.write_text(server._PartialDownload(etag='"stale"').model_dump_json())
+    responses = [
+        get_mock_response(status_code=requests.codes.requested_range_not_satisfiable),
+        get_mock_response(chunks=[agent_jar]),
+    ]
+    mock_get = unittest.mock.MagicMock(spec=requests.Session.get, side_effect=responses)
+    monkeypatch.setattr(http_session, "get", mock_get)
+    monkeypatch.setattr(time, "sleep", lambda *_args: None)
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+    mock_container.exists.return_value = False
+
+    metadata = server.download_jenkins_agent(
+        server_url="http://test-url", container=mock_container, session=http_session
+    )
+
+    assert mock_get.call_args_list[0].kwargs["headers"]["Range"] == "bytes=13-"
+    assert mock_get.call_args.kwargs["headers"] == {}
+    assert metadata.sha256 == hashlib.sha256(agent_jar).hexdigest()
+
+
+def test_download_jenkins_agent_invalid_partial_state(
+    monkeypatch: pytest.MonkeyPatch,
+    agent_jar: bytes,
+    agent_jar_download_dir: pathlib.Path,
+    get_mock_response: typing.Callable[..., unittest.mock.MagicMock],
+    http_session: requests.Session,
+):
+    """
+    arrange: given a partial download with an invalid download state.
+    act: when download_jenkins_agent is called.
+    assert: the agent.jar is downloaded from scratch.
+    """
+    agent_jar_download_dir.mkdir()
+    part_path, state_path = server._get_partial_download_paths("http://test-url")
+    part_path.write_bytes(b"partial content")
+    state_path.write_text("invalid")
+    mock_get = unittest.mock.MagicMock(
+        spec=requests.Session.get, return_value=get_mock_response(chunks=[agent_jar])
+    )
+    monkeypatch.setattr(http_session, "get", mock_get)
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+    mock_container.exists.return_value = False
+
+    metadata = server.download_jenkins_agent(
+        server_url="http://test-url", container=mock_container, session=http_session
+    )
 
-    assert str(container.pull(server.AGENT_JAR_PATH, encoding="utf-8").read()) == response_content
+    assert mock_get.call_args.kwargs["headers"] == {}
+    assert metadata.sha256 == hashlib.sha256(agent_jar).hexdigest()
+
+
+@pytest.mark.parametrize(
+    "status_code, expected_attempts",
+    [
+        pytest.param(requests.codes.service_unavailable, 2, id="server error"),
+        pytest.param(requests.codes.not_found, 1, id="client error"),
+    ],
+)
+def test_download_jenkins_agent_http_error(
+    monkeypatch: pytest.MonkeyPatch,
+    agent_jar: bytes,
+    get_mock_response: typing.Callable[..., unittest.mock.MagicMock],
+    status_code: int,
+    expected_attempts: int,
+    http_session: requests.Session,
+):
+    """
+    arrange: given a monkeypatched HTTP session that returns an HTTP error status once.
+    act: when download_jenkins_agent is called.
+    assert: server errors are retried and client errors raise AgentJarDownloadError.
+    """
+    responses = [get_mock_response(status_code=status_code), get_mock_response(chunks=[agent_jar])]
+    mock_get = unittest.mock.MagicMock(spec=requests.Session.get, side_effect=responses)
+    monkeypatch.setattr(http_session, "get", mock_get)
+    monkeypatch.setattr(time, "sleep", lambda *_args: None)
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+    mock_container.exists.return_value = False
+
+    with contextlib.suppress(server.AgentJarDownloadError):
+        server.download_jenkins_agent(
+            server_url="http://test-url", container=mock_container, session=http_session
+        )
+
+    assert mock_get.call_count == expected_attempts
+    assert mock_container.push.called == (expected_attempts == 2)
+
+
+def test_download_jenkins_agent_incomplete(
+    monkeypatch: pytest.MonkeyPatch,
+    agent_jar: bytes,
+    get_mock_response: typing.Callable[..., unittest.mock.MagicMock],
+    http_session: requests.Session,
+):
+    """
+    arrange: given a monkeypatched HTTP session whose first response ends before the \
+        advertised content length.
+    act: when download_jenkins_agent is called.
+    assert: the download is retried and the complete agent.jar is installed.
+    """
+    responses = [
+        get_mock_response(
+            chunks=[agent_jar[:-1]],
+            headers={"ETag": '"test-etag"', "Content-Length": str(len(agent_jar))},
+        ),
+        get_mock_response(status_code=requests.codes.partial_content, chunks=[agent_jar[-1:]]),
+    ]
+    mock_get = unittest.mock.MagicMock(spec=requests.Session.get, side_effect=responses)
+    monkeypatch.setattr(http_session, "get", mock_get)
+    monkeypatch.setattr(time, "sleep", lambda *_args: None)
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+    mock_container.exists.return_value = False
+
+    metadata = server.download_jenkins_agent(
+        server_url="http://test-url", container=mock_container, session=http_session
+    )
+
+    assert mock_get.call_args.kwargs["headers"]["Range"] == f"bytes={len(agent_jar) - 1}-"
+    assert metadata.sha256 == hashlib.sha256(agent_jar).hexdigest()
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        pytest.param(b"not a jar", id="not a zip archive"),
+        pytest.param(None, id="corrupted zip archive"),
+    ],
+)
+def test_download_jenkins_agent_invalid_jar(
+    monkeypatch: pytest.MonkeyPatch,
+    agent_jar: bytes,
+    agent_jar_download_dir: pathlib.Path,
+    get_mock_response: typing.Callable[..., unittest.mock.MagicMock],
+    content: typing.Optional[bytes],
+    http_session: requests.Session,
+):
+    """
+    arrange: given a monkeypatched HTTP session that returns an invalid agent.jar content.
+    act: when download_jenkins_agent is called.
+    assert: AgentJarDownloadError is raised and the partial download is discarded.
+    """
+    if content is None:
+        # Flip a byte in the stored class file data to fail the CRC check.
+        offset = agent_jar.index(b"Launcher.class") + len(b"Launcher.class") + 10
+        content = agent_jar[:offset] + bytes([agent_jar[offset] ^ 0xFF]) + agent_jar[offset + 1 :]
+    monkeypatch.setattr(
+        http_session, "get", lambda *_args, **_kwargs: get_mock_response(chunks=[content])
+    )
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+    mock_container.exists.return_value = False
+
+    with pytest.raises(server.AgentJarDownloadError):
+        server.download_jenkins_agent(
+            server_url="http://test-url", container=mock_container, session=http_session
+        )
+
+    mock_container.push.assert_not_called()
+    assert not list(agent_jar_download_dir.iterdir())
 
 
 @pytest.mark.parametrize(
@@ -66,14 +597,14 @@ def test_download_jenkins_agent_download(
     [
         pytest.param("jenkins_error_log", id="error log"),
         pytest.param("jenkins_used_credential_log", id="used credential log"),
-        pytest.param("jenkins_terminated_connection_log", id="terminated connection log"),
+        pytest.param("jenkins_rejected_connection_log", id="rejected connection log"),
     ],
 )
 def test_validate_credentials_fail(failed_log_fixture: str, request: pytest.FixtureRequest):
     """
     arrange: given a mock container that returns unsuccessful jenkins agent connection logs.
     act: when validate_credentials is called.
-    assert: False is returned.
+    assert: False is returned and the agent is stopped at most once.
     """
     mock_process = unittest.mock.MagicMock(spec=ops.pebble.ExecProcess)
     mock_process.stdout = request.getfixturevalue(failed_log_fixture).split("\n")
@@ -85,6 +616,7 @@ def test_validate_credentials_fail(failed_log_fixture: str, request: pytest.Fixt
         credentials=server.Credentials(address="http://test-url", secret=secrets.token_hex(16)),
         container=mock_container,
     )
+    assert mock_process.send_signal.call_count <= 1
 
 
 @pytest.mark.parametrize(
@@ -96,9 +628,9 @@ def test_validate_credentials_fail(failed_log_fixture: str, request: pytest.Fixt
 )
 def test_validate_credentials(jenkins_connection_log: str, random_delay: bool):
     """
-    arrange: given a mock container that returns unsuccessful jenkins agent connection logs.
-    act: when validate_credentials is called.
-    assert: True is returned.
+    arrange: given a mock container that returns successful jenkins agent connection logs.
+    act: when validate_credentials is called with a timeout.
+    assert: True is returned and the agent is stopped once connected.
     """
     mock_process = unittest.mock.MagicMock(spec=ops.pebble.ExecProcess)
     mock_process.stdout = jenkins_connection_log.split("\n")
@@ -110,4 +642,805 @@ def test_validate_credentials(jenkins_connection_log: str, random_delay: bool):
         credentials=server.Credentials(address="http://test-url", secret=secrets.token_hex(16)),
         container=mock_container,
         add_random_delay=random_delay,
+        timeout=12.5,
+    )
+    assert mock_container.exec.call_args.kwargs["timeout"] == 12.5
+    mock_process.send_signal.assert_called_once_with("SIGTERM")
+
+
+def test_validate_credentials_terminated_after_stop(jenkins_terminated_connection_log: str):
+    """
+    arrange: given a mock container whose agent logs its termination once stopped after \
+        connecting.
+    act: when validate_credentials is called.
+    assert: True is returned, the output after the agent is stopped being ignored.
+    """
+    mock_process = unittest.mock.MagicMock(spec=ops.pebble.ExecProcess)
+    mock_process.stdout = jenkins_terminated_connection_log.split("\n")
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+    mock_container.exec.return_value = mock_process
+
+    assert server.validate_credentials(
+        agent_name="test-agent",
+        credentials=server.Credentials(address="http://test-url", secret=secrets.token_hex(16)),
+        container=mock_container,
+    )
+    mock_process.send_signal.assert_called_once_with("SIGTERM")
+
+
+def test_validate_credentials_terminated():
+    """
+    arrange: given a mock container whose agent terminates before connecting.
+    act: when validate_credentials is called.
+    assert: False is returned.
+    """
+    mock_process = unittest.mock.MagicMock(spec=ops.pebble.ExecProcess)
+    mock_process.stdout = ["INFO: Locating server among [http://test-url/]", "INFO: Terminated"]
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+    mock_container.exec.return_value = mock_process
+
+    assert not server.validate_credentials(
+        agent_name="test-agent",
+        credentials=server.Credentials(address="http://test-url", secret=secrets.token_hex(16)),
+        container=mock_container,
+    )
+
+
+@pytest.mark.parametrize(
+    "round_trip_times, expected_timeout",
+    [
+        pytest.param([0.3, 0.1, 0.2], 7, id="fastest round trip"),
+        pytest.param([5, 5, 5], server.CREDENTIALS_VALIDATION_MAX_TIMEOUT, id="capped"),
+    ],
+)
+def test_get_credentials_validation_timeout(
+    monkeypatch: pytest.MonkeyPatch,
+    http_session: requests.Session,
+    round_trip_times: typing.List[float],
+    expected_timeout: float,
+):
+    """
+    arrange: given a server responding within the given round trip times.
+    act: when get_credentials_validation_timeout is called.
+    assert: the timeout is extended by the fastest round trip time, up to the maximum timeout.
+    """
+    clock = [0.0]
+    samples = iter(round_trip_times)
+
+    def head(*_args: typing.Any, **_kwargs: typing.Any) -> None:
+        """Respond after the next round trip time.
+
+        Args:
+            _args: The request arguments.
+            _kwargs: The request keyword arguments.
+        """
+        clock[0] += next(samples)
+
+    monkeypatch.setattr(server.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(http_session, "head", head)
+
+    timeout = server.get_credentials_validation_timeout("http://test-url", session=http_session)
+
+    assert timeout == pytest.approx(expected_timeout)
+
+
+def test_get_credentials_validation_timeout_unreachable(
+    monkeypatch: pytest.MonkeyPatch, http_session: requests.Session
+):
+    """
+    arrange: given a server that cannot be reached.
+    act: when get_credentials_validation_timeout is called.
+    assert: the maximum timeout is returned.
+    """
+    monkeypatch.setattr(
+        http_session,
+        "head",
+        unittest.mock.MagicMock(side_effect=requests.ConnectionError("unreachable")),
+    )
+
+    timeout = server.get_credentials_validation_timeout("http://test-url", session=http_session)
+
+    assert timeout == server.CREDENTIALS_VALIDATION_MAX_TIMEOUT
+
+
+@pytest.mark.parametrize(
+    "responses, expected_result",
+    [
+        pytest.param([(requests.codes.not_found, None)], False, id="node missing"),
+        pytest.param(
+            [(requests.codes.ok, None), (requests.codes.ok, {"offline": False})],
+            False,
+            id="node online",
+        ),
+        pytest.param(
+            [(requests.codes.ok, None), (requests.codes.ok, {"offline": True})],
+            True,
+            id="node offline",
+        ),
+        pytest.param(
+            [(requests.codes.ok, None), (requests.codes.forbidden, None)],
+            True,
+            id="node status forbidden",
+        ),
+        pytest.param(
+            [(requests.codes.ok, None), (requests.codes.ok, ValueError("invalid JSON"))],
+            True,
+            id="node status invalid",
+        ),
+        pytest.param([requests.ConnectionError("unreachable")], True, id="server unreachable"),
+    ],
+)
+def test_precheck_credentials(
+    monkeypatch: pytest.MonkeyPatch,
+    get_mock_response: typing.Callable[..., unittest.mock.MagicMock],
+    http_session: requests.Session,
+    responses: typing.List[typing.Any],
+    expected_result: bool,
+):
+    """
+    arrange: given a monkeypatched HTTP session that returns the agent JNLP file and the agent \
+        computer API responses.
+    act: when precheck_credentials is called.
+    assert: the credentials are ruled out only if the node is missing or online.
+    """
+    side_effect: typing.List[typing.Any] = []
+    for response in responses:
+        if isinstance(response, Exception):
+            side_effect.append(response)
+            continue
+        status_code, payload = response
+        mock_response = get_mock_response(status_code=status_code)
+        if isinstance(payload, Exception):
+            mock_response.json.side_effect = payload
+        else:
+            mock_response.json.return_value = payload
+        side_effect.append(mock_response)
+    mock_get = unittest.mock.MagicMock(spec=requests.Session.get, side_effect=side_effect)
+    monkeypatch.setattr(http_session, "get", mock_get)
+
+    assert (
+        server.precheck_credentials(
+            agent_name="test-agent",
+            credentials=server.Credentials(address="http://test-url", secret="secret"),
+            session=http_session,
+        )
+        == expected_result
+    )
+    assert mock_get.call_args_list[0].args[0] == (
+        "http://test-url/computer/test-agent/slave-agent.jnlp"
+    )
+
+
+def test_find_valid_credentials_precheck(
+    monkeypatch: pytest.MonkeyPatch, jenkins_connection_log: str, http_session: requests.Session
+):
+    """
+    arrange: given pairs of which the first is ruled out by the pre-check.
+    act: when find_valid_credentials is called with an HTTP session.
+    assert: the agent is only started for the pair passing the pre-check.
+    """
+    monkeypatch.setattr(
+        server,
+        "precheck_credentials",
+        lambda agent_name, *_args, **_kwargs: agent_name != "agent-1",
+    )
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+    mock_container.exec.return_value = _get_mock_process(jenkins_connection_log.split("\n"))
+
+    assert server.find_valid_credentials(
+        agent_name_token_pairs=[("agent-1", "token-1"), ("agent-2", "token-2")],
+        server_url="http://test-url",
+        container=mock_container,
+        session=http_session,
+    ) == ("agent-2", "token-2")
+    mock_container.exec.assert_called_once()
+    assert mock_container.exec.call_args.args[0][-1] == "token-2"
+
+
+def _get_mock_process(stdout: typing.Iterable[str]) -> unittest.mock.MagicMock:
+    """Create a mock credentials validation process.
+
+    Args:
+        stdout: The process output lines.
+
+    Returns:
+        The mock process.
+    """
+    mock_process = unittest.mock.MagicMock(spec=ops.pebble.ExecProcess)
+    mock_process.stdout = stdout
+    return mock_process
+
+
+@pytest.mark.parametrize(
+    "valid_tokens, max_workers, expected_pair",
+    [
+        pytest.param({"token-2", "token-3"}, 1, ("agent-2", "token-2"), id="sequential"),
+        pytest.param({"token-2", "token-3"}, 4, ("agent-2", "token-2"), id="priority order"),
+        pytest.param({"token-3"}, 8, ("agent-3", "token-3"), id="more workers than pairs"),
+        pytest.param(set(), 4, None, id="no valid pair"),
+    ],
+)
+def test_find_valid_credentials(
+    jenkins_connection_log: str,
+    jenkins_error_log: str,
+    valid_tokens: typing.Set[str],
+    max_workers: int,
+    expected_pair: typing.Optional[typing.Tuple[str, str]],
+):
+    """
+    arrange: given a mock container validating a subset of the agent-token pairs, the later \
+        pairs validating faster.
+    act: when find_valid_credentials is called.
+    assert: the first valid pair in the given order is returned.
+    """
+    pairs = [(f"agent-{index}", f"token-{index}") for index in range(1, 5)]
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+
+    def exec_agent(command: typing.List[str], **_kwargs: typing.Any) -> unittest.mock.MagicMock:
+        """Validate the agent token with a latency decreasing with the pair priority.
+
+        Args:
+            command: The agent command.
+
+        Returns:
+            The mock process.
+        """
+        token = command[-1]
+        time.sleep(0.01 * (5 - int(token.rsplit("-", 1)[1])))
+        log = jenkins_connection_log if token in valid_tokens else jenkins_error_log
+        return _get_mock_process(log.split("\n"))
+
+    mock_container.exec.side_effect = exec_agent
+
+    assert (
+        server.find_valid_credentials(
+            agent_name_token_pairs=pairs,
+            server_url="http://test-url",
+            container=mock_container,
+            max_workers=max_workers,
+        )
+        == expected_pair
+    )
+
+
+@pytest.mark.parametrize(
+    "pairs, valid_tokens, expected_pair",
+    [
+        pytest.param([("agent-1", "token-1")], set(), None, id="first invalid"),
+        pytest.param(
+            [("agent-1", "token-1"), ("agent-2", "token-2")],
+            {"token-1", "token-2"},
+            ("agent-1", "token-1"),
+            id="first valid",
+        ),
+        pytest.param(
+            [("agent-1", "token-1"), ("agent-2", "token-2")],
+            {"token-2"},
+            ("agent-2", "token-2"),
+            id="fallback",
+        ),
+    ],
+)
+def test_find_valid_credentials_first_alone(
+    monkeypatch: pytest.MonkeyPatch,
+    pairs: typing.List[typing.Tuple[str, str]],
+    valid_tokens: typing.Set[str],
+    expected_pair: typing.Optional[typing.Tuple[str, str]],
+):
+    """
+    arrange: given agent-token pairs of which some are valid.
+    act: when find_valid_credentials is called validating the first pair alone.
+    assert: the other pairs are validated only if the first pair is invalid.
+    """
+    validated: typing.List[str] = []
+
+    def validate_credentials(credentials: server.Credentials, **_kwargs: typing.Any) -> bool:
+        """Validate the agent token.
+
+        Args:
+            credentials: The credentials to validate.
+
+        Returns:
+            Whether the agent token is valid.
+        """
+        validated.append(credentials.secret)
+        return credentials.secret in valid_tokens
+
+    monkeypatch.setattr(server, "validate_credentials", validate_credentials)
+
+    assert (
+        server.find_valid_credentials(
+            agent_name_token_pairs=pairs,
+            server_url="http://test-url",
+            container=unittest.mock.MagicMock(spec=ops.Container),
+            max_workers=4,
+            first_alone=True,
+        )
+        == expected_pair
+    )
+    assert validated == [token for _, token in pairs][: len(validated)]
+    assert len(validated) == (1 if "token-1" in valid_tokens else len(pairs))
+
+
+def test_find_valid_credentials_no_pairs():
+    """
+    arrange: given no agent-token pairs.
+    act: when find_valid_credentials is called.
+    assert: None is returned without starting any validation process.
+    """
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+
+    assert not server.find_valid_credentials(
+        agent_name_token_pairs=[], server_url="http://test-url", container=mock_container
+    )
+    mock_container.exec.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "kill_error",
+    [
+        pytest.param(None, id="killed"),
+        pytest.param(ops.pebble.APIError({}, 404, "Not Found", "exited"), id="already exited"),
+    ],
+)
+def test_find_valid_credentials_kills_remaining(
+    jenkins_connection_log: str, kill_error: typing.Optional[Exception]
+):
+    """
+    arrange: given a mock container where the first pair is valid and the second pair \
+        validation hangs until killed.
+    act: when find_valid_credentials is called with two workers.
+    assert: the first pair is returned and the hanging validation process is killed, only the \
+        completed validation being reported.
+    """
+    hanging_started = threading.Event()
+    killed = threading.Event()
+
+    def hang() -> typing.Iterator[str]:
+        """Output nothing until killed.
+
+        Yields:
+            No output lines.
+        """
+        hanging_started.set()
+        killed.wait(timeout=5)
+        yield from ()
+
+    def kill(_signal: str) -> None:
+        """Kill the hanging process.
+
+        Args:
+            _signal: The signal sent.
+
+        Raises:
+            kill_error: if the process has already exited.
+        """
+        killed.set()
+        if kill_error:
+            raise kill_error
+
+    hanging_process = _get_mock_process(hang())
+    hanging_process.send_signal.side_effect = kill
+
+    def exec_agent(command: typing.List[str], **_kwargs: typing.Any) -> unittest.mock.MagicMock:
+        """Start a valid or a hanging validation process.
+
+        Args:
+            command: The agent command.
+
+        Returns:
+            The mock process.
+        """
+        if command[-1] == "token-2":
+            return hanging_process
+        hanging_started.wait(timeout=5)
+        return _get_mock_process(jenkins_connection_log.split("\n"))
+
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+    mock_container.exec.side_effect = exec_agent
+    on_validated = unittest.mock.MagicMock()
+
+    assert server.find_valid_credentials(
+        agent_name_token_pairs=[("agent-1", "token-1"), ("agent-2", "token-2")],
+        server_url="http://test-url",
+        container=mock_container,
+        max_workers=2,
+        on_validated=on_validated,
+    ) == ("agent-1", "token-1")
+    hanging_process.send_signal.assert_called_once_with("SIGKILL")
+    on_validated.assert_called_once_with("agent-1", "token-1", True, unittest.mock.ANY)
+
+
+def test_find_valid_credentials_kills_late(jenkins_connection_log: str):
+    """
+    arrange: given a mock container where the first pair is valid and the second pair \
+        validation process starts after the first pair is validated.
+    act: when find_valid_credentials is called with two workers.
+    assert: the first pair is returned and the late validation process is killed once started.
+    """
+    late_started = threading.Event()
+    validated = threading.Event()
+    late_process = _get_mock_process([])
+
+    def validate() -> typing.Iterator[str]:
+        """Output the successful connection logs once the late validation has started.
+
+        Yields:
+            The connection log lines.
+        """
+        late_started.wait(timeout=5)
+        yield from jenkins_connection_log.split("\n")
+        validated.set()
+
+    def exec_agent(command: typing.List[str], **_kwargs: typing.Any) -> unittest.mock.MagicMock:
+        """Start a valid or a late validation process.
+
+        Args:
+            command: The agent command.
+
+        Returns:
+            The mock process.
+        """
+        if command[-1] == "token-2":
+            late_started.set()
+            validated.wait(timeout=5)
+            time.sleep(0.1)
+            return late_process
+        return _get_mock_process(validate())
+
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+    mock_container.exec.side_effect = exec_agent
+
+    assert server.find_valid_credentials(
+        agent_name_token_pairs=[("agent-1", "token-1"), ("agent-2", "token-2")],
+        server_url="http://test-url",
+        container=mock_container,
+        max_workers=2,
+    ) == ("agent-1", "token-1")
+    late_process.send_signal.assert_called_once_with("SIGKILL")
+
+
+def test__get_server_version_redirected(redirecting_session: requests.Session):
+    """
+    arrange: given a Jenkins server redirecting http:// requests to https://.
+    act: when _get_server_version is called with an http:// URL.
+    assert: the redirect is followed and the advertised version returned.
+    """
+    version = server._get_server_version(redirecting_session, "http://test-url/jnlpJars/agent.jar")
+
+    assert version == "2.401"
+
+
+@pytest.mark.parametrize(
+    "response, expected_version",
+    [
+        pytest.param(
+            {"headers": {"X-Remoting-Minimum-Version": "3107.v665000b_51092"}},
+            "3107.v665000b_51092",
+            id="advertised",
+        ),
+        pytest.param({}, None, id="not advertised"),
+        pytest.param({"status_code": requests.codes.not_found}, None, id="listener disabled"),
+    ],
+)
+def test_get_remoting_minimum_version(
+    monkeypatch: pytest.MonkeyPatch,
+    get_mock_response: typing.Callable[..., unittest.mock.MagicMock],
+    http_session: requests.Session,
+    response: typing.Dict[str, typing.Any],
+    expected_version: typing.Optional[str],
+):
+    """
+    arrange: given a monkeypatched HTTP session that returns the agent listener response.
+    act: when get_remoting_minimum_version is called.
+    assert: the advertised minimum remoting version is returned, None otherwise.
+    """
+    mock_head = unittest.mock.MagicMock(
+        spec=requests.Session.head, return_value=get_mock_response(**response)
     )
+    monkeypatch.setattr(http_session, "head", mock_head)
+
+    version = server.get_remoting_minimum_version("http://test-url", session=http_session)
+
+    assert version == expected_version
+    assert mock_head.call_args.args[0] == "http://test-url/tcpSlaveAgentListener/"
+
+
+def test_get_remoting_minimum_version_redirected(redirecting_session: requests.Session):
+    """
+    arrange: given a Jenkins server redirecting http:// requests to https://.
+    act: when get_remoting_minimum_version is called with an http:// URL.
+    assert: the redirect is followed and the advertised minimum remoting version returned.
+    """
+    version = server.get_remoting_minimum_version("http://test-url", session=redirecting_session)
+
+    assert version == "3107.v665000b_51092"
+
+
+@pytest.mark.parametrize(
+    "version, minimum_version, expected_compatible",
+    [
+        pytest.param("3309.v27b_9314fd1a_4", None, True, id="unknown minimum version"),
+        pytest.param("3309.v27b_9314fd1a_4", "3107.v665000b_51092", True, id="incremental"),
+        pytest.param("3309.v27b_9314fd1a_4", "3309.v1", True, id="same incremental"),
+        pytest.param("3107.v665000b_51092", "3309.v1", False, id="older incremental"),
+        pytest.param("3309.v27b_9314fd1a_4", "4.13", True, id="incremental and dotted"),
+        pytest.param("4.13", "4.2", True, id="dotted"),
+        pytest.param("4.2", "4.13", False, id="older dotted"),
+        pytest.param("unknown", "4.13", False, id="unparsable version"),
+    ],
+)
+def test_is_remoting_version_compatible(
+    version: str, minimum_version: typing.Optional[str], expected_compatible: bool
+):
+    """
+    arrange: given an agent remoting version and a server minimum remoting version.
+    act: when is_remoting_version_compatible is called.
+    assert: the versions are compared on their leading numeric components.
+    """
+    assert server.is_remoting_version_compatible(version, minimum_version) == expected_compatible
+
+
+@pytest.mark.parametrize(
+    "metadata, expected_bundled",
+    [
+        pytest.param(None, None, id="no rock agent.jar"),
+        pytest.param("invalid", None, id="invalid metadata"),
+        pytest.param('["sha256"]', None, id="unexpected metadata"),
+        pytest.param('{"sha256": "sha256"}', None, id="missing version"),
+        pytest.param(
+            '{"sha256": "sha256", "version": "3309.v1"}',
+            server.BundledAgentJar(
+                sha256="sha256",
+                version="3309.v1",
+                path=server.ROCK_AGENT_JAR_PATH,
+                in_container=True,
+            ),
+            id="valid metadata",
+        ),
+    ],
+)
+def test_get_rock_agent_jar(
+    harness: ops.testing.Harness,
+    metadata: typing.Optional[str],
+    expected_bundled: typing.Optional[server.BundledAgentJar],
+):
+    """
+    arrange: given a workload container with or without the rock agent.jar metadata.
+    act: when get_rock_agent_jar is called.
+    assert: the rock agent.jar is returned if its metadata is valid.
+    """
+    harness.set_can_connect("jenkins-agent-k8s", True)
+    harness.begin()
+    container = harness.model.unit.get_container("jenkins-agent-k8s")
+    if metadata is not None:
+        container.push(server.ROCK_AGENT_JAR_METADATA_PATH, metadata, make_dirs=True)
+
+    assert server.get_rock_agent_jar(container) == expected_bundled
+
+
+@pytest.mark.parametrize(
+    "manifest",
+    [
+        pytest.param(None, id="no manifest"),
+        pytest.param("Manifest-Version: 1.0\n", id="no version"),
+    ],
+)
+def test_read_agent_jar_invalid(tmp_path: pathlib.Path, manifest: typing.Optional[str]):
+    """
+    arrange: given an agent.jar without a versioned manifest.
+    act: when read_agent_jar is called.
+    assert: AgentJarDownloadError is raised.
+    """
+    path = tmp_path / "agent.jar"
+    with zipfile.ZipFile(path, "w") as jar_file:
+        jar_file.writestr("hudson/remoting/Launcher.class", b"class")
+        if manifest is not None:
+            jar_file.writestr("META-INF/MANIFEST.MF", manifest)
+
+    with pytest.raises(server.AgentJarDownloadError):
+        server.read_agent_jar(path)
+
+
+@pytest.mark.parametrize("in_container", [pytest.param(True), pytest.param(False)])
+def test_install_bundled_agent_jar(
+    tmp_path: pathlib.Path,
+    agent_jar: bytes,
+    agent_jar_metadata: server.AgentJarMetadata,
+    get_mock_store_container: typing.Callable[..., unittest.mock.MagicMock],
+    in_container: bool,
+):
+    """
+    arrange: given a bundled agent.jar in the workload or the charm container and an empty \
+        store.
+    act: when install_bundled_agent_jar is called.
+    assert: the bundled agent.jar is added to the store and activated.
+    """
+    path = tmp_path / "agent.jar"
+    path.write_bytes(agent_jar)
+    mock_container = get_mock_store_container(jar_store.StoreIndex())
+    mock_container.list_files.return_value = [unittest.mock.MagicMock(size=len(agent_jar))]
+    bundled = server.BundledAgentJar(
+        sha256=agent_jar_metadata.sha256,
+        version="3309.v27b_9314fd1a_4",
+        path=server.ROCK_AGENT_JAR_PATH if in_container else path,
+        in_container=in_container,
+    )
+
+    metadata = server.install_bundled_agent_jar(mock_container, bundled)
+
+    assert metadata == server.AgentJarMetadata(sha256=agent_jar_metadata.sha256)
+    entry_path = server.AGENT_JAR_STORE_PATH / f"{agent_jar_metadata.sha256}.jar"
+    if in_container:
+        mock_container.exec.assert_any_call(
+            ["cp", str(server.ROCK_AGENT_JAR_PATH), str(entry_path)], user=server.USER
+        )
+    else:
+        assert mock_container.push.call_args_list[0].args[0] == entry_path
+    pushed_index = jar_store.StoreIndex.model_validate_json(mock_container.push.call_args.args[1])
+    assert pushed_index.active == agent_jar_metadata.sha256
+    assert pushed_index.entries[agent_jar_metadata.sha256].size == len(agent_jar)
+
+
+@pytest.mark.parametrize(
+    "stored",
+    [pytest.param(False, id="not stored"), pytest.param(True, id="already stored")],
+)
+def test_download_peer_agent_jar(
+    monkeypatch: pytest.MonkeyPatch,
+    agent_jar: bytes,
+    agent_jar_metadata: server.AgentJarMetadata,
+    get_mock_response: typing.Callable[..., unittest.mock.MagicMock],
+    get_mock_store_container: typing.Callable[..., unittest.mock.MagicMock],
+    http_session: requests.Session,
+    stored: bool,
+):
+    """
+    arrange: given the agent.jar published by a peer unit.
+    act: when download_peer_agent_jar is called.
+    assert: the agent.jar is downloaded from the peer unit unless stored and activated.
+    """
+    mock_get = unittest.mock.MagicMock(
+        spec=requests.Session.get, return_value=get_mock_response(chunks=[agent_jar])
+    )
+    monkeypatch.setattr(http_session, "get", mock_get)
+    metadata = agent_jar_metadata.model_copy(update={"version": "2.401"})
+    index = jar_store.StoreIndex()
+    if stored:
+        index.entries[metadata.sha256] = jar_store.StoreEntry(sha256=metadata.sha256)
+    mock_container = get_mock_store_container(index)
+
+    installed = server.download_peer_agent_jar(
+        url="http://10.0.0.1:8081/agent.jar",
+        metadata=metadata,
+        container=mock_container,
+        session=http_session,
+    )
+
+    assert installed == metadata
+    assert mock_get.called != stored
+    pushed_index = jar_store.StoreIndex.model_validate_json(mock_container.push.call_args.args[1])
+    assert pushed_index.active == metadata.sha256
+    assert pushed_index.entries[metadata.sha256].versions == ["2.401"]
+
+
+def test_download_peer_agent_jar_digest_mismatch(
+    monkeypatch: pytest.MonkeyPatch,
+    agent_jar: bytes,
+    agent_jar_metadata: server.AgentJarMetadata,
+    agent_jar_download_dir: pathlib.Path,
+    get_mock_response: typing.Callable[..., unittest.mock.MagicMock],
+    get_mock_store_container: typing.Callable[..., unittest.mock.MagicMock],
+    http_session: requests.Session,
+):
+    """
+    arrange: given a peer unit serving an agent.jar not matching the published digest.
+    act: when download_peer_agent_jar is called.
+    assert: AgentJarDownloadError is raised and nothing is pushed to the container.
+    """
+    monkeypatch.setattr(
+        http_session, "get", lambda *_args, **_kwargs: get_mock_response(chunks=[agent_jar])
+    )
+    mock_container = get_mock_store_container(jar_store.StoreIndex())
+
+    with pytest.raises(server.AgentJarDownloadError):
+        server.download_peer_agent_jar(
+            url="http://10.0.0.1:8081/agent.jar",
+            metadata=agent_jar_metadata.model_copy(update={"sha256": "0" * 64}),
+            container=mock_container,
+            session=http_session,
+        )
+
+    mock_container.push.assert_not_called()
+    assert not list(agent_jar_download_dir.iterdir())
+
+
+@pytest.mark.parametrize(
+    "stdout, expected_busy",
+    [
+        pytest.param("busy\n", True, id="busy"),
+        pytest.param("", False, id="idle"),
+    ],
+)
+def test_is_agent_busy(stdout: str, expected_busy: bool):
+    """
+    arrange: given a container whose agent has or has not running child processes.
+    act: when is_agent_busy is called.
+    assert: the agent is busy only if it has running child processes.
+    """
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+    mock_container.exec.return_value.wait_output.return_value = (stdout, "")
+
+    assert server.is_agent_busy(mock_container) == expected_busy
+
+
+def test_is_agent_busy_workdir():
+    """
+    arrange: given a container running agents in several work directories.
+    act: when is_agent_busy is called for an agent work directory.
+    assert: the check is restricted to the agent run in the work directory.
+    """
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+    mock_container.exec.return_value.wait_output.return_value = ("", "")
+
+    server.is_agent_busy(mock_container, server.get_agent_workdir(1))
+
+    command = mock_container.exec.call_args.args[0]
+    assert command[-1] == str(server.AGENT_NODES_PATH / "1")
+
+
+@pytest.mark.parametrize(
+    "known_version",
+    [pytest.param(False, id="new version"), pytest.param(True, id="known version")],
+)
+def test_download_jenkins_agent_stage(
+    monkeypatch: pytest.MonkeyPatch,
+    agent_jar: bytes,
+    agent_jar_metadata: server.AgentJarMetadata,
+    get_mock_response: typing.Callable[..., unittest.mock.MagicMock],
+    get_mock_store_container: typing.Callable[..., unittest.mock.MagicMock],
+    http_session: requests.Session,
+    known_version: bool,
+):
+    """
+    arrange: given an active agent.jar in the store and a server serving a new version.
+    act: when download_jenkins_agent is called without activation.
+    assert: the new agent.jar is staged in the store without replacing the active agent.jar.
+    """
+    monkeypatch.setattr(
+        http_session,
+        "head",
+        lambda *_args, **_kwargs: get_mock_response(headers={"X-Jenkins": "2.401"}),
+    )
+    monkeypatch.setattr(
+        http_session,
+        "get",
+        lambda *_args, **_kwargs: get_mock_response(
+            chunks=[agent_jar], headers={"X-Jenkins": "2.401"}
+        ),
+    )
+    index = jar_store.StoreIndex(
+        active="previous",
+        entries={"previous": jar_store.StoreEntry(sha256="previous", versions=["2.400"])},
+    )
+    if known_version:
+        index.entries[agent_jar_metadata.sha256] = jar_store.StoreEntry(
+            sha256=agent_jar_metadata.sha256, versions=["2.401"]
+        )
+    mock_container = get_mock_store_container(index)
+
+    metadata = server.download_jenkins_agent(
+        server_url="http://test-url",
+        container=mock_container,
+        session=http_session,
+        activate=False,
+    )
+
+    assert metadata.sha256 == agent_jar_metadata.sha256
+    mock_container.exec.assert_not_called()
+    if not known_version:
+        pushed_index = jar_store.StoreIndex.model_validate_json(
+            mock_container.push.call_args.args[1]
+        )
+        assert pushed_index.active == "previous"
+        assert agent_jar_metadata.sha256 in pushed_index.entries
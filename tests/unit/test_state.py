@@ -6,7 +6,10 @@
 # Need access to protected functions for testing
 # pylint:disable=protected-access
 
+import collections
+import concurrent.futures
 import os
+import threading
 import typing
 import unittest.mock
 
@@ -14,6 +17,7 @@ import ops
 import ops.testing
 import pytest
 
+import server
 import state
 
 
@@ -104,3 +108,239 @@ def test_from_charm_valid_config(harness: ops.testing.Harness, config: typing.Di
     assert charm_state.jenkins_config.agent_name_token_pairs == [
         (config["jenkins_agent_name"], config["jenkins_agent_token"])
     ]
+    assert charm_state.jenkins_config.validation_workers == 4
+    assert charm_state.jenkins_config.agent_services == 1
+
+
+@pytest.mark.parametrize(
+    "option",
+    [
+        pytest.param("jenkins_agent_validation_workers", id="no validation workers"),
+        pytest.param("jenkins_agent_services", id="no agent services"),
+    ],
+)
+def test_from_charm_invalid_validation_workers(
+    harness: ops.testing.Harness, config: typing.Dict[str, typing.Any], option: str
+):
+    """
+    arrange: given charm configuration data without credentials validation workers or agents.
+    act: when the state is initialized from_charm.
+    assert: InvalidStateError is raised.
+    """
+    harness.update_config({**config, option: 0})
+    harness.begin()
+
+    with pytest.raises(state.InvalidStateError):
+        state.State.from_charm(charm=harness.charm)
+
+
+@pytest.mark.parametrize(
+    "watermarks",
+    [
+        pytest.param({"workspace_gc_high_watermark": 0}, id="high watermark out of range"),
+        pytest.param(
+            {"workspace_gc_high_watermark": 60, "workspace_gc_low_watermark": 60},
+            id="low watermark not below high watermark",
+        ),
+    ],
+)
+def test_from_charm_invalid_workspace_gc_config(
+    harness: ops.testing.Harness, watermarks: typing.Dict[str, int]
+):
+    """
+    arrange: given charm configuration data with invalid workspace GC watermarks.
+    act: when the state is initialized from_charm.
+    assert: InvalidStateError is raised.
+    """
+    harness.update_config(watermarks)
+    harness.begin()
+
+    with pytest.raises(state.InvalidStateError):
+        state.State.from_charm(charm=harness.charm)
+
+
+@pytest.mark.parametrize(
+    "cache_directories, expected_cache_directories",
+    [
+        pytest.param("", [], id="none"),
+        pytest.param(".m2, .gradle /root/.cache", [".m2", ".gradle", "/root/.cache"], id="mixed"),
+        pytest.param("/var/lib/jenkins/.m2", [".m2"], id="within Jenkins home"),
+    ],
+)
+def test_from_charm_cache_directories(
+    harness: ops.testing.Harness,
+    cache_directories: str,
+    expected_cache_directories: typing.List[str],
+):
+    """
+    arrange: given comma or space separated cache directories.
+    act: when the state is initialized from_charm.
+    assert: the cache directories are parsed.
+    """
+    harness.update_config({"cache_directories": cache_directories})
+    harness.begin()
+
+    charm_state = state.State.from_charm(charm=harness.charm)
+
+    assert charm_state.cache_directories == expected_cache_directories
+
+
+@pytest.mark.parametrize(
+    "cache_directories",
+    [
+        pytest.param("/", id="root"),
+        pytest.param("/usr", id="system directory"),
+        pytest.param(".m2 /etc", id="configuration directory"),
+        pytest.param("/root", id="allowed directory itself"),
+        pytest.param("/root-other/.m2", id="allowed directory prefix"),
+        pytest.param(".m2 ../escape", id="parent reference"),
+    ],
+)
+def test_from_charm_invalid_cache_directories(
+    harness: ops.testing.Harness, cache_directories: str
+):
+    """
+    arrange: given cache directories with a parent reference or an absolute directory not \
+        within the allowed directories.
+    act: when the state is initialized from_charm.
+    assert: InvalidStateError is raised.
+    """
+    harness.update_config({"cache_directories": cache_directories})
+    harness.begin()
+
+    with pytest.raises(state.InvalidStateError):
+        state.State.from_charm(charm=harness.charm)
+
+
+def _get_pairs_config(pair_count: int, assignment: str) -> ops.ConfigData:
+    """Get the charm configuration of the given number of agent-token pairs.
+
+    Args:
+        pair_count: The number of agent-token pairs.
+        assignment: The agent-token pair assignment.
+
+    Returns:
+        The charm configuration.
+    """
+    return typing.cast(
+        ops.ConfigData,
+        {
+            "jenkins_url": "http://test-url",
+            "jenkins_agent_name": ":".join(f"agent-{index}" for index in range(pair_count)),
+            "jenkins_agent_token": ":".join(f"token-{index}" for index in range(pair_count)),
+            "jenkins_agent_assignment": assignment,
+        },
+    )
+
+
+@pytest.mark.parametrize(
+    "assignment, unit_ordinal, expected_first_names",
+    [
+        pytest.param("ordered", 1, ["agent-0", "agent-1", "agent-2"], id="ordered"),
+        pytest.param("ordinal", 0, ["agent-0", "agent-1", "agent-2"], id="ordinal first"),
+        pytest.param("ordinal", 1, ["agent-1", "agent-2", "agent-0"], id="ordinal"),
+        pytest.param("ordinal", 4, ["agent-1", "agent-2", "agent-0"], id="ordinal wrap around"),
+    ],
+)
+def test_from_charm_config_assignment(
+    assignment: str, unit_ordinal: int, expected_first_names: typing.List[str]
+):
+    """
+    arrange: given a charm configuration with three agent-token pairs.
+    act: when the Jenkins config is initialized for a unit ordinal.
+    assert: the pairs start from the pair at the unit ordinal with the ordinal assignment.
+    """
+    jenkins_config = state.JenkinsConfig.from_charm_config(
+        _get_pairs_config(3, assignment), unit_ordinal=unit_ordinal
+    )
+
+    assert jenkins_config
+    assert [name for name, _ in jenkins_config.agent_name_token_pairs] == expected_first_names
+
+
+def test_from_charm_invalid_assignment(
+    harness: ops.testing.Harness, config: typing.Dict[str, typing.Any]
+):
+    """
+    arrange: given charm configuration data with an unknown agent-token pair assignment.
+    act: when the state is initialized from_charm.
+    assert: InvalidStateError is raised.
+    """
+    harness.update_config({**config, "jenkins_agent_assignment": "random"})
+    harness.begin()
+
+    with pytest.raises(state.InvalidStateError):
+        state.State.from_charm(charm=harness.charm)
+
+
+@pytest.mark.parametrize(
+    "unit_count, pair_count",
+    [
+        pytest.param(20, 20, id="a pair per unit"),
+        pytest.param(10, 20, id="spare pairs"),
+        pytest.param(50, 50, id="many units"),
+    ],
+)
+def test_ordinal_assignment_registration(
+    monkeypatch: pytest.MonkeyPatch, unit_count: int, pair_count: int
+):
+    """
+    arrange: given units with the ordinal assignment registering concurrently to a server \
+        accepting a single connection per agent.
+    act: when each unit finds valid credentials with concurrent validation.
+    assert: each unit connects with a different pair after validating a single pair.
+    """
+    lock = threading.Lock()
+    connected: typing.Set[str] = set()
+    probes: typing.Counter[str] = collections.Counter()
+
+    def validate_credentials(
+        agent_name: str, container: ops.Container, **_kwargs: typing.Any
+    ) -> bool:
+        """Connect the agent unless already connected.
+
+        Args:
+            agent_name: The Jenkins agent name.
+            container: The unit workload container.
+
+        Returns:
+            True if the agent was not connected yet.
+        """
+        with lock:
+            probes[str(container.name)] += 1
+            if agent_name in connected:
+                return False
+            connected.add(agent_name)
+            return True
+
+    monkeypatch.setattr(server, "validate_credentials", validate_credentials)
+
+    def register(unit_ordinal: int) -> typing.Optional[typing.Tuple[str, str]]:
+        """Find valid credentials for a unit.
+
+        Args:
+            unit_ordinal: The unit ordinal.
+
+        Returns:
+            The agent-token pair found.
+        """
+        jenkins_config = state.JenkinsConfig.from_charm_config(
+            _get_pairs_config(pair_count, "ordinal"), unit_ordinal=unit_ordinal
+        )
+        assert jenkins_config
+        mock_container = unittest.mock.MagicMock(spec=ops.Container)
+        mock_container.name = f"unit-{unit_ordinal}"
+        return server.find_valid_credentials(
+            agent_name_token_pairs=jenkins_config.agent_name_token_pairs,
+            server_url=jenkins_config.server_url,
+            container=mock_container,
+            max_workers=4,
+            first_alone=True,
+        )
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=unit_count) as executor:
+        found = list(executor.map(register, range(unit_count)))
+
+    assert len(set(found)) == unit_count
+    assert None not in found
+    assert set(probes.values()) == {1}
@@ -0,0 +1,132 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Jenkins-agent-k8s Jenkins home directory module tests."""
+
+import typing
+import unittest.mock
+
+import ops
+import pytest
+
+import server
+import workdir
+
+
+def _get_file_info(path: str, file_type: ops.pebble.FileType, user: str) -> ops.pebble.FileInfo:
+    """Get the information of a file of the workload container.
+
+    Args:
+        path: The file path.
+        file_type: The file type.
+        user: The file owner.
+
+    Returns:
+        The file information.
+    """
+    return ops.pebble.FileInfo(
+        path=path,
+        name=path.rsplit("/", 1)[-1],
+        type=file_type,
+        size=None,
+        permissions=0o755,
+        last_modified=None,  # type: ignore[arg-type]
+        user_id=None,
+        user=user,
+        group_id=None,
+        group=user,
+    )
+
+
+@pytest.mark.parametrize(
+    "owner, expected_created, expected_chowned",
+    [
+        pytest.param(None, True, False, id="missing"),
+        pytest.param("root", False, True, id="mounted volume"),
+        pytest.param(server.USER, False, False, id="prepared"),
+    ],
+)
+def test_prepare_jenkins_home(
+    owner: typing.Optional[str], expected_created: bool, expected_chowned: bool
+):
+    """
+    arrange: given a workload container with a missing, root owned or agent owned Jenkins home.
+    act: when prepare is called.
+    assert: the Jenkins home directory is created or handed over to the agent user if needed.
+    """
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+    if owner:
+        mock_container.list_files.return_value = [
+            _get_file_info(str(server.JENKINS_WORKDIR), ops.pebble.FileType.DIRECTORY, owner)
+        ]
+    else:
+        mock_container.list_files.side_effect = ops.pebble.PathError("not-found", "not found")
+
+    workdir.prepare(mock_container)
+
+    assert mock_container.make_dir.called == expected_created
+    assert mock_container.exec.called == expected_chowned
+    if expected_chowned:
+        assert mock_container.exec.call_args.args[0] == [
+            "chown",
+            f"{server.USER}:{server.USER}",
+            str(server.JENKINS_WORKDIR),
+        ]
+
+
+def test_prepare_cache_directories():
+    """
+    arrange: given a workload container with a prepared Jenkins home directory.
+    act: when prepare is called with relative and absolute cache directories.
+    assert: the relative directories are created in the Jenkins home directory and the absolute \
+        ones linked to the persistent caches.
+    """
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+    mock_container.list_files.return_value = [
+        _get_file_info(str(server.JENKINS_WORKDIR), ops.pebble.FileType.DIRECTORY, server.USER)
+    ]
+
+    workdir.prepare(mock_container, [".m2", "/root/.cache"])
+
+    mock_container.make_dir.assert_called_once_with(
+        server.JENKINS_WORKDIR / ".m2", make_parents=True, user=server.USER, group=server.USER
+    )
+    command = mock_container.exec.call_args.args[0]
+    assert command[-2:] == ["/root/.cache", str(workdir.CACHES_PATH / "root/.cache")]
+
+
+@pytest.mark.parametrize(
+    "nodes, expected_removed",
+    [
+        pytest.param(None, 2, id="single agent"),
+        pytest.param(["1", "2"], 6, id="additional agents"),
+    ],
+)
+def test_reset_agent_markers(nodes: typing.Optional[typing.List[str]], expected_removed: int):
+    """
+    arrange: given a workload container with or without additional agent work directories.
+    act: when reset_agent_markers is called.
+    assert: the ready marker and connection state of every agent are removed.
+    """
+    mock_container = unittest.mock.MagicMock(spec=ops.Container)
+    if nodes is None:
+        mock_container.list_files.side_effect = ops.pebble.PathError("not-found", "not found")
+    else:
+        mock_container.list_files.return_value = [
+            _get_file_info(
+                str(server.AGENT_NODES_PATH / node), ops.pebble.FileType.DIRECTORY, server.USER
+            )
+            for node in nodes
+        ] + [
+            _get_file_info(
+                str(server.AGENT_NODES_PATH / ".lock"), ops.pebble.FileType.FILE, server.USER
+            )
+        ]
+
+    workdir.reset_agent_markers(mock_container)
+
+    removed = [call.args[0] for call in mock_container.remove_path.call_args_list]
+    assert len(removed) == expected_removed
+    assert server.AGENT_STATE_PATH in removed
+    if nodes:
+        assert server.get_agent_state_path(2) in removed